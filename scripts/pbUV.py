@@ -1,7 +1,34 @@
-from pymel.util.common import path
+from collections import OrderedDict, deque
+import importlib
+import json
 import math
 import os
-import pymel.core as pm
+import re
+import time
+import maya.api.OpenMaya as om
+import numpy as np
+
+import pbUVCore as core
+
+
+class LazyModule(object):
+    """
+    Imports a module on first attribute access. pymel.core takes seconds to import, the backends, the
+    operations and pbUVBatch never touch it.
+    """
+
+    def __init__(self, name):
+        self.__dict__.update(_name=name, _module=None, _seconds=0.0)
+
+    def __getattr__(self, key):
+        if self._module is None:
+            start = time.time()
+            self.__dict__['_module'] = importlib.import_module(self._name)
+            self.__dict__['_seconds'] = time.time() - start
+        return getattr(self._module, key)
+
+
+pm = LazyModule('pymel.core')
 
 
 # Decorators
@@ -23,15 +50,96 @@ def move_fix(function):
     return decorated_function
 
 
+# Tool timing, scene call counts and uv counts go into this ring buffer, see pbUVCore.Tracer.
+# Set PBUV_TRACE=0 to turn it off.
+tracer = core.Tracer(size=1024, enabled=os.environ.get('PBUV_TRACE', '1') != '0')
+traced = tracer.wrap
+
+
+# Lazy UI
+class LazyFrame(object):
+    """
+    Collapsible side panel whose contents build() makes the first time it is expanded. Whether a frame was
+    left collapsed is kept in an optionVar, frames left open are built right away.
+    """
+
+    def __init__(self, label, build, collapse=True, expand=None):
+        self.key = 'pbUVCollapse' + re.sub(r'\W', '', label)
+        self.build = build
+        self.expand = expand
+        self.built = False
+        collapse = pm.optionVar.get(self.key, int(collapse))
+        self.frame = pm.frameLayout(l=label, cll=True, cl=collapse, bs='out', ec=self._expanded,
+                                    cc=self._collapsed)
+        if not collapse:
+            self.ensure()
+        pm.setParent('..')
+
+    def ensure(self):
+        if self.built:
+            return
+        self.built = True
+        parent = pm.setParent(q=True)
+        pm.setParent(self.frame)
+        self.build()
+        pm.setParent(parent)
+
+    def _expanded(self, *args):
+        pm.optionVar[self.key] = 0
+        self.ensure()
+        save_annotations()
+        if self.expand is not None:
+            self.expand()
+
+    def _collapsed(self, *args):
+        pm.optionVar[self.key] = 1
+
+
+# Maya's annotations resolved with uiRes, kept in the user prefs per Maya version and UI language
+annotations = {}
+annotations_changed = False
+
+
+def _annotations_path():
+    key = '{0}_{1}'.format(pm.about(version=True), pm.about(uiLanguage=True)).replace(' ', '')
+    return os.path.join(pm.internalVar(userPrefDir=True), 'pbUVAnnotations_{0}.json'.format(key))
+
+
+def ui_res(key):
+    global annotations_changed
+    if not annotations:
+        try:
+            with open(_annotations_path()) as f:
+                annotations.update(json.load(f))
+        except (IOError, OSError, ValueError):
+            annotations[None] = None  # nothing saved yet, don't look again
+    if key not in annotations:
+        annotations[key] = pm.mel.uiRes(key)
+        annotations_changed = True
+    return annotations[key]
+
+
+def save_annotations():
+    global annotations_changed
+    if annotations_changed:
+        with open(_annotations_path(), 'w') as f:
+            json.dump(dict(i for i in annotations.items() if i[0] is not None), f, indent=0, sort_keys=True)
+        annotations_changed = False
+
+
 class UI(object):
     def __init__(self):
         title = 'pbUV'
         ver = '1.00'
+        start = time.time()
+        self.timings = OrderedDict()
 
         if pm.window('pbUV', exists=True):
             pm.deleteUI('pbUV')
 
         window = pm.window('pbUV', s=True, title='{0} | {1}'.format(title, ver))
+        pm.scriptJob(event=['SelectionChanged', prefetch.start], protected=True, p=window)
+        pm.scriptJob(uiDeleted=[window, prefetch.stop], runOnce=True)
 
         try:
             pane = pm.paneLayout('textureEditorPanel', paneSize=[1, 1, 1], cn='vertical2', swp=1)
@@ -42,12 +150,18 @@ class UI(object):
         if len(uvtextureviews):
             pm.scriptedPanel(uvtextureviews[0], e=True, unParent=True)
 
+        self.timings['pymel.core'] = pm._seconds
+        self.timings['window'] = time.time() - start - pm._seconds
+
+        lap = time.time()
         with pm.columnLayout(p=pane):
             TransformUI()
             opts = GlobalOptions()
             SetEditorUI()
             DensityUI(opts)
             SnapshotUI(opts)
+            ValidateUI()
+        self.timings['panels'] = time.time() - lap
 
         pm.scriptedPanel(uvtextureviews[0], e=True, parent=pane)
 
@@ -57,21 +171,28 @@ class UI(object):
         framelayout = pm.uitypes.FrameLayout(framelayout)
         pm.deleteUI(flowlayout)
 
+        lap = time.time()
         flowlayout = pm.flowLayout(p=framelayout)
         Tools01UI(flowlayout)
         CutSewUI(flowlayout)
-        UnfoldUI(flowlayout)
+        UnfoldUI(flowlayout, opts)
         AlignUI(flowlayout)
         PushUI(flowlayout)
         SnapUI(flowlayout)
-        LayoutUI(flowlayout)
+        LayoutUI(flowlayout, opts)
         IsolateUI(flowlayout, uvtextureviews[0])
         Opts01UI(flowlayout, uvtextureviews[0])
         Opts02UI(flowlayout, uvtextureviews[0])
         Opts03UI(flowlayout, uvtextureviews[0])
         ManipUI(flowlayout)
+        save_annotations()
+        self.timings['toolbar'] = time.time() - lap
 
         window.show()
+        prefetch.start()
+        self.timings['total'] = time.time() - start
+        pm.displayInfo('pbUV ready in {0:.0f} ms ({1})'.format(self.timings['total'] * 1000, ', '.join(
+            '{0} {1:.0f} ms'.format(k, v * 1000) for k, v in self.timings.items() if k != 'total')))
 
     @staticmethod
     def dump_settings():
@@ -113,57 +234,59 @@ class GlobalOptions(object):
 
 class TransformUI(object):
     def __init__(self):
-        with pm.frameLayout(l='Transform:', cll=True, cl=False, bs='out'):
-            with pm.columnLayout():
-                with pm.gridLayout(nc=5):
-                    pm.iconTextButton(image1='pbUV/tRot90CCW.png', c=lambda *args: self.rotate(angle=90, dir='ccw'),
-                                      commandRepeatable=True)
-                    pm.iconTextButton(image1='pbUV/tRotCCW.png', c=lambda *args: self.rotate(dir='ccw'),
-                                      commandRepeatable=True)
-                    pm.iconTextButton(image1='pbUV/tTranslateUp.png', c=lambda *args: self.move(v=1),
-                                      commandRepeatable=True)
-                    pm.iconTextButton(image1='pbUV/tRotCW.png', c=lambda *args: self.rotate(dir='cw'))
-                    pm.iconTextButton(image1='pbUV/tRot90CW.png', c=lambda *args: self.rotate(angle=90, dir='cw'),
-                                      commandRepeatable=True)
-
-                    flipuv = pm.iconTextButton(image1='pbUV/tFlipUV.png', c=lambda *args: self.flip(axis='u'),
-                                               commandRepeatable=True)
-                    pm.popupMenu(button=3, p=flipuv, pmc=lambda *args: self.flip(axis='v'))
-                    pm.iconTextButton(image1='pbUV/tTranslateLeft.png', c=lambda *args: self.move(u=-1),
-                                      commandRepeatable=True)
-                    pm.iconTextButton(image1='pbUV/tTranslateDown.png', c=lambda *args: self.move(v=-1),
-                                      commandRepeatable=True)
-                    pm.iconTextButton(image1='pbUV/tTranslateRight.png', c=lambda *args: self.move(u=1),
-                                      commandRepeatable=True)
-                    pm.iconTextButton(image1='pbUV/tRot180CCW.png', c=lambda *args: self.rotate(angle=180, dir='ccw'),
-                                      commandRepeatable=True)
-
-                with pm.rowColumnLayout(nc=4):
-                    self.manipValue = pm.floatField(v=1.0)
-                    pm.iconTextButton(image1='pbUV/tScaleU.png', c=lambda *args: self.scale(axis='u'),
-                                      commandRepeatable=True)
-                    pm.iconTextButton(image1='pbUV/tScaleV.png', c=lambda *args: self.scale(axis='v'),
-                                      commandRepeatable=True)
-                    pm.iconTextButton(image1='pbUV/tScaleUV.png', c=lambda *args: self.scale(),
-                                      commandRepeatable=True)
+        self.panel = LazyFrame('Transform:', self.build, collapse=False)
 
-                pm.separator(st='in', width=160, height=8)
+    def build(self):
+        with pm.columnLayout():
+            with pm.gridLayout(nc=5):
+                pm.iconTextButton(image1='pbUV/tRot90CCW.png', c=lambda *args: self.rotate(angle=90, dir='ccw'),
+                                  commandRepeatable=True)
+                pm.iconTextButton(image1='pbUV/tRotCCW.png', c=lambda *args: self.rotate(dir='ccw'),
+                                  commandRepeatable=True)
+                pm.iconTextButton(image1='pbUV/tTranslateUp.png', c=lambda *args: self.move(v=1),
+                                  commandRepeatable=True)
+                pm.iconTextButton(image1='pbUV/tRotCW.png', c=lambda *args: self.rotate(dir='cw'))
+                pm.iconTextButton(image1='pbUV/tRot90CW.png', c=lambda *args: self.rotate(angle=90, dir='cw'),
+                                  commandRepeatable=True)
 
-                with pm.rowLayout(nc=2):
-                    pm.button(l='Orient Edge', c=self.orient_edge)
-                    pm.button(l='Orient Bounds', c=self.orient_bounds)
+                flipuv = pm.iconTextButton(image1='pbUV/tFlipUV.png', c=lambda *args: self.flip(axis='u'),
+                                           commandRepeatable=True)
+                pm.popupMenu(button=3, p=flipuv, pmc=lambda *args: self.flip(axis='v'))
+                pm.iconTextButton(image1='pbUV/tTranslateLeft.png', c=lambda *args: self.move(u=-1),
+                                  commandRepeatable=True)
+                pm.iconTextButton(image1='pbUV/tTranslateDown.png', c=lambda *args: self.move(v=-1),
+                                  commandRepeatable=True)
+                pm.iconTextButton(image1='pbUV/tTranslateRight.png', c=lambda *args: self.move(u=1),
+                                  commandRepeatable=True)
+                pm.iconTextButton(image1='pbUV/tRot180CCW.png', c=lambda *args: self.rotate(angle=180, dir='ccw'),
+                                  commandRepeatable=True)
 
-                pm.separator(st='in', width=160, height=8)
+            with pm.rowColumnLayout(nc=4):
+                self.manipValue = pm.floatField(v=1.0)
+                pm.iconTextButton(image1='pbUV/tScaleU.png', c=lambda *args: self.scale(axis='u'),
+                                  commandRepeatable=True)
+                pm.iconTextButton(image1='pbUV/tScaleV.png', c=lambda *args: self.scale(axis='v'),
+                                  commandRepeatable=True)
+                pm.iconTextButton(image1='pbUV/tScaleUV.png', c=lambda *args: self.scale(),
+                                  commandRepeatable=True)
+
+            pm.separator(st='in', width=160, height=8)
+
+            with pm.rowLayout(nc=2):
+                pm.button(l='Orient Edge', c=self.orient_edge)
+                pm.button(l='Orient Bounds', c=self.orient_bounds)
 
-                with pm.columnLayout(cal='left'):
-                    pm.text(l='Pivot:')
-                    self.pivType = pm.radioButtonGrp(nrb=2, labelArray2=['Selection', 'Custom'], cw2=[64, 64],
-                                                     cc=self._piv_change, sl=1)
-                    with pm.rowLayout(nc=3, en=False) as self.pivPos:
-                        pm.text('POS:')
-                        self.pivU = pm.floatField()
-                        self.pivV = pm.floatField()
-                    self.sampleSel = pm.button(l='Sample Selection', height=18, en=False, c=self.sample_sel_cmd)
+            pm.separator(st='in', width=160, height=8)
+
+            with pm.columnLayout(cal='left'):
+                pm.text(l='Pivot:')
+                self.pivType = pm.radioButtonGrp(nrb=2, labelArray2=['Selection', 'Custom'], cw2=[64, 64],
+                                                 cc=self._piv_change, sl=1)
+                with pm.rowLayout(nc=3, en=False) as self.pivPos:
+                    pm.text('POS:')
+                    self.pivU = pm.floatField()
+                    self.pivV = pm.floatField()
+                self.sampleSel = pm.button(l='Sample Selection', height=18, en=False, c=self.sample_sel_cmd)
 
     def _piv_change(self, *args):
         if self.pivType.getSelect() == 1:
@@ -186,10 +309,26 @@ class TransformUI(object):
         self.pivU.setValue(piv[0])
         self.pivV.setValue(piv[1])
 
+    def apply(self, matrix):
+        """
+        Transform the selected uvs by matrix, written straight away as one undoable step so undo and Maya's
+        own uv tools always see the uvs as they are on screen
+        """
+        edits = []
+        for mesh, ids in UV().get_meshes():
+            sel = ids.mask(len(mesh))
+            u, v = mesh.u.copy(), mesh.v.copy()
+            u[sel], v[sel] = core.transform_uvs(mesh.u[sel], mesh.v[sel], matrix)
+            edits.append((mesh, u, v))
+        write_uvs(edits)
+
+    @traced('TransformUI.move')
     @move_fix
     def move(self, u=0, v=0):
-        pm.polyEditUV(uValue=self.manipValue.getValue() * u, vValue=self.manipValue.getValue() * v)
+        offset = (self.manipValue.getValue() * u, self.manipValue.getValue() * v)
+        self.apply(core.affine2d(offset=offset))
 
+    @traced('TransformUI.rotate')
     def rotate(self, angle=None, dir='ccw'):
         if angle is None:
             angle = self.manipValue.getValue()
@@ -199,21 +338,23 @@ class TransformUI(object):
         elif dir == 'cw':
             dir = -1
 
-        pm.polyEditUV(pu=self.piv_loc()[0], pv=self.piv_loc()[1], angle=angle * dir)
+        self.apply(core.affine2d(angle * dir, pivot=self.piv_loc()))
 
+    @traced('TransformUI.scale')
     def scale(self, axis=None, flip=False):
         if axis == 'u':
             u = self.manipValue.getValue()
-            v = 0
+            v = 1
         elif axis == 'v':
-            u = 0
+            u = 1
             v = self.manipValue.getValue()
         else:
             u = self.manipValue.getValue()
             v = self.manipValue.getValue()
 
-        pm.polyEditUV(pu=self.piv_loc()[0], pv=self.piv_loc()[1], su=u, sv=v)
+        self.apply(core.affine2d(su=u, sv=v, pivot=self.piv_loc()))
 
+    @traced('TransformUI.flip')
     def flip(self, axis='u'):
         if axis == 'u':
             u = -1
@@ -222,56 +363,150 @@ class TransformUI(object):
             u = 1
             v = -1
 
-        pm.polyEditUV(pu=self.piv_loc()[0], scaleU=u, scaleV=v)
+        self.apply(core.affine2d(su=u, sv=v, pivot=self.piv_loc()))
 
-    def orient_edge(self, *args):  # FIXME
-        pass
-
-    def orient_bounds(self, *args):  # FIXME
-        pass
+    def group_pivots(self, centers):
+        """
+        Per shell pivots for the Selection pivot type, the custom pivot otherwise
+        """
+        if self.pivType.getSelect() == 1:
+            return centers[:, 0], centers[:, 1]
+        return self.pivU.getValue(), self.pivV.getValue()
+
+    @traced('TransformUI.orient_edge')
+    def orient_edge(self, *args):
+        """
+        Rotate every shell so its selected edge lines up with the closest axis
+        """
+        batch = core.UVBatch()
+        for mesh, ids in UV().get_meshes():
+            shells = uv_cache.shells(mesh)
+            sel = ids.mask(len(mesh))
+            angle, center = core.fit_lines(mesh.u[sel], mesh.v[sel], shells.labels[sel], len(shells))
+            touched = shells.touched(ids)
+            touched = touched[~np.isnan(angle[touched])]
+            if not len(touched):
+                continue
+            pu, pv = self.group_pivots(center[touched])
+            batch.add_groups(mesh, *shells.subset(touched), angle=core.axis_rotation(angle[touched]), pu=pu, pv=pv)
+
+        if not len(batch):
+            pm.warning('Select an edge or at least two uvs per shell')
+            return
+        write_uvs(batch.apply())
+
+    @traced('TransformUI.orient_bounds')
+    def orient_bounds(self, *args):
+        """
+        Rotate every selected shell onto its minimum area bounding rectangle
+        """
+        batch = core.UVBatch()
+        for mesh, ids in UV().get_meshes():
+            shells = uv_cache.shells(mesh)
+            touched = shells.touched(ids)
+            order, offsets = shells.subset(touched)
+            warm = prefetch.result('shells', mesh)
+            if warm is not None and warm[0] is shells:
+                angle, center, size = [i[touched] for i in warm[1]]
+            else:
+                angle, center, size = core.min_area_rects(mesh.u, mesh.v, order, offsets)
+            pu, pv = self.group_pivots(center)
+            batch.add_groups(mesh, order, offsets, angle=core.axis_rotation(angle), pu=pu, pv=pv)
+        write_uvs(batch.apply())
 
 
 class SetEditorUI(object):
     def __init__(self):
-        with pm.frameLayout(l='Set Editor:', cll=True, cl=False, bs='out') as setUI:
-            with pm.columnLayout(width=162):
-                self.uvs = pm.textScrollList(w=160, h=72,
-                                             sc=self.select_set,
-                                             dcc=self.rename_set,
-                                             dkc=self.delete_set)
-                self.update_sets()
-
-                with pm.rowLayout(nc=3):
-                    pm.button(l='New', c=self.add_set)
-                    pm.button(l='Copy', c=self.dup_set)
-                    pm.button(l='UV Linking', c=lambda *args: pm.mel.UVCentricUVLinkingEditor())
-
-        pm.scriptJob(event=['SelectionChanged', self.update_sets], protected=True, p=setUI)
-
-    def update_sets(self, *args):
-        self.uvs.removeAll()
-        sel = pm.selected()
+        self.items = []
+        self.setnames = OrderedDict()  # shape: list entries, refreshed by uv set callbacks
+        self.callbacks = {}
+        self.pending = False
+
+        self.panel = LazyFrame('Set Editor:', self.build, expand=self.queue_update)
+        pm.scriptJob(event=['SelectionChanged', self.queue_update], protected=True, p=self.panel.frame)
+        pm.scriptJob(uiDeleted=[self.panel.frame, self.remove_callbacks], runOnce=True)
+
+    def build(self):
+        with pm.columnLayout(width=162):
+            self.uvs = pm.textScrollList(w=160, h=72,
+                                         sc=self.select_set,
+                                         dcc=self.rename_set,
+                                         dkc=self.delete_set)
+            self.update_sets()
 
-        if all(isinstance(i, pm.nt.Transform) for i in sel):
-            sel = [i.getShape() for i in sel]
+            with pm.rowLayout(nc=3):
+                pm.button(l='New', c=self.add_set)
+                pm.button(l='Copy', c=self.dup_set)
+                pm.button(l='UV Linking', c=lambda *args: pm.mel.UVCentricUVLinkingEditor())
 
-        elif all(isinstance(i, pm.Component) for i in sel):
-            sel = [sel[0].node()]
+    def queue_update(self, *args):
+        """
+        Collapse a burst of selection changes into one update once Maya is idle
+        """
+        if self.pending:
+            return
+        self.pending = True
+        pm.evalDeferred(self._deferred_update, lowestPriority=True)
 
-        try:
-            uvsets = []
-            for obj in sel:
-                for uvSet in obj.getUVSetNames():
-                    uvsets.append('{0} | {1}'.format(obj.getParent(), uvSet))
-            self.uvs.append(uvsets)
-        except:
-            pass
+    def _deferred_update(self):
+        self.pending = False
+        frame = self.panel.frame
+        if not self.panel.built or not pm.frameLayout(frame, exists=True) or frame.getCollapse():
+            return
+        self.update_sets()
+
+    def _uvset_changed(self, node, uvset, msgtype, shape):
+        self.setnames.pop(shape, None)
+        self.queue_update()
+
+    def _forget(self, shape):
+        self.setnames.pop(shape, None)
+        callback = self.callbacks.pop(shape, None)
+        if callback is not None:
+            om.MMessage.removeCallback(callback)
+
+    def remove_callbacks(self, *args):
+        for shape in list(self.callbacks):
+            self._forget(shape)
+
+    @traced('SetEditorUI.update_sets')
+    def update_sets(self, rebuild=False):
+        if rebuild:
+            self.setnames.clear()
+
+        dags = get_selected_meshes()
+        shapes = [i.fullPathName() for i in dags]
+        for shape in set(self.callbacks) - set(shapes):
+            self._forget(shape)
+
+        items = []
+        for dag, shape in zip(dags, shapes):
+            if shape not in self.setnames:
+                parent = om.MDagPath(dag)
+                parent.pop()
+                self.setnames[shape] = ['{0} | {1}'.format(parent.partialPathName(), uvSet)
+                                        for uvSet in backend.uvset_names(shape)]
+            if shape not in self.callbacks:
+                self.callbacks[shape] = om.MPolyMessage.addUVSetChangedCallback(dag.node(), self._uvset_changed,
+                                                                                 shape)
+            items.extend(self.setnames[shape])
+
+        # most selection changes add to the end of the list, only rebuild when something earlier changed
+        if items != self.items:
+            if self.items == items[:len(self.items)]:
+                self.uvs.append(items[len(self.items):])
+            else:
+                self.uvs.removeAll()
+                self.uvs.append(items)
+            self.items = items
 
         # Select Current UV Set
-        try:
-            self.uvs.setSelectItem('{0} | {1}'.format(sel[0].getParent(), sel[0].getCurrentUVSetName()))
-        except:
-            pass
+        if dags:
+            parent = om.MDagPath(dags[0])
+            parent.pop()
+            current = '{0} | {1}'.format(parent.partialPathName(), backend.current_uvset(shapes[0]))
+            if current in self.items:
+                self.uvs.setSelectItem(current)
 
     def select_set(self, *args):
         uvset = self.uvs.getSelectItem()[0].split(' | ')
@@ -287,16 +522,16 @@ class SetEditorUI(object):
         if bdialog == 'OK':
             uvSet = self.uvs.getSelectItem()[0].split(' | ')
             pm.polyUVSet(uvSet[0], rename=True, uvSet=uvSet[1], newUVSet=pm.promptDialog(q=True, text=True))
-            self.update_sets()
+            self.update_sets(rebuild=True)
 
     def delete_set(self, *args):
         uvset = self.uvs.getSelectItem()[0].split(' | ')
         try:
             pm.polyUVSet(uvset[0], delete=True, uvSet=uvset[1])
-            self.update_sets()
+            self.update_sets(rebuild=True)
         except RuntimeError:
             pm.warning('The defualt uv set cannot be deleted.')
-            self.update_sets()
+            self.update_sets(rebuild=True)
 
     def add_set(self, *args):
         uvset = self.uvs.getSelectItem()[0].split(' | ')
@@ -308,7 +543,7 @@ class SetEditorUI(object):
                                   dismissString='Cancel')
         if bdialog == 'OK':
             pm.polyUVSet(uvset[0], create=True, uvSet=pm.promptDialog(q=True, text=True))
-            self.update_sets()
+            self.update_sets(rebuild=True)
 
     def dup_set(self, *args):
         uvset = self.uvs.getSelectItem()[0].split(' | ')
@@ -320,50 +555,125 @@ class SetEditorUI(object):
                                   dismissString='Cancel')
         if bdialog == 'OK':
             pm.polyUVSet(uvset[0], copy=True, uvSet=uvset[1], newUVSet=pm.promptDialog(q=True, text=True))
-            self.update_sets()
+            self.update_sets(rebuild=True)
 
 
 class DensityUI(object):
     def __init__(self, opts):
         self.opts = opts
-        with pm.frameLayout(l='Texel Density:', cll=True, cl=False, bs='out'):
-            with pm.columnLayout(width=162):
-                with pm.rowLayout(nc=2):
-                    pm.text(l='Pixels Per Unit:')
-                    self.texelDensity = pm.floatField(v=1)
-
-                with pm.rowColumnLayout(nc=2):
-                    pm.button(l='Set Density', c=self.set_density)
-                    pm.button(l='Sample Density', c=self.sample_density)
-
+        self.stats = None
+        self.reports = []
+        self.panel = LazyFrame('Texel Density:', self.build)
+
+    def build(self):
+        with pm.columnLayout(width=162):
+            with pm.rowLayout(nc=2):
+                pm.text(l='Pixels Per Unit:')
+                self.texelDensity = pm.floatField(v=1)
+
+            with pm.rowColumnLayout(nc=2):
+                setdensity = pm.button(l='Set Density', c=self.set_density)
+                pm.popupMenu(button=3, p=setdensity, pmc=self.unfold_density)
+                pm.button(l='Sample Density', c=self.sample_density)
+
+            pm.separator(st='in', width=160, height=8)
+
+            with pm.rowLayout(nc=2):
+                self.metric = pm.optionMenu(width=80)
+                for key in core.DISTORTION_RANGES:
+                    pm.menuItem(l=key.capitalize())
+                heatmap = pm.button(l='Distortion', c=self.show_distortion)
+                pm.popupMenu(button=3, p=heatmap, pmc=lambda *args: write_heatmap(self.reports, None))
+
+    @traced('DensityUI.set_density')
     def set_density(self, *args):
+        start = time.time()
+        edits = density_uvs(UV().get_meshes(), self.texelDensity.getValue(),
+                            self.opts.width.getValue(), self.opts.height.getValue())
+        write_uvs(edits)
+        pm.displayInfo('Set Density: scaled {0} meshes in {1:.3f}s'.format(len(edits), time.time() - start))
+
+    @traced('DensityUI.unfold_density')
+    def unfold_density(self, *args):
+        """
+        Unfold with scale instead of scaling shells, for geometry that needs relaxing as well
+        """
         sel = pm.selected()
+        txscale = self.texelDensity.getValue() / math.sqrt(self.opts.width.getValue() * self.opts.height.getValue())
 
-        for i in sel:
-            txscale = self.texelDensity.getValue() / self.opts.width.getValue()
-            pm.unfold(i, i=0, us=True, applyToShell=False, s=txscale)
-
+        start = time.time()
+        done = 0
+        pm.progressWindow(title='Set Density', progress=0, max=max(len(sel), 1), isInterruptable=True)
+        try:
+            for i in sel:
+                if pm.progressWindow(q=True, isCancelled=True):
+                    break
+                pm.progressWindow(e=True, progress=done, status=str(i))
+                tracer.count('unfold')
+                pm.unfold(i, i=0, us=True, applyToShell=False, s=txscale)
+                done += 1
+        finally:
+            pm.progressWindow(endProgress=True)
+        pm.displayInfo('Set Density: unfolded {0}/{1} objects in {2:.3f}s'.format(done, len(sel), time.time() - start))
+
+    @traced('DensityUI.sample_density')
     def sample_density(self, *args):
-        sel = pm.ls(pm.polyListComponentConversion(pm.selected(), tf=True), fl=True)
+        self.stats = prefetch.density()
+        if self.stats is None:
+            self.stats = self.selection_density()
+        if self.stats is None:
+            return
 
-        ratios = []
-        for i in sel:
-            ratios.append(math.sqrt(i.getUVArea() / i.getArea()))
-        ratio = (sum(ratios) / len(sel)) * self.opts.width.getValue()
-        self.texelDensity.setValue(ratio)
+        width = self.opts.width.getValue()
+        self.texelDensity.setValue(self.stats['mean'] * width)
+        pm.displayInfo('Texel Density: mean {0:.2f}, {1}'.format(
+            self.stats['mean'] * width,
+            ', '.join('p{0} {1:.2f}'.format(k, v * width) for k, v in self.stats['percentiles'].items())))
+
+    @traced('DensityUI.show_distortion')
+    def show_distortion(self, *args):
+        """
+        Color the faces of the selected meshes by uv distortion and print a summary per mesh
+        """
+        metric = self.metric.getValue().lower()
+        # meshes deleted or renamed since the last run have nothing left to clear
+        write_heatmap([i for i in self.reports if pm.objExists(i[0].name)], None)
+        self.reports = distortion_meshes([(i, None) for i in get_selected_meshes()])
+        write_heatmap(self.reports, metric)
+        for uvs, metrics, world in self.reports:
+            stats = core.distortion_stats(metrics, world)
+            pm.displayInfo('{0} ({1}): {2} mean {3:.3f}, p95 {4:.3f}, {5} degenerate of {6} faces'.format(
+                uvs.name, uvs.uvset, metric, stats[metric]['mean'], stats[metric]['percentiles'][95],
+                stats['degenerate'], len(world)))
+
+    @staticmethod
+    def selection_density():
+        densities, areas = [], []
+        for dag, ids in get_face_selection():
+            uvs = get_mesh_uvs(dag)
+            world, uv = get_face_areas(dag, uvs)
+            ids = ids[uvs.uv_counts[ids] > 0]
+            densities.append(core.texel_density(world[ids], uv[ids]))
+            tracer.tag('faces', len(ids))
+            areas.append(world[ids])
+        if not densities:
+            return None
+        return core.density_stats(np.concatenate(densities), np.concatenate(areas))
 
 
 class SnapshotUI(object):
     def __init__(self, opts):
         self.opts = opts
-        with pm.frameLayout(l='UV Snapshot:', cll=True, cl=False, bs='out'):
-            with pm.columnLayout(width=162):
-                self.path = pm.textFieldButtonGrp(l='Path:', bl='...', cw3=[28, 104, 32], bc=self.set_path)
-                self.col = pm.colorSliderGrp(l='Color:', cw3=[32, 48, 74])
-                with pm.rowLayout(nc=2):
-                    self.of = pm.checkBox(l='Open File')
-                    self.aa = pm.checkBox(l='Anti-Alias', v=True)
-                pm.button(l='Save Snapshot', width=156, c=self.snap_shot)
+        self.panel = LazyFrame('UV Snapshot:', self.build)
+
+    def build(self):
+        with pm.columnLayout(width=162):
+            self.path = pm.textFieldButtonGrp(l='Path:', bl='...', cw3=[28, 104, 32], bc=self.set_path)
+            self.col = pm.colorSliderGrp(l='Color:', cw3=[32, 48, 74])
+            with pm.rowLayout(nc=2):
+                self.of = pm.checkBox(l='Open File')
+                self.aa = pm.checkBox(l='Anti-Alias', v=True)
+            pm.button(l='Save Snapshot', width=156, c=self.snap_shot)
 
     def set_path(self, *args):
         snappath = pm.fileDialog2(fm=0, okc='Save', ff='Targa (*.tga);;PNG (*.png);;JPEG (*.jpg);;TIFF (*.tif)')
@@ -371,34 +681,92 @@ class SnapshotUI(object):
             self.path.setText(snappath[0])
 
     def snap_shot(self, *args):
+        from pymel.util.common import path
         snappath = path(self.path.getText())
         col = [i * 255 for i in self.col.getRgbValue()]
 
-        pm.uvSnapshot(name=snappath, ff=snappath.ext[1:],
-                      aa=self.aa.getValue(), r=col[0], g=col[1], b=col[2], o=True,
-                      xr=self.opts.width.getValue(), yr=self.opts.height.getValue())
+        try:
+            core.render_snapshot([get_mesh_uvs(dag) for dag in get_selected_meshes()], snappath,
+                                 self.opts.width.getValue(), self.opts.height.getValue(),
+                                 color=col, aa=self.aa.getValue())
+        except ImportError:  # JPEG needs Pillow, let Maya do it
+            pm.uvSnapshot(name=snappath, ff=snappath.ext[1:],
+                          aa=self.aa.getValue(), r=col[0], g=col[1], b=col[2], o=True,
+                          xr=self.opts.width.getValue(), yr=self.opts.height.getValue())
 
         if self.of.getValue():
             os.startfile(snappath)
 
 
+class ValidateUI(object):
+    def __init__(self):
+        self.reports = []
+        self.panel = LazyFrame('Validate:', self.build)
+
+    def build(self):
+        with pm.columnLayout(width=162):
+            with pm.rowLayout(nc=2):
+                self.flipped = pm.checkBox(l='Flipped', v=True)
+                self.overlaps = pm.checkBox(l='Overlaps', v=True)
+            self.select = pm.checkBox(l='Select Problem Faces', v=True)
+            with pm.rowColumnLayout(nc=2):
+                pm.button(l='Check Selected', c=lambda *args: self.validate(get_selected_meshes()))
+                pm.button(l='Check Scene', c=lambda *args: self.validate(pm.ls(type='mesh', ni=True)))
+
+    @traced('ValidateUI.validate')
+    def validate(self, meshes):
+        # no worker pool inside the Maya session, the batch runs the checks in separate mayapy processes
+        self.reports = validate_meshes([(i, None) for i in meshes], processes=1, flipped=self.flipped.getValue(),
+                                       overlaps=self.overlaps.getValue())
+        faces = []
+        bad = 0
+        for report in self.reports:
+            found = [report.get(i, []) for i in ('flipped', 'degenerate', 'overlapping')]
+            pm.displayInfo('{0} ({1}): {2} flipped, {3} degenerate, {4} overlapping of {5} faces'.format(
+                report['mesh'], report['uvset'], len(found[0]), len(found[1]), len(found[2]), report['faces']))
+            found = np.unique(np.concatenate(found)).astype(np.int64)
+            if len(found):
+                faces += core.component_names(report['mesh'], found, 'f')
+                bad += 1
+
+        if self.select.getValue():
+            pm.select(faces)
+        if bad:
+            pm.warning('UV problems on {0} of {1} meshes, see the script editor'.format(bad, len(self.reports)))
+
+
 # ToolBar UI Stuff
 class ToolsUI(object):
+    """
+    Toolbar group behind a toggle button. build(par) makes the buttons the first time the group is shown,
+    groups stay hidden (and unbuilt) across sessions through an optionVar.
+    """
+
     def __init__(self, par):
-        self.sep = pm.iconTextButton(image1='textureEditorOpenBar.png', p=par, c=self.toggle_visible)
+        self.key = 'pbUVHide' + type(self).__name__
+        self.layout = None
+        hidden = pm.optionVar.get(self.key, 0)
+        self.sep = pm.iconTextButton(image1='textureEditorCloseBar.png' if hidden else 'textureEditorOpenBar.png',
+                                     p=par, c=self.toggle_visible)
+        self.holder = pm.columnLayout(p=par, vis=not hidden)
+        if not hidden:
+            self.build(self.holder)
+
+    def build(self, par):
+        raise NotImplementedError
 
     def toggle_visible(self, *args):
-        if self.layout.getVisible():
-            self.layout.setVisible(False)
-            self.sep.setImage1('textureEditorCloseBar.png')
-        else:
-            self.layout.setVisible(True)
-            self.sep.setImage1('textureEditorOpenBar.png')
+        visible = not self.holder.getVisible()
+        if visible and self.layout is None:
+            self.build(self.holder)
+            save_annotations()
+        self.holder.setVisible(visible)
+        self.sep.setImage1('textureEditorOpenBar.png' if visible else 'textureEditorCloseBar.png')
+        pm.optionVar[self.key] = int(not visible)
 
 
 class Tools01UI(ToolsUI):
-    def __init__(self, par):
-        ToolsUI.__init__(self, par)
+    def build(self, par):
         with pm.gridLayout(p=par, nc=3, cwh=[26, 26]) as self.layout:
             pm.toolButton(dcc=lambda *args: pm.toolPropertyWindow,
                           collection='toolCluster',
@@ -432,16 +800,15 @@ class Tools01UI(ToolsUI):
 
 
 class CutSewUI(ToolsUI):
-    def __init__(self, par):
-        ToolsUI.__init__(self, par)
+    def build(self, par):
         with pm.gridLayout(p=par, nc=3, cwh=[26, 26]) as self.layout:
             pm.iconTextButton(image1='cutUV.png',
-                              c=lambda *args: pm.polyMapCut(),
+                              c=lambda *args: self.cut_uv(),
                               commandRepeatable=True,
-                              ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kSeparateUVsAlongSelectedEdgesAnnot'))
+                              ann=ui_res('m_textureWindowCreateToolBar.kSeparateUVsAlongSelectedEdgesAnnot'))
 
             pm.iconTextButton(image1='polySplitUVs.png',
-                              ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kSplitSelectedUV'),
+                              ann=ui_res('m_textureWindowCreateToolBar.kSplitSelectedUV'),
                               c=lambda *args: pm.mel.polySplitTextureUV(),
                               commandRepeatable=True)
 
@@ -450,105 +817,204 @@ class CutSewUI(ToolsUI):
                               commandRepeatable=True)
 
             sewuv = pm.iconTextButton(image1='sew_uv.png',
-                                      c=self.sew_uv, commandRepeatable=True,
-                                      ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kSewSelectedUVsTogetherAnnot'))
-            pm.popupMenu(button=3, p=sewuv, pmc=lambda *args: pm.mel.performPolyMergeUV(1))
+                                      c=lambda *args: self.sew_uv(), commandRepeatable=True,
+                                      ann=ui_res('m_textureWindowCreateToolBar.kSewSelectedUVsTogetherAnnot'))
+            with pm.popupMenu(button=3, parent=sewuv):
+                pm.menuItem(l='Merge Distance...', c=self.set_merge_distance)
+                pm.menuItem(d=True)
+                pm.menuItem(l='Maya Merge UVs...', c=lambda *args: pm.mel.performPolyMergeUV(1))
 
             movesewuv = pm.iconTextButton(image1='moveSewUV.png',
                                           c=lambda *args: pm.mel.performPolyMapSewMove(0),
                                           commandRepeatable=True,
-                                          ann=pm.mel.uiRes(
+                                          ann=ui_res(
                                               'm_textureWindowCreateToolBar.kMoveAndSewSelectedEdgesAnnot'))
             pm.popupMenu(button=3, p=movesewuv, pmc=lambda *args: pm.mel.performPolyMapSewMove(1))
 
-    def sew_uv(self):  # FIXME
-        edges = pm.filterExpand(ex=False, selectionMask=32)
-        uvs = pm.filterExpand(ex=False, selectionMask=35)
-        if edges:
-            pm.polyMapSew()
-        if uvs:
-            pm.mel.performPolyMergeUV(0)
+    @traced('CutSewUI.cut_uv')
+    def cut_uv(self):
+        """
+        Split the uvs along the selected edges, or around the selected faces
+        """
+        write_layouts(cut_uvs([(get_mesh_uvs(dag), ids) for dag, ids in get_edge_selection()]))
+
+    @traced('CutSewUI.sew_uv')
+    def sew_uv(self):
+        """
+        Sew the selected edges and merge the selected uvs that are within the merge distance, one edit per mesh
+        """
+        edges = OrderedDict((dag.fullPathName(), ids) for dag, ids in get_components(kind='edges', sources=['edges']))
+        uvs = OrderedDict((dag.fullPathName(), ids) for dag, ids in get_components(kind='uvs', sources=['uvs']))
+        none = np.zeros(0, dtype=np.int64)
+        meshes = [(get_mesh_uvs(name), edges.get(name, none), uvs.get(name, none))
+                  for name in OrderedDict.fromkeys(list(edges) + list(uvs))]
+        write_layouts(sew_uvs(meshes, pm.optionVar.get('pbUVMergeDistance', 0.01)))
+
+    def set_merge_distance(self, *args):
+        bdialog = pm.promptDialog(title='Merge Distance',
+                                  message='Max UV Distance:',
+                                  text=str(pm.optionVar.get('pbUVMergeDistance', 0.01)),
+                                  button=['OK', 'Cancel'],
+                                  defaultButton='OK',
+                                  cancelButton='Cancel',
+                                  dismissString='Cancel')
+        if bdialog == 'OK':
+            try:
+                pm.optionVar['pbUVMergeDistance'] = float(pm.promptDialog(q=True, text=True))
+            except ValueError:
+                pm.warning('Merge distance has to be a number.')
 
+    @traced('CutSewUI.tear_face')
     def tear_face(self):
-        sel = pm.selected()
-        movetool = pm.melGlobals['gMove']
-        if all(isinstance(i, pm.MeshFace) for i in sel):
-            if len(sel) == 1:
-                pm.polyMapCut(sel)
-                sel = pm.polyListComponentConversion(sel, ff=True, tuv=True)
-                pm.select(sel)
-            else:
-                sewSel = pm.polyListComponentConversion(ff=True, te=True, internal=True)
-                pm.polyMapCut(sel)
-                pm.polyMapSewMove(sewSel, nf=10, lps=0, ch=1)
-                sel = pm.polyListComponentConversion(sel, ff=True, tuv=True)
-                pm.select(sel)
-            pm.setToolTo(movetool)
+        """
+        Cut the selected faces out along their outline, edges between them stay sewn
+        """
+        sel = selected_components()
+        if not sel or any(component_kind(comp) != 'faces' for dag, comps in sel.values() for comp in comps):
+            return
+        faces = get_components(kind='faces')
+        self.cut_uv()
+
+        uvs = []
+        for dag, ids in faces:
+            uvs += core.component_names(dag.fullPathName(), get_topology(dag).face_uvs(get_mesh_uvs(dag), ids))
+        pm.select(uvs)
+        pm.setToolTo(pm.melGlobals['gMove'])
 
 
 class UnfoldUI(ToolsUI):
-    def __init__(self, par):
+    def __init__(self, par, opts):
+        self.opts = opts
         ToolsUI.__init__(self, par)
+
+    def build(self, par):
         with pm.gridLayout(p=par, nc=2, cwh=[26, 26]) as self.layout:
             unfold = pm.iconTextButton(image1='textureEditorUnfoldUVs.png',
-                                       ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kUnfoldAnnot'),
-                                       c=lambda *args: pm.mel.performUnfold(0),
+                                       ann=ui_res('m_textureWindowCreateToolBar.kUnfoldAnnot'),
+                                       c=lambda *args: self.unfold(0),
                                        commandRepeatable=True)
-            pm.popupMenu(button=3, p=unfold, pmc=lambda *args: pm.mel.performUnfold(1))
+            with pm.popupMenu(button=3, parent=unfold):
+                self.pinBorder = pm.menuItem(l='Pin Border', cb=pm.optionVar.get('pbUVUnfoldPinBorder', 0),
+                                             c=self.set_pin_border)
+                pm.menuItem(d=True)
+                pm.menuItem(l='Maya Unfold...', c=lambda *args: pm.mel.performUnfold(1))
 
             unfoldsep = pm.iconTextButton(image1='textureEditorUnfoldUVs.png',
                                           ann='Unfold selected UVs along U or V',
-                                          c=lambda *args: self.unfold_sep_cmd(2))
-            pm.popupMenu(button=3, p=unfoldsep, pmc=lambda *args: self.unfold_sep_cmd(1))
+                                          c=lambda *args: self.unfold(2))
+            pm.popupMenu(button=3, p=unfoldsep, pmc=lambda *args: self.unfold(1))
 
             relaxuv = pm.iconTextButton(image1='relaxUV.png',
-                                        ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kRelaxUVsAnnot'),
+                                        ann=ui_res('m_textureWindowCreateToolBar.kRelaxUVsAnnot'),
                                         c=lambda *args: pm.mel.performPolyUntangleUV('relax', 0))
             pm.popupMenu(button=3, p=relaxuv, pmc=lambda *args: pm.mel.performPolyUntangleUV('relax', 1))
 
-            pm.iconTextButton(image='Null',
-                              c=lambda *args: self.match_shell(0.01),  # FIXME maxRange stuff
-                              commandRepeatable=True,
-                              ann='Match Selected Shell to closest Shell')
-
-    def unfold_sep_cmd(self, axis):
-        pm.unfold(i=pm.optionVar['unfoldIterations'],
-                  ss=pm.optionVar['unfoldStopThreshold'],
-                  gb=pm.optionVar['unfoldGlobalBlend'],
-                  gmb=pm.optionVar['unfoldGlobalMethodBlend'],
-                  pub=pm.optionVar['unfoldPinBorder'],
-                  ps=pm.optionVar['unfoldPinSelected'],
-                  oa=axis,
-                  useScale=False)
+            match = pm.iconTextButton(image='Null',
+                                      c=lambda *args: self.match_shell(),
+                                      commandRepeatable=True,
+                                      ann='Match Selected Shell to closest Shell')
+            with pm.popupMenu(button=3, parent=match):
+                pm.menuItem(l='Match Range...', c=self.set_match_range)
+                pm.menuItem(d=True)
+                pm.menuItem(l='Stack Identical Shells', c=lambda *args: self.stack_shells())
+                pm.menuItem(l='Unstack Identical Shells', c=lambda *args: self.stack_shells(unstack=True))
+
+    def set_pin_border(self, *args):
+        pm.optionVar['pbUVUnfoldPinBorder'] = int(self.pinBorder.getCheckBox())
+
+    @traced('UnfoldUI.unfold')
+    def unfold(self, axis=0):
+        """
+        Unfold the selected uvs freely (axis 0), along v only (1) or along u only (2)
+        """
+        edits, unconverged = unfold_uvs(UV().get_meshes(), axis, pm.optionVar.get('pbUVUnfoldPinBorder', 0),
+                                        processes=1)
+        write_uvs(edits)
+        if unconverged:
+            pm.warning('Unfold did not converge on {0}, run it again to refine it'.format(', '.join(unconverged)))
+
+    def set_match_range(self, *args):
+        bdialog = pm.promptDialog(title='Match Range',
+                                  message='Max UV Distance:',
+                                  text=str(pm.optionVar.get('pbUVMatchRange', 0.01)),
+                                  button=['OK', 'Cancel'],
+                                  defaultButton='OK',
+                                  cancelButton='Cancel',
+                                  dismissString='Cancel')
+        if bdialog == 'OK':
+            try:
+                pm.optionVar['pbUVMatchRange'] = float(pm.promptDialog(q=True, text=True))
+            except ValueError:
+                pm.warning('Match range has to be a number.')
 
-    def match_shell(self, maxrange):  # FIXME MAX Range set
+    @traced('UnfoldUI.stack_shells')
+    @move_fix
+    def stack_shells(self, unstack=False):
+        """
+        Put the selected shells that are copies of each other on top of each other, or side by side again
+        """
+        if unstack:
+            write_uvs(unstack_uvs(UV().get_meshes(), pm.optionVar.get('pbUVLayoutPadding', 4) /
+                                  float(self.opts.width.getValue())))
+        else:
+            write_uvs(stack_uvs(UV().get_meshes()))
+
+    @traced('UnfoldUI.match_shell')
+    def match_shell(self, maxrange=None):
+        if maxrange is None:
+            maxrange = pm.optionVar.get('pbUVMatchRange', 0.01)
+
+        meshes = OrderedDict()
+        snapids = OrderedDict()
+        for dag, ids in get_uv_selection():  # getUVs to match
+            meshes[dag.fullPathName()] = get_mesh_uvs(dag)
+            snapids[dag.fullPathName()] = ids
+        if not snapids:
+            return
 
-        snapuvs = pm.ls(pm.polyListComponentConversion(tuv=True), sl=True, fl=True)  # getUVs to match
+        # every uv of the highlighted objects that is not being snapped is a target
+        targets, owners = [], []
+        for obj in pm.ls(hl=True, fl=True):
+            dag = get_dag(obj.getShape())
+            name = dag.fullPathName()
+            if name not in meshes:
+                meshes[name] = get_mesh_uvs(dag)
+            mask = np.ones(len(meshes[name]), dtype=bool)
+            if name in snapids:
+                mask[snapids[name]] = False
+            targets.append(np.flatnonzero(mask))
+            owners.append(name)
+        if not targets:
+            return
 
-        objs = [i.getShape() for i in pm.ls(hl=True, fl=True)]
-        alluvs = pm.ls(pm.polyListComponentConversion(objs, tuv=True), fl=True)
-        alluvs = sorted(set(alluvs) - set(snapuvs))  # get all uvs and subtract from snap uvs
+        points = np.concatenate([np.column_stack((meshes[name].u[ids], meshes[name].v[ids]))
+                                 for name, ids in zip(owners, targets)])
+        queries = np.concatenate([np.column_stack((meshes[name].u[ids], meshes[name].v[ids]))
+                                  for name, ids in snapids.items()])
+        found = core.nearest_points(points, queries, maxrange)[0]
 
-        snappos = [pm.polyEditUV(i, q=True) for i in snapuvs]  # Get pos for snap and all
-        allpos = [pm.polyEditUV(i, q=True) for i in alluvs]
+        edits = []
+        start = 0
+        for name, ids in snapids.items():
+            hit = found[start:start + len(ids)]
+            start += len(ids)
+            if (hit < 0).all():
+                continue
+            mesh = meshes[name]
+            u, v = mesh.u.copy(), mesh.v.copy()
+            u[ids[hit >= 0]] = points[hit[hit >= 0], 0]
+            v[ids[hit >= 0]] = points[hit[hit >= 0], 1]
+            edits.append((mesh, u, v))
+        write_uvs(edits)
 
-        for i in range(len(snapuvs)):
-            inrange = []
-            for j in range(len(alluvs)):
-                x = snappos[i][0] - allpos[j][0]
-                y = snappos[i][1] - allpos[j][1]
-                dist = math.sqrt((x ** 2) + (y ** 2))
-                if dist < maxrange:
-                    inrange.append((allpos[j], dist))
 
-            if inrange:
-                inrange = min(inrange, key=lambda x: x[1])
-                pm.polyEditUV(snapuvs[i], u=inrange[0][0], v=inrange[0][1], r=False)
+# (u, v) side of the selection bounds each align button lines shells up with, -1 low, 0 center, 1 high
+ALIGN_SIDES = {'left': (-1, None), 'centerU': (0, None), 'right': (1, None),
+               'bottom': (None, -1), 'centerV': (None, 0), 'top': (None, 1)}
 
 
 class AlignUI(ToolsUI):
-    def __init__(self, par):
-        ToolsUI.__init__(self, par)
+    def build(self, par):
         with pm.gridLayout(p=par, nc=3, cwh=[26, 26]) as self.layout:
             pm.iconTextButton(image1='NS_alUVleft.bmp',
                               c=lambda *args: self.align_shells('left'),
@@ -570,38 +1036,14 @@ class AlignUI(ToolsUI):
                               c=lambda *args: self.align_shells('bottom'),
                               commandRepeatable=True)
 
+    @traced('AlignUI.align_shells')
     @move_fix
     def align_shells(self, align):
-        sel = UV()
-        sel.get_shells()
-
-        shellsuvs = []
-        for shell in sel.shells:
-            for uv in shell.uvs:
-                shellsuvs.append(uv)
-
-        alluvs = UV(shellsuvs)
-        alluvs.get_bounds()
-
-        for shell in sel.shells:
-            if align == 'left':
-                pm.polyEditUV(shell.uvs, u=alluvs.xMin - shell.xMin)
-            elif align == 'centerU':
-                pm.polyEditUV(shell.uvs, u=(alluvs.xMin + alluvs.xMax) / 2 - (shell.xMax + shell.xMin) / 2)
-            elif align == 'right':
-                pm.polyEditUV(shell.uvs, u=alluvs.xMin - shell.xMin)
-
-            elif align == 'top':
-                pm.polyEditUV(shell.uvs, v=alluvs.yMax - shell.yMax)
-            elif align == 'centerV':
-                pm.polyEditUV(shell.uvs, v=(alluvs.yMin + alluvs.yMax) / 2 - (shell.yMax + shell.xMin) / 2)
-            elif align == 'bottom':
-                pm.polyEditUV(shell.uvs, v=alluvs.yMin - shell.yMin)
+        write_uvs(align_uvs(UV().get_meshes(), align))
 
 
 class PushUI(ToolsUI):  # FIXME Annotations
-    def __init__(self, par):
-        ToolsUI.__init__(self, par)
+    def build(self, par):
         with pm.gridLayout(p=par, nc=3, cwh=[26, 26]) as self.layout:
             pm.iconTextButton(image1='pbUV/pushMinU.png',
                               c=lambda *args: pm.mel.alignUV(1, 1, 0, 0),
@@ -622,18 +1064,30 @@ class PushUI(ToolsUI):  # FIXME Annotations
                               c=lambda *args: pm.mel.alignUV(0, 0, 1, 1),
                               commandRepeatable=True)
 
+    @traced('PushUI.push_average')
     def push_average(self, dir):
         uvs = UV()
+        if not uvs.get_meshes():
+            return
         center = uvs.get_pivot()
-        if dir == 'u':
-            pm.polyEditUV(uvs.uvs, r=False, u=center[0])
-        if dir == 'v':
-            pm.polyEditUV(uvs.uvs, r=False, v=center[1])
+
+        batch = core.UVBatch()
+        for mesh, ids in uvs.get_meshes():
+            if dir == 'u':
+                batch.add(mesh, ids.indices(), su=0, pu=center[0])
+            if dir == 'v':
+                batch.add(mesh, ids.indices(), sv=0, pv=center[1])
+        write_uvs(batch.apply())
+
+
+# (u, v) side of the tile each snap button aligns to, -1 low, 0 center, 1 high
+SNAP_POSITIONS = {'topLeft': (-1, 1), 'topCenter': (0, 1), 'topRight': (1, 1),
+                  'centerLeft': (-1, 0), 'center': (0, 0), 'centerRight': (1, 0),
+                  'bottomLeft': (-1, -1), 'bottomCenter': (0, -1), 'bottomRight': (1, -1)}
 
 
 class SnapUI(ToolsUI):
-    def __init__(self, par):
-        ToolsUI.__init__(self, par)
+    def build(self, par):
         with pm.gridLayout(p=par, nc=3, cwh=[18, 18]) as self.layout:  # FIXME new icons, and annotations
             pm.iconTextButton(image1='NS_snapTopLeft.bmp', width=16, height=16,
                               c=lambda *args: self.snap_uvs('topLeft'),
@@ -648,9 +1102,12 @@ class SnapUI(ToolsUI):
             pm.iconTextButton(image1='NS_snapLeft.bmp', width=16, height=16,
                               c=lambda *args: self.snap_uvs('centerLeft'),
                               commandRepeatable=True)
-            pm.iconTextButton(image1='NS_snapCenter.bmp', width=16, height=16,
-                              c=lambda *args: self.snap_uvs('center'),
-                              commandRepeatable=True)
+            snapcenter = pm.iconTextButton(image1='NS_snapCenter.bmp', width=16, height=16,
+                                           c=lambda *args: self.snap_uvs('center'),
+                                           commandRepeatable=True)
+            with pm.popupMenu(button=3, parent=snapcenter):
+                self.pershell = pm.menuItem(l='Snap Each Shell', cb=pm.optionVar.get('pbUVSnapPerShell', 0),
+                                            c=self.set_pershell)
             pm.iconTextButton(image1='NS_snapRight.bmp', width=16, height=16,
                               c=lambda *args: self.snap_uvs('centerRight'),
                               commandRepeatable=True)
@@ -665,48 +1122,34 @@ class SnapUI(ToolsUI):
                               c=lambda *args: self.snap_uvs('bottomRight'),
                               commandRepeatable=True)
 
-    def snap_uvs(self, pos):
-        uvs = UV()
+    def set_pershell(self, *args):
+        pm.optionVar['pbUVSnapPerShell'] = int(self.pershell.getCheckBox())
 
-        piv = uvs.get_pivot()
-        bounds = uvs.get_bounds()
-        centeru = 0.5 - piv[0]
-        centerv = 0.5 - piv[1]
-
-        left = -bounds[0][0]
-        right = 1 - bounds[0][1]
-        top = 1 - bounds[1][1]
-        bottom = -bounds[1][0]
-
-        if pos == 'topLeft':
-            pm.polyEditUV(uvs.uvs, u=left, v=top)
-        if pos == 'topCenter':
-            pm.polyEditUV(uvs.uvs, u=centeru, v=top)
-        if pos == 'topRight':
-            pm.polyEditUV(uvs.uvs, u=right, v=top)
-        if pos == 'centerLeft':
-            pm.polyEditUV(uvs.uvs, u=left, v=centerv)
-        if pos == 'center':
-            pm.polyEditUV(uvs.uvs, u=centeru, v=centerv)
-        if pos == 'centerRight':
-            pm.polyEditUV(uvs.uvs, u=right, v=centerv)
-        if pos == 'bottomLeft':
-            pm.polyEditUV(uvs.uvs, u=left, v=bottom)
-        if pos == 'bottomCenter':
-            pm.polyEditUV(uvs.uvs, u=centeru, v=bottom)
-        if pos == 'bottomRight':
-            pm.polyEditUV(uvs.uvs, u=right, v=bottom)
+    @traced('SnapUI.snap_uvs')
+    def snap_uvs(self, pos):
+        write_uvs(snap_uvs(UV().get_meshes(), pos, pm.optionVar.get('pbUVSnapPerShell', 0)))
 
 
 class LayoutUI(ToolsUI):
-    def __init__(self, par):
+    def __init__(self, par, opts):
+        self.opts = opts
         ToolsUI.__init__(self, par)
+
+    def build(self, par):
         with pm.gridLayout(p=par, nc=2, cwh=[26, 26]) as self.layout:
             layoutbutton = pm.iconTextButton(image='layoutUV.png',
-                                             ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kSelectFacesToMoveAnnot'),
-                                             c=lambda *args: pm.mel.performPolyLayoutUV(0),
+                                             ann=ui_res('m_textureWindowCreateToolBar.kSelectFacesToMoveAnnot'),
+                                             c=lambda *args: self.layout_shells(),
                                              commandRepeatable=True)
-            pm.popupMenu(button=3, parent=layoutbutton, pmc=lambda *args: pm.mel.performPolyLayoutUV(1))
+            with pm.popupMenu(button=3, parent=layoutbutton):
+                pm.menuItem(l='Padding (Pixels)...', c=lambda *args: self.set_option('pbUVLayoutPadding', 4,
+                                                                                     'Padding (Pixels):', int))
+                pm.menuItem(l='UDIM Tiles...', c=lambda *args: self.set_option('pbUVLayoutTiles', '1001',
+                                                                              'UDIM Tiles (1001 1002 ...):', str))
+                self.rotate = pm.menuItem(l='Rotate Shells', cb=pm.optionVar.get('pbUVLayoutRotate', True),
+                                          c=self.set_rotate)
+                pm.menuItem(d=True)
+                pm.menuItem(l='Maya Layout...', c=lambda *args: pm.mel.performPolyLayoutUV(1))
 
             layout_u_or_v = pm.iconTextButton(image='layoutUV.png',  # FIXME new image
                                               ann='Select Faces to be moved in U or V Space',
@@ -714,35 +1157,64 @@ class LayoutUI(ToolsUI):
                                               commandRepeatable=True)
             pm.popupMenu(button=3, parent=layout_u_or_v, pmc=lambda *args: self.u_or_v(1))
 
-    def u_or_v(self, val):  # FIXME
-        if val == 0:
-            pass
-        else:
-            pass
+    def set_option(self, var, default, message, kind):
+        bdialog = pm.promptDialog(title='Layout Options',
+                                  message=message,
+                                  text=str(pm.optionVar.get(var, default)),
+                                  button=['OK', 'Cancel'],
+                                  defaultButton='OK',
+                                  cancelButton='Cancel',
+                                  dismissString='Cancel')
+        if bdialog == 'OK':
+            try:
+                pm.optionVar[var] = kind(pm.promptDialog(q=True, text=True))
+            except ValueError:
+                pm.warning('Invalid value for {0}.'.format(message.rstrip(':')))
+
+    def set_rotate(self, *args):
+        pm.optionVar['pbUVLayoutRotate'] = int(self.rotate.getCheckBox())
+
+    def padding(self):
+        pixels = pm.optionVar.get('pbUVLayoutPadding', 4)
+        return pixels / float(self.opts.width.getValue()), pixels / float(self.opts.height.getValue())
+
+    @traced('LayoutUI.layout_shells')
+    @move_fix
+    def layout_shells(self):
+        tiles = [int(i) for i in str(pm.optionVar.get('pbUVLayoutTiles', '1001')).split()] or [1001]
+        write_uvs(layout_uvs(UV().get_meshes(), tiles, self.padding(),
+                             bool(pm.optionVar.get('pbUVLayoutRotate', True))))
+
+    @traced('LayoutUI.u_or_v')
+    @move_fix
+    def u_or_v(self, val):
+        write_uvs(layout_axis_uvs(UV().get_meshes(), val, self.padding()[val]))
 
 
 class IsolateUI(ToolsUI):
     def __init__(self, par, editor):
         self.editor = editor
         ToolsUI.__init__(self, par)
+
+    def build(self, par):
         with pm.gridLayout(p=par, nc=2, cwh=[26, 26]) as self.layout:
             pm.iconTextCheckBox(image='uvIsolateSelect.png',
-                                ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kToggleIsolateSelectModeAnnot'),
+                                ann=ui_res('m_textureWindowCreateToolBar.kToggleIsolateSelectModeAnnot'),
                                 onc=lambda *args: self.set_isolate(True),
                                 ofc=lambda *args: self.set_isolate(False))
 
             pm.iconTextButton(image='uvIsolateSelectReset.png',
-                              ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kRemoveAllUVsAnnot'),
+                              ann=ui_res('m_textureWindowCreateToolBar.kRemoveAllUVsAnnot'),
                               c=lambda *args: pm.mel.textureEditorIsolateSelect(0),
                               commandRepeatable=True)
 
             pm.iconTextButton(image='uvIsolateSelectAdd.png',
-                              ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kAddSelectedUVsAnnot'),
+                              ann=ui_res('m_textureWindowCreateToolBar.kAddSelectedUVsAnnot'),
                               c=lambda *args: pm.mel.textureEditorIsolateSelect(1),
                               commandRepeatable=True)
 
             pm.iconTextButton(image='uvIsolateSelectRemove.png',
-                              ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kRemoveSelectedUVsAnnot'),
+                              ann=ui_res('m_textureWindowCreateToolBar.kRemoveSelectedUVsAnnot'),
                               c=lambda *args: pm.mel.textureEditorIsolateSelect(2),
                               commandRepeatable=True)
 
@@ -756,25 +1228,24 @@ class IsolateUI(ToolsUI):
 
 
 class ManipUI(ToolsUI):
-    def __init__(self, par):
-        ToolsUI.__init__(self, par)
-        with pm.columnLayout() as self.layout:
+    def build(self, par):
+        with pm.columnLayout(p=par) as self.layout:
             with pm.rowLayout(nc=4):
                 pm.floatField('uvEntryFieldU', precision=3, ed=True, width=46,
-                              ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kEnterValueTotransformInUAnnot'),
+                              ann=ui_res('m_textureWindowCreateToolBar.kEnterValueTotransformInUAnnot'),
                               cc=lambda *args: pm.mel.textureWindowUVEntryCommand(1))
 
                 pm.floatField('uvEntryFieldV', precision=3, ed=True, width=46,
-                              ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kEnterValueTotransformInVAnnot'),
+                              ann=ui_res('m_textureWindowCreateToolBar.kEnterValueTotransformInVAnnot'),
                               cc=lambda *args: pm.mel.textureWindowEntryCommand(0))
 
                 pm.iconTextButton(image1='uv_update.png',
-                                  ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kRefreshUVValuesAnnot'),
+                                  ann=ui_res('m_textureWindowCreateToolBar.kRefreshUVValuesAnnot'),
                                   c=self.uv_update,
                                   commandRepeatable=True)
 
                 pm.iconTextCheckBox('uvEntryTransformModeButton', image1='uvEntryToggle.png',
-                                    ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kUVTransformationEntryAnnot'),
+                                    ann=ui_res('m_textureWindowCreateToolBar.kUVTransformationEntryAnnot'),
                                     value=pm.melGlobals['gUVEntryTransformMode'],
                                     onc=lambda *args: pm.mel.uvEntryTransformModeCommand(),
                                     ofc=lambda *args: pm.mel.uvEntryTransformModeCommand())
@@ -791,20 +1262,20 @@ class ManipUI(ToolsUI):
                 pm.popupMenu('pasteUVButtonPopup', button=3, p=pasteuv, pmc=lambda *args: pm.mel.PolygonPasteOptions())
 
                 pm.iconTextButton('pasteUButton', image1='pasteUDisabled.png', en=False,
-                                  ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kPasteUValueAnnot'),
+                                  ann=ui_res('m_textureWindowCreateToolBar.kPasteUValueAnnot'),
                                   c=lambda *args: pm.mel.textureWindowCreateToolBar_uvPaste(1, 0))
 
                 pm.iconTextButton('pasteVButton', image1='pasteVDisabled.png', en=False,
-                                  ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kPasteVValueAnnot'),
+                                  ann=ui_res('m_textureWindowCreateToolBar.kPasteVValueAnnot'),
                                   c=lambda *args: pm.mel.textureWindowCreateToolBar_uvPaste(0, 1))
 
                 pm.iconTextCheckBox(image1='copyUVMode.png',
-                                    ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kToggleCopyPasteAnnot'),
+                                    ann=ui_res('m_textureWindowCreateToolBar.kToggleCopyPasteAnnot'),
                                     onc=lambda *args: pm.mel.textureWindowCreateToolBar_copyPasteMode(1),
                                     ofc=lambda *args: pm.mel.textureWindowCreateToolBar_copyPasteMode(0))
 
                 pm.iconTextButton(image1='cycleUVs.png',
-                                  ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kCycleUVsCounterClockwiseAnnot'),
+                                  ann=ui_res('m_textureWindowCreateToolBar.kCycleUVsCounterClockwiseAnnot'),
                                   c=lambda *args: pm.mel.polyRotateUVsByVertex(),
                                   commandRepeatable=True)
 
@@ -818,12 +1289,14 @@ class Opts01UI(ToolsUI):
     def __init__(self, par, editor):
         self.editor = editor
         ToolsUI.__init__(self, par)
+
+    def build(self, par):
         with pm.columnLayout(p=par) as self.layout:
             with pm.rowLayout(nc=4):
                 self.imageDisplay = pm.iconTextCheckBox('imageDisplayButton', image1='imageDisplay.png',
                                                         v=pm.textureWindow(self.editor, q=True, id=True),
                                                         cc=self.toggle_image_display,
-                                                        ann=pm.mel.uiRes(
+                                                        ann=ui_res(
                                                             'm_textureWindowCreateToolBar.kDisplayImageAnnot'))
                 pm.popupMenu(button=3, p=self.imageDisplay,
                              pmc=lambda *args: pm.mel.performTextureViewImageRangeOptions(1))
@@ -832,7 +1305,7 @@ class Opts01UI(ToolsUI):
                                     value=pm.textureWindow(self.editor, q=True, displaySolidMap=True),
                                     onc=lambda *args: pm.textureWindow(self.editor, e=True, displaySolidMap=True),
                                     ofc=lambda *args: pm.textureWindow(self.editor, e=True, displaySolidMap=False),
-                                    ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kOverlapAnnot'))
+                                    ann=ui_res('m_textureWindowCreateToolBar.kOverlapAnnot'))
 
                 self.edgeColorBtn = pm.iconTextButton(image1='pbUV/opts01EdgeColor.png', c=self.edge_col_cmd)
                 self.edgeColSld = pm.intSlider(min=1, max=31,
@@ -843,15 +1316,15 @@ class Opts01UI(ToolsUI):
                 pm.iconTextCheckBox(image1='filteredMode.png', v=pm.textureWindow(self.editor, q=True, iuf=True),
                                     onc=lambda *args: pm.textureWindow(self.editor, e=True, iuf=True),
                                     ofc=lambda *args: pm.textureWindow(self.editor, e=True, iuf=False),
-                                    ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kToggleFilteredImageAnnot'))
+                                    ann=ui_res('m_textureWindowCreateToolBar.kToggleFilteredImageAnnot'))
 
                 polyOpts = pm.iconTextButton(image1='textureBorder.png', c=self.toggle_tx_border,
-                                             ann=pm.mel.uiRes(
+                                             ann=ui_res(
                                                  'm_textureWindowCreateToolBar.kToggleTextureBordersAnnot'))
                 pm.popupMenu(button=3, p=polyOpts, pmc=lambda *args: pm.mel.CustomPolygonDisplayOptions())
 
                 self.dimImageBtn = pm.iconTextCheckBox('dimmerButton', image1='dimTexture.png',
-                                                       ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kDimImageAnnot'),
+                                                       ann=ui_res('m_textureWindowCreateToolBar.kDimImageAnnot'),
                                                        onc=lambda *args: self.dim_image_cmd(True),
                                                        ofc=lambda *args: self.dim_image_cmd(False),
                                                        value=pm.textureWindow(self.editor, q=True,
@@ -905,19 +1378,20 @@ class Opts02UI(ToolsUI):
         self.editor = editor
         ToolsUI.__init__(self, par)
 
+    def build(self, par):
         with pm.gridLayout(p=par, nc=2, cwh=[26, 26]) as self.layout:
             griddisp = pm.iconTextCheckBox(image1='gridDisplay.png',
                                            value=pm.textureWindow(self.editor, q=True, toggle=True),
                                            onc=lambda *args: pm.textureWindow(self.editor, e=True, toggle=True),
                                            ofc=lambda *args: pm.textureWindow(self.editor, e=True, toggle=False),
-                                           ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kViewGridAnnot'))
+                                           ann=ui_res('m_textureWindowCreateToolBar.kViewGridAnnot'))
             pm.popupMenu(button=3, p=griddisp, pmc=lambda *args: pm.mel.performTextureViewGridOptions(1))
 
             pxsnap = pm.iconTextCheckBox(image1='pixelSnap.png',
                                          value=pm.snapMode(q=True, pixelSnap=True),
                                          onc=lambda *args: pm.snapMode(pixelSnap=True),
                                          ofc=lambda *args: pm.snapMode(pixelSnap=False),
-                                         ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kPixelSnapAnnot'))
+                                         ann=ui_res('m_textureWindowCreateToolBar.kPixelSnapAnnot'))
             pm.popupMenu(button=3, p=pxsnap, pmc=lambda *args: pm.mel.performPixelSnapOptions(1))
 
             pm.iconTextButton(image1='textureEditorDisplayColor.png',
@@ -931,56 +1405,926 @@ class Opts02UI(ToolsUI):
 
 class Opts03UI(ToolsUI):
     def __init__(self, par, editor):
-        ToolsUI.__init__(self, par)
         self.editor = editor
+        ToolsUI.__init__(self, par)
+
+    def build(self, par):
         with pm.gridLayout(p=par, nc=2, cwh=[26, 26]) as self.layout:
             swapbg = pm.iconTextCheckBox(image1='swapBG.png',
                                          value=pm.optionVar['displayEditorImage'],
-                                         ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kUVTextureEditorBakingAnnot'),
+                                         ann=ui_res('m_textureWindowCreateToolBar.kUVTextureEditorBakingAnnot'),
                                          cc=lambda *args: pm.mel.textureWindowToggleEditorImage(self.editor))
             pm.popupMenu(button=3, p=swapbg, pmc=lambda *arg: pm.mel.performTextureViewBakeTextureOptions(1))
 
             pm.iconTextButton(image1='updatePsdTextureEditor.png',
-                              ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kUpdatePSDNetworksAnnot'),
+                              ann=ui_res('m_textureWindowCreateToolBar.kUpdatePSDNetworksAnnot'),
                               c=lambda *args: pm.mel.psdUpdateTextures(),
                               commandRepeatable=True)
 
             pm.iconTextButton(image1='bakeEditor.png',
-                              ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kForceEditorTextureRebakeAnnot'),
+                              ann=ui_res('m_textureWindowCreateToolBar.kForceEditorTextureRebakeAnnot'),
                               c=lambda *args: pm.mel.textureWindowBakeEditorImage(),
                               commandRepeatable=True)
 
             pm.iconTextCheckBox(image1='imageRatio.png',
-                                ann=pm.mel.uiRes('m_textureWindowCreateToolBar.kUseImageRatioAnnot'),
+                                ann=ui_res('m_textureWindowCreateToolBar.kUseImageRatioAnnot'),
                                 value=pm.textureWindow(self.editor, q=True, imageRatio=True),
                                 onc=lambda *args: pm.textureWindow(self.editor, e=True, imageRatio=True),
                                 ofc=lambda *args: pm.textureWindow(self.editor, e=True, imageRatio=False))
 
 
+# Operations
+# The tools above run these on the selection, pbUVBatch runs them on whole meshes. Each takes
+# [(MeshUVs, IndexRanges of the uvs), ...] and returns the edits for write_uvs, except cut and sew, which take
+# edge indices and return new layouts for write_layouts.
+def selected_shells(meshes):
+    """
+    [(MeshUVs, Shells, shell ids touched by the uvs), ...] for meshes with any uvs given
+    """
+    result = []
+    for mesh, ids in meshes:
+        if len(ids):
+            shells = uv_cache.shells(mesh)
+            result.append((mesh, shells, shells.touched(ids)))
+    return result
+
+
+def align_uvs(meshes, align):
+    """
+    Line shells up with a side or the center of their combined bounds, separately in every UDIM tile
+    """
+    if align not in ALIGN_SIDES:
+        return []
+    align_u, align_v = ALIGN_SIDES[align]
+    groups = selected_shells(meshes)
+    if not groups:
+        return []
+
+    shelltiles = [shells.tile_index().shell_tiles[touched] for mesh, shells, touched in groups]
+    tiles, target, first = core.group_bounds(np.concatenate(shelltiles),
+                                             np.concatenate([shells.bounds[touched] for m, shells, touched in groups]))
+    tracer.tag('tiles', len(tiles))
+
+    batch = core.UVBatch()
+    for (mesh, shells, touched), stiles in zip(groups, shelltiles):
+        du, dv = core.align_offsets(shells.bounds[touched], target[np.searchsorted(tiles, stiles)], align_u, align_v)
+        batch.add_groups(mesh, *shells.subset(touched), u=du, v=dv)
+    return batch.apply()
+
+
+def snap_uvs(meshes, pos, pershell=False):
+    """
+    Snap uvs to a side or corner of their UDIM tile, per tile or with pershell every shell on its own
+    """
+    if pos not in SNAP_POSITIONS:
+        return []
+    align_u, align_v = SNAP_POSITIONS[pos]
+
+    # bounds of the uvs per shell, keyed by tile or by mesh and shell
+    groups = []
+    for n, (mesh, uvs) in enumerate(meshes):
+        if not uvs:
+            continue
+        shells = uv_cache.shells(mesh)
+        ids = uvs.indices()
+        labels = shells.labels[ids]
+        order = np.argsort(labels, kind='mergesort')
+        touched, starts = np.unique(labels[order], return_index=True)
+        su = mesh.u[ids][order]
+        sv = mesh.v[ids][order]
+        bounds = np.column_stack((np.minimum.reduceat(su, starts), np.maximum.reduceat(su, starts),
+                                  np.minimum.reduceat(sv, starts), np.maximum.reduceat(sv, starts)))
+        tiles = shells.tile_index().shell_tiles[touched]
+        keys = touched + (n << 32) if pershell else tiles
+        groups.append((mesh, ids[order], np.append(starts, len(ids)), keys, tiles, bounds))
+    if not groups:
+        return []
+
+    keys, bounds, first = core.group_bounds(np.concatenate([i[3] for i in groups]),
+                                            np.concatenate([i[5] for i in groups]))
+    du, dv = core.snap_offsets(bounds, np.concatenate([i[4] for i in groups])[first], align_u, align_v)
+
+    batch = core.UVBatch()
+    for mesh, order, offsets, shellkeys, tiles, shellbounds in groups:
+        at = np.searchsorted(keys, shellkeys)
+        batch.add_groups(mesh, order, offsets, u=du[at], v=dv[at])
+    return batch.apply()
+
+
+def density_uvs(meshes, target, width, height):
+    """
+    Scale every touched shell around its center to target pixels per unit on a width x height map
+    """
+    batch = core.UVBatch()
+    for mesh, shells, touched in selected_shells(meshes):
+        world, uv = get_face_areas(mesh.name, mesh)
+        fshell = core.face_shells(mesh, shells)
+        scale = core.density_scale(*core.shell_areas(world, uv, fshell, len(shells)),
+                                   target=target, width=width, height=height)
+        order, offsets = shells.subset(touched)
+        bounds = shells.bounds[touched]
+        batch.add_groups(mesh, order, offsets, su=scale[touched], sv=scale[touched],
+                         pu=(bounds[:, 0] + bounds[:, 1]) * 0.5, pv=(bounds[:, 2] + bounds[:, 3]) * 0.5)
+    return batch.apply()
+
+
+def _shell_edits(groups, u, v, angle=0.0, su=1.0, sv=1.0, pu=0.0, pv=0.0):
+    """
+    Split per shell arrays over concatenated selected_shells groups back onto their meshes
+    """
+    params = np.broadcast_arrays(*[np.asarray(i, dtype=np.float64) for i in (u, v, angle, su, sv, pu, pv)] +
+                                 [np.zeros(sum(len(i[2]) for i in groups))])[:-1]
+    batch = core.UVBatch()
+    start = 0
+    for mesh, shells, touched in groups:
+        part = slice(start, start + len(touched))
+        batch.add_groups(mesh, *shells.subset(touched), **dict(zip(('u', 'v', 'angle', 'su', 'sv', 'pu', 'pv'),
+                                                                   [i[part] for i in params])))
+        start += len(touched)
+    return batch.apply()
+
+
+def layout_uvs(meshes, tiles=(1001,), padding=(0.0, 0.0), rotate=True):
+    """
+    Pack the touched shells into the given UDIM tiles, see core.pack_shells
+    """
+    groups = selected_shells(meshes)
+    if not groups:
+        return []
+    bounds = np.concatenate([shells.bounds[touched] for mesh, shells, touched in groups])
+    angle, scale, pivot, offset = core.pack_shells(bounds, tiles, padding, rotate)
+    return _shell_edits(groups, offset[:, 0], offset[:, 1], angle, scale, scale, pivot[:, 0], pivot[:, 1])
+
+
+def layout_axis_uvs(meshes, axis=0, padding=0.0):
+    """
+    Line the touched shells up along u (axis 0) or v (axis 1), see core.pack_axis
+    """
+    groups = selected_shells(meshes)
+    if not groups:
+        return []
+    bounds = np.concatenate([shells.bounds[touched] for mesh, shells, touched in groups])
+    angle, scale, pivot, offset = core.pack_axis(bounds, axis=axis, padding=padding)
+    return _shell_edits(groups, offset[:, 0], offset[:, 1], 0.0, scale, scale, pivot[:, 0], pivot[:, 1])
+
+
+def stack_uvs(meshes, tol=1e-4):
+    """
+    Move every touched shell onto the first touched shell it is a copy of, see core.stack_shells
+    """
+    groups = selected_shells(meshes)
+    if not groups:
+        return []
+    group, angle, pivot, offset, fits = core.stack_shells(groups, tol)
+    tracer.tag('groups', len(np.unique(group)))
+    return _shell_edits(groups, offset[:, 0], offset[:, 1], angle, 1.0, 1.0, pivot[:, 0], pivot[:, 1])
+
+
+def unstack_uvs(meshes, padding=0.0, tol=1e-4):
+    """
+    Spread touched shells that are copies of each other side by side along u, see core.unstack_offsets
+    """
+    groups = selected_shells(meshes)
+    if not groups:
+        return []
+    group = core.group_fingerprints(np.concatenate([core.shell_fingerprints(mesh, shells, tol)[touched]
+                                                    for mesh, shells, touched in groups]))[0]
+    offset = core.unstack_offsets(group, np.concatenate([shells.bounds[touched] for m, shells, touched in groups]),
+                                  padding)
+    return _shell_edits(groups, offset[:, 0], offset[:, 1])
+
+
+def unfold_uvs(meshes, axis=0, pin_border=False, processes=None):
+    """
+    Unfold the shells touched by the uvs with core.lscm_unfold, uvs of those shells outside the selection
+    stay pinned. axis 1 only moves v, axis 2 only u. Returns (edits, names of meshes whose solve stopped
+    short of converging).
+    """
+    edits = []
+    unconverged = []
+    for mesh, ids in meshes:
+        if not len(ids):
+            continue
+        shells = uv_cache.shells(mesh)
+        pinned = ~ids.mask(len(mesh))
+        u, v, converged = core.lscm_unfold(get_mesh_points(mesh.name), mesh, shells.labels, shells.touched(ids),
+                                           pinned, pin_border, axis, processes=processes)
+        edits.append((mesh, u, v))
+        if not converged:
+            unconverged.append(mesh.name)
+    return edits, unconverged
+
+
+def mesh_targets(targets):
+    """
+    [(MeshUVs, IndexRanges of every uv), ...] for [(mesh, uv set or None), ...], for running operations on whole
+    meshes
+    """
+    meshes = []
+    for mesh, uvset in targets:
+        uvs = get_mesh_uvs(mesh, uvset)
+        meshes.append((uvs, core.IndexRanges(uvs.name, [[0, len(uvs)]])))
+    return meshes
+
+
+def cut_uvs(meshes):
+    """
+    Split the uvs along [(MeshUVs, edge indices), ...], see core.cut_uvs
+    """
+    edits = []
+    for mesh, ids in meshes:
+        if not len(ids):
+            continue
+        cut = core.cut_uvs(get_topology(mesh.name, edges=True), mesh, ids)
+        if cut is not mesh:
+            edits.append((mesh, cut))
+    return edits
+
+
+def sew_uvs(meshes, distance=0.01):
+    """
+    Sew the edges and merge the uvs within distance of [(MeshUVs, edge indices, uv indices), ...], both in
+    one layout per mesh, see core.sew_uvs and core.weld_uvs
+    """
+    edits = []
+    for mesh, edges, ids in meshes:
+        sewn = mesh
+        if len(ids):
+            sewn = core.weld_uvs(get_topology(mesh.name), sewn, ids, distance)
+        if len(edges):
+            sewn = core.sew_uvs(get_topology(mesh.name, edges=True), sewn, edges)
+        if sewn is not mesh:
+            edits.append((mesh, sewn))
+    return edits
+
+
+# Undoable Writes
+def write_uvs(edits):
+    """
+    Write [(MeshUVs, u, v), ...] back to their meshes as one step, one undoable command with the Maya backend
+    """
+    if not edits:
+        return
+    shells = [uv_cache.peek_shells(mesh) for mesh, u, v in edits]
+    tracer.tag('meshes', len(edits))
+    backend.commit([(mesh.name, mesh.uvset, (mesh.u, mesh.v), (u, v)) for mesh, u, v in edits])
+
+    # Maya now holds exactly these uvs (as floats), keep them and the shell layout warm instead of reading back
+    for (mesh, u, v), cached in zip(edits, shells):
+        mesh.u = np.asarray(u, dtype=np.float32).astype(np.float64)
+        mesh.v = np.asarray(v, dtype=np.float32).astype(np.float64)
+        uv_cache.update(mesh, cached.moved(mesh.u, mesh.v) if cached is not None else None)
+
+
+def write_layouts(edits):
+    """
+    Write [(MeshUVs, new MeshUVs), ...] with new uvs and uv assignments (cuts and sews) as one step
+    """
+    if not edits:
+        return
+    tracer.tag('meshes', len(edits))
+    backend.commit([(old.name, old.uvset, (old.u, old.v, old.uv_counts, old.uv_ids),
+                     (new.u, new.v, new.uv_counts, new.uv_ids)) for old, new in edits])
+    for old, new in edits:
+        uv_cache.invalidate(old.name)
+
+
+# Backend
+class MayaBackend(core.MeshBackend):
+    """
+    Scene meshes through the bulk getters and setters of maya.api.OpenMaya.MFnMesh, commits run as one
+    pbUVSetUVs command (pbUVPlugin) so they undo in one step
+    """
+
+    def __init__(self):
+        self.handoff = {}  # command id: writes the pbUVSetUVs command with that id takes
+        self.next_id = 0
+
+    def current_uvset(self, name):
+        return om.MFnMesh(get_dag(name)).currentUVSetName()
+
+    def uvset_names(self, name):
+        return om.MFnMesh(get_dag(name)).getUVSetNames()
+
+    def read_uvs(self, name, uvset):
+        tracer.count('getUVs')
+        fn = om.MFnMesh(get_dag(name))
+        u, v = fn.getUVs(uvset)
+        counts, ids = fn.getAssignedUVs(uvset)
+        return core.MeshUVs(name, uvset, u, v, counts, ids)
+
+    def read_points(self, name, world=True):
+        tracer.count('getPoints')
+        fn = om.MFnMesh(get_dag(name))
+        counts, ids = fn.getVertices()
+        return core.MeshPoints(name, fn.getPoints(om.MSpace.kWorld if world else om.MSpace.kObject), counts, ids)
+
+    def read_faces(self, name):
+        tracer.count('getVertices')
+        return tuple(np.array(i, dtype=np.int64) for i in om.MFnMesh(get_dag(name)).getVertices())
+
+    def read_edges(self, name):
+        # one polyInfo for the whole mesh, lines of "EDGE  <id>:  <vertex>  <vertex>  Hard"
+        tracer.count('polyInfo')
+        text = re.sub(r'[^0-9]+', ' ', ''.join(pm.polyInfo(name, edgeToVertex=True) or []))
+        table = np.array(text.split(), dtype=np.int64).reshape(-1, 3)
+        edges = np.zeros((len(table), 2), dtype=np.int64)
+        edges[table[:, 0]] = table[:, 1:]
+        return edges
+
+    def set_uvs(self, name, uvset, u, v):
+        tracer.count('setUVs')
+        fn = om.MFnMesh(get_dag(name))
+        fn.setUVs(om.MFloatArray(np.asarray(u).tolist()), om.MFloatArray(np.asarray(v).tolist()), uvset)
+
+    def set_layout(self, name, uvset, u, v, uv_counts, uv_ids):
+        tracer.count('assignUVs')
+        fn = om.MFnMesh(get_dag(name))
+        fn.clearUVs(uvset)
+        fn.setUVs(om.MFloatArray(np.asarray(u).tolist()), om.MFloatArray(np.asarray(v).tolist()), uvset)
+        fn.assignUVs(om.MIntArray(np.asarray(uv_counts).tolist()), om.MIntArray(np.asarray(uv_ids).tolist()), uvset)
+
+    def set_face_colors(self, name, colorset, colors):
+        fn = om.MFnMesh(get_dag(name))
+        if colors is None:
+            if colorset in fn.getColorSetNames():
+                fn.deleteColorSet(colorset)
+            return
+        tracer.count('setFaceColors')
+        if colorset not in fn.getColorSetNames():
+            fn.createColorSet(colorset, False)
+        fn.setCurrentColorSetName(colorset)
+        fn.setFaceColors(om.MColorArray(np.asarray(colors, dtype=np.float64).tolist()),
+                         om.MIntArray(list(range(len(colors)))))
+        pm.setAttr(name + '.displayColors', True)
+
+    def commit(self, writes):
+        import pbUVPlugin
+        plugin = os.path.splitext(os.path.abspath(pbUVPlugin.__file__))[0] + '.py'
+        if not pm.pluginInfo(plugin, q=True, loaded=True):
+            pm.loadPlugin(plugin, quiet=True)
+        self.next_id += 1
+        self.handoff[self.next_id] = writes
+        tracer.count(pbUVPlugin.SetUVsCmd.name)
+        try:
+            pm.mel.eval('{0} {1}'.format(pbUVPlugin.SetUVsCmd.name, self.next_id))
+        finally:
+            self.handoff.pop(self.next_id, None)
+
+    def take_writes(self, command_id):
+        """
+        The writes commit handed to the pbUVSetUVs command with this id
+        """
+        return self.handoff.pop(command_id)
+
+    def watch(self, name, callback):
+        node = get_dag(name).node()
+        return [om.MNodeMessage.addNodeDirtyPlugCallback(node, lambda node, plug, data: callback(data), name),
+                om.MNodeMessage.addNameChangedCallback(node, lambda node, prev, data: callback(data), name)]
+
+    def unwatch(self, handle):
+        for i in handle:
+            om.MMessage.removeCallback(i)
+
+
+def set_backend(new):
+    """
+    Make new (a core.MeshBackend) the source of every mesh read and write, e.g. a core.MemoryBackend to run
+    the operations on meshes loaded from files. Returns the previous backend.
+    """
+    global backend
+    prefetch.stop()
+    uv_cache.clear()
+    topologies.clear()
+    for handle in uv_callbacks.values():
+        backend.unwatch(handle)
+    uv_callbacks.clear()
+    old, backend = backend, new
+    return old
+
+
+backend = MayaBackend()
+
+
+# Mesh Access
+def get_uv_selection(comps=None):
+    """
+    UV components (or the current selection) grouped per mesh as [(MDagPath, uv indices), ...]
+    """
+    if comps is None:
+        warm = prefetch.selection('uvs')
+        if warm is not None:
+            return warm
+    return get_components(comps, 'uvs')
+
+
+def get_uv_ranges(comps=None):
+    """
+    UV components (or the current selection) as one IndexRanges per mesh. A selected mesh is a single run,
+    only components are read as indices and run length encoded.
+    """
+    if comps is None:
+        warm = prefetch.selection('uvs')
+        if warm is not None:
+            return [core.IndexRanges.from_indices(dag.fullPathName(), ids) for dag, ids in warm]
+
+    tracer.count('getComponents')
+    ranges = []
+    for dag, comps in selected_components(comps).values():
+        if any(comp.isNull() for comp in comps):
+            ranges.append(core.IndexRanges(dag.fullPathName(), [[0, len(get_mesh_uvs(dag))]]))
+            continue
+        ids = [convert_components(dag, comp, 'uvs') for comp in comps]
+        ranges.append(core.IndexRanges.from_indices(dag.fullPathName(), ids[0] if len(ids) == 1 else
+                                                    np.unique(np.concatenate(ids))))
+    return ranges
+
+
+def get_face_selection(comps=None):
+    if comps is None:
+        warm = prefetch.selection('faces')
+        if warm is not None:
+            return warm
+    return get_components(comps, 'faces')
+
+
+def get_face_areas(mesh, uvs):
+    """
+    World and uv area per face of a mesh, see core.face_areas
+    """
+    warm = prefetch.result('areas', uvs)
+    if warm is not None:
+        return warm
+    return core.face_areas(get_mesh_points(mesh), uvs)
+
+
+# component kind: its name in component strings, apiType of its MObject
+COMPONENT_TYPES = OrderedDict([('uvs', ('map', om.MFn.kMeshMapComponent)),
+                               ('faces', ('f', om.MFn.kMeshPolygonComponent)),
+                               ('edges', ('e', om.MFn.kMeshEdgeComponent)),
+                               ('vertices', ('vtx', om.MFn.kMeshVertComponent))])
+
+
+def get_components(comps=None, kind='uvs', sources=None):
+    """
+    Components (or the current selection) converted to kind ('uvs', 'faces', 'edges' or 'vertices') and
+    grouped per mesh as [(MDagPath, indices), ...]. Conversions are lookups in the mesh's Topology, like
+    polyListComponentConversion without internal: faces of a uv are all faces using it, uvs of a face all
+    its uvs. Selected meshes convert whole. sources limits which kinds are taken from the selection.
+    """
+    tracer.count('getComponents')
+    meshes = OrderedDict()
+    for dag, comps in selected_components(comps).values():
+        if sources is not None:
+            comps = [i for i in comps if component_kind(i) in sources]
+            if not comps:
+                continue
+        ids = [convert_components(dag, comp, kind) for comp in comps]
+        meshes[dag.fullPathName()] = (dag, ids[0] if len(ids) == 1 else np.unique(np.concatenate(ids)))
+    return list(meshes.values())
+
+
+def selected_components(comps=None):
+    """
+    Components (or the current selection) per mesh as OrderedDict(name: (MDagPath, [MObject, ...])), a null
+    component MObject stands for the whole mesh
+    """
+    if comps is None:
+        sel = om.MGlobal.getActiveSelectionList()
+    else:
+        sel = om.MSelectionList()
+        for comp in comps:
+            sel.add(str(comp))
+
+    meshes = OrderedDict()
+    for i in range(sel.length()):
+        try:
+            dag, comp = sel.getComponent(i)
+        except TypeError:
+            continue
+        for shape in _mesh_shapes(dag):
+            meshes.setdefault(shape.fullPathName(), (shape, []))[1].append(comp)
+    return meshes
+
+
+def get_edge_selection(comps=None):
+    """
+    Selected edges grouped per mesh as [(MDagPath, edge indices), ...], selected faces add the edges
+    around them
+    """
+    meshes = OrderedDict((dag.fullPathName(), (dag, [ids])) for dag, ids in get_components(comps, 'edges', ['edges']))
+    for dag, faces in get_components(comps, 'faces', ['faces']):
+        topo = get_topology(dag, edges=True)
+        outline = np.setdiff1d(topo.face_edges(faces), topo.face_edges(faces, internal=True))
+        meshes.setdefault(dag.fullPathName(), (dag, []))[1].append(outline)
+    return [(dag, np.unique(np.concatenate(ids))) for dag, ids in meshes.values()]
+
+
+def component_kind(comp):
+    """
+    Kind of a component MObject as named in COMPONENT_TYPES, None for a whole mesh
+    """
+    if comp.isNull():
+        return None
+    return next((key for key, value in COMPONENT_TYPES.items() if value[1] == comp.apiType()), None)
+
+
+def convert_components(mesh, comp, kind):
+    """
+    Indices of kind ('uvs', 'faces', 'edges' or 'vertices') for one component MObject of mesh
+    """
+    if comp.isNull():
+        size = {'uvs': lambda: len(get_mesh_uvs(mesh)), 'faces': lambda: len(get_topology(mesh).counts),
+                'edges': lambda: len(get_topology(mesh, edges=True).edges),
+                'vertices': lambda: len(get_topology(mesh).vertex_offsets) - 1}
+        return np.arange(size[kind]())
+
+    source = component_kind(comp)
+    ids = np.array(om.MFnSingleIndexedComponent(comp).getElements(), dtype=np.int64)
+    if source == kind:
+        return np.unique(ids)
+
+    topo = get_topology(mesh, edges='edges' in (source, kind))
+    if source == 'uvs':
+        ids = topo.uv_faces(get_mesh_uvs(mesh), ids)
+        source = 'faces'
+    elif source == 'edges':
+        if kind == 'uvs':
+            return topo.edge_uvs(get_mesh_uvs(mesh), ids)
+        if kind == 'vertices':
+            return np.unique(topo.edges[ids])
+        ids = topo.edge_faces(ids)
+        source = 'faces'
+    elif source == 'vertices':
+        if kind == 'uvs':
+            return topo.vertex_uvs(get_mesh_uvs(mesh), ids)
+        ids = topo.vertex_faces(ids)
+        source = 'faces'
+
+    if kind == 'faces':
+        return ids
+    if kind == 'uvs':
+        return topo.face_uvs(get_mesh_uvs(mesh), ids)
+    if kind == 'edges':
+        return topo.face_edges(ids)
+    return topo.face_vertices(ids)
+
+
+def _mesh_shapes(dag):
+    """
+    Mesh shapes under a transform, or the mesh itself, skipping intermediate objects
+    """
+    if dag.hasFn(om.MFn.kTransform):
+        shapes = []
+        for j in range(dag.numberOfShapesDirectlyBelow()):
+            shape = om.MDagPath(dag)
+            shape.extendToShape(j)
+            shapes.append(shape)
+    else:
+        shapes = [dag]
+    return [i for i in shapes if i.hasFn(om.MFn.kMesh) and not om.MFnDagNode(i).isIntermediateObject]
+
+
+def get_selected_meshes():
+    """
+    Mesh shapes under the selected transforms and the meshes of selected components, in selection order
+    """
+    sel = om.MGlobal.getActiveSelectionList()
+    meshes = OrderedDict()
+    for i in range(sel.length()):
+        try:
+            dag = sel.getDagPath(i)
+        except TypeError:
+            continue
+        for shape in _mesh_shapes(dag):
+            meshes.setdefault(shape.fullPathName(), shape)
+    return list(meshes.values())
+
+
+def get_dag(node):
+    sel = om.MSelectionList()
+    sel.add(str(node))
+    return sel.getDagPath(0)
+
+
+def mesh_name(mesh):
+    """
+    Full path name of a mesh given as MDagPath or name, how backends address meshes
+    """
+    return mesh.fullPathName() if isinstance(mesh, om.MDagPath) else str(mesh)
+
+
+def get_mesh_uvs(mesh, uvset=None):
+    """
+    MeshUVs for a mesh (MDagPath or full name), served from uv_cache until the mesh gets dirty
+    """
+    name = mesh_name(mesh)
+    if uvset is None:
+        uvset = backend.current_uvset(name)
+    if name not in uv_callbacks:
+        uv_callbacks[name] = backend.watch(name, _uv_changed)
+    return uv_cache.get((name, uvset), lambda: backend.read_uvs(name, uvset))
+
+
+def get_mesh_points(mesh, world=True):
+    return backend.read_points(mesh_name(mesh), world)
+
+
+def get_topology(mesh, edges=False):
+    """
+    core.Topology of a mesh, kept while its face-vertex layout hashes the same (core.topology_key) so edits
+    that keep every count, like spinning an edge or reversing normals, still rebuild it. Edges are read the
+    first time a caller needs them.
+    """
+    name = mesh_name(mesh)
+    counts, ids = backend.read_faces(name)
+    key = core.topology_key(counts, ids)
+    if name not in topologies or topologies[name][0] != key:
+        tracer.count('topology')
+        topologies[name] = (key, core.Topology(counts, ids))
+    topo = topologies[name][1]
+    if edges and topo.edges is None:
+        topo.set_edges(backend.read_edges(name))
+    return topo
+
+
+def batch_snapshots(targets, width, height, color=(255, 255, 255), aa=True, processes=None):
+    """
+    Snapshot [(mesh, uv set or None, image path), ...] without the UI. Meshes are read here, the
+    drawing and encoding runs in worker processes. Returns [(path, seconds), ...].
+    """
+    jobs = []
+    for mesh, uvset, snappath in targets:
+        jobs.append(([get_mesh_uvs(mesh, uvset)], str(snappath),
+                     {'width': width, 'height': height, 'color': color, 'aa': aa}))
+    return core.render_batch(jobs, processes)
+
+
+def validate_meshes(targets, processes=None, **kwargs):
+    """
+    core.validate_uvs reports for [(mesh, uv set or None), ...]. Meshes are read here, the checks run in
+    worker processes.
+    """
+    meshes = [get_mesh_uvs(mesh, uvset) for mesh, uvset in targets]
+    tracer.tag('meshes', len(meshes))
+    return core.validate_batch(meshes, processes, **kwargs)
+
+
+def distortion_meshes(targets):
+    """
+    core.face_distortion for [(mesh, uv set or None), ...] as [(MeshUVs, metrics, world area per face), ...]
+    """
+    reports = []
+    for mesh, uvset in targets:
+        uvs = get_mesh_uvs(mesh, uvset)
+        metrics, world = core.face_distortion(get_mesh_points(mesh), uvs)
+        reports.append((uvs, metrics, world))
+    tracer.tag('faces', sum(len(i[2]) for i in reports))
+    return reports
+
+
+def distortion_summary(reports):
+    """
+    core.distortion_stats over all faces of distortion_meshes reports, for QC of a whole asset
+    """
+    if not reports:
+        return core.distortion_stats(OrderedDict(), [])
+    metrics = OrderedDict((key, np.concatenate([i[1][key] for i in reports])) for key in reports[0][1])
+    return core.distortion_stats(metrics, np.concatenate([i[2] for i in reports]))
+
+
+def write_heatmap(reports, metric='stretch', colorset='pbUVDistortion'):
+    """
+    Show one metric of distortion_meshes reports as face colors, one bulk write per mesh. metric None
+    removes the color set again.
+    """
+    for uvs, metrics, world in reports:
+        colors = core.heatmap_colors(metric, metrics[metric]) if metric is not None else None
+        backend.set_face_colors(uvs.name, colorset, colors)
+
+
+def validate_directory(folder, processes=None, **kwargs):
+    """
+    core.validate_uvs reports for every OBJ file in a folder, read and checked in worker processes
+    """
+    paths = sorted(os.path.join(folder, i) for i in os.listdir(folder) if i.lower().endswith('.obj'))
+    return core.validate_batch(paths, processes, **kwargs)
+
+
+# UV Cache
+def _uv_changed(name):
+    uv_cache.invalidate(name)
+
+
+def _uv_evicted(key):
+    if any(i[0] == key[0] for i in uv_cache.entries):
+        return
+    if key[0] in uv_callbacks:
+        backend.unwatch(uv_callbacks.pop(key[0]))
+    topologies.pop(key[0], None)
+
+
+def _uv_warm(mesh):
+    warm = prefetch.result('shells', mesh)
+    return warm[0] if warm is not None else None
+
+
+uv_callbacks = {}
+topologies = {}  # name: (core.topology_key, core.Topology)
+uv_cache = core.UVCache(max_items=256, max_bytes=512 * 1024 ** 2, on_evict=_uv_evicted, warm=_uv_warm)
+
+
+# Prefetch
+def _tagged(mesh, u, function, *args):
+    """
+    Result of a worker job with the mesh and u array it was made from, to tell whether it is still current
+    """
+    return mesh, u, function(*args)
+
+
+def _shells_job(mesh, u, v):
+    shells = core.Shells(core.label_shells(len(u), mesh.uv_counts, mesh.uv_ids), u, v)
+    shells.tile_index()
+    return shells, core.min_area_rects(u, v, shells.order, shells.offsets)
+
+
+def _areas_job(points, mesh, u, v):
+    return core.face_areas(points, core.MeshUVs(mesh.name, mesh.uvset, u, v, mesh.uv_counts, mesh.uv_ids))
+
+
+def _density_job(worker, faces):
+    densities, areas = [], []
+    for key, mesh, u, ids in faces:
+        warm = worker.get(key)
+        if warm is None or warm[1] is not u:
+            raise ValueError('No current face areas for {0}'.format(key[1]))
+        world, uv = warm[2]
+        ids = ids[mesh.uv_counts[ids] > 0]
+        densities.append(core.texel_density(world[ids], uv[ids]))
+        areas.append(world[ids])
+    return core.density_stats(np.concatenate(densities), np.concatenate(areas))
+
+
+def _selection_strings():
+    return tuple(om.MGlobal.getActiveSelectionList().getSelectionStrings())
+
+
+class SelectionPrefetch(object):
+    """
+    Warms up what the tools ask for after a selection change while Maya is idle. The selection and the
+    meshes are read on the main thread, one read per idle slice, shells, hulls, face areas and density
+    stats are worked out on a core.Prefetcher thread. Results are only handed out while the selection and
+    the uvs they were made from are unchanged, tools work things out themselves otherwise.
+    """
+    budget = 0.02  # seconds of scene reads per idle slice
+
+    def __init__(self):
+        self.worker = core.Prefetcher()
+        self.strings = None
+        self.selected = {}
+        self.reads = deque()
+        self.scheduled = False
+
+    def __repr__(self):
+        return 'SelectionPrefetch({0} reads, {1!r})'.format(len(self.reads), self.worker)
+
+    def start(self, *args):
+        self.stop()
+        self.reads.append(self._read_selection)
+        self._schedule()
+
+    def stop(self, *args):
+        self.worker.start()
+        self.strings = None
+        self.selected = {}
+        self.reads.clear()
+
+    def _schedule(self):
+        if not self.scheduled:
+            self.scheduled = True
+            pm.evalDeferred(self._slice, lowestPriority=True)
+
+    def _slice(self):
+        self.scheduled = False
+        start = time.time()
+        while self.reads and time.time() - start < self.budget:
+            self.reads.popleft()()
+        if self.reads:
+            self._schedule()
+
+    def _read_selection(self):
+        self.strings = _selection_strings()
+        self.selected = {'uvs': get_components(kind='uvs'), 'faces': get_components(kind='faces')}
+        names = OrderedDict.fromkeys(dag.fullPathName() for comps in self.selected.values() for dag, ids in comps)
+        for name in names:
+            self.reads.append(lambda name=name: self._read_mesh(name))
+        if self.selected['faces']:
+            self.reads.append(self._read_density)
+
+    def _read_mesh(self, name):
+        mesh = get_mesh_uvs(name)
+        key = (mesh.name, mesh.uvset)
+        if uv_cache.peek_shells(mesh) is None:
+            self.worker.submit(('shells',) + key, _tagged, mesh, mesh.u, _shells_job, mesh, mesh.u, mesh.v)
+        if any(i.fullPathName() == name for i, ids in self.selected['faces']):
+            self.worker.submit(('areas',) + key, _tagged, mesh, mesh.u, _areas_job, get_mesh_points(name), mesh,
+                               mesh.u, mesh.v)
+
+    def _read_density(self):
+        faces = []
+        for dag, ids in self.selected['faces']:
+            mesh = get_mesh_uvs(dag)
+            faces.append((('areas', mesh.name, mesh.uvset), mesh, mesh.u, ids))
+        self.worker.submit(('density',), _tagged, [i[1] for i in faces], [i[2] for i in faces], _density_job,
+                           self.worker, faces)
+
+    def selection(self, kind):
+        """
+        Selected 'uvs' or 'faces' as get_components returns them, None unless read since the last change
+        """
+        if self.strings is None or kind not in self.selected or _selection_strings() != self.strings:
+            return None
+        return list(self.selected[kind])
+
+    def result(self, kind, mesh):
+        """
+        Worker result of kind ('shells', 'areas') for mesh, None when missing or made from other uvs
+        """
+        warm = self.worker.get((kind, mesh.name, mesh.uvset))
+        if warm is None or warm[0] is not mesh or warm[1] is not mesh.u:
+            return None
+        return warm[2]
+
+    def density(self):
+        """
+        density_stats of the selected faces, None when missing or out of date
+        """
+        if self.selection('faces') is None:
+            return None
+        warm = self.worker.get(('density',))
+        if warm is None or any(not _fresh(m, u) for m, u in zip(warm[0], warm[1])):
+            return None
+        return warm[2]
+
+
+def _fresh(mesh, u):
+    """
+    True while mesh is the cached state of its uvs, nothing was written or dirtied since it was read
+    """
+    entry = uv_cache.entries.get((mesh.name, mesh.uvset))
+    return entry is not None and entry[0] is mesh and mesh.u is u
+
+
+prefetch = SelectionPrefetch()
+
+
 # Data Classes
 class UV(object):
     def __init__(self, uvs=None):
-        if not uvs:
-            self.uvs = pm.ls(pm.polyListComponentConversion(tuv=True), fl=True)
+        """
+        uvs can be IndexRanges per mesh or Maya component names, the selected uvs when not given
+        """
+        if uvs is not None and all(isinstance(i, core.IndexRanges) for i in uvs):
+            self.uvs = list(uvs)
         else:
-            self.uvs = uvs
+            self.uvs = get_uv_ranges(uvs)
 
         self.shells = []
+        self.meshes = None
         self.type = 'standard'
 
     def __repr__(self):
         return repr(self.uvs)
 
+    def __len__(self):
+        return sum(len(i) for i in self.uvs)
+
+    def names(self):
+        """
+        Component strings for Maya commands
+        """
+        return [name for uvs in self.uvs for name in uvs.names()]
+
+    def get_meshes(self):
+        """
+        [(MeshUVs, IndexRanges), ...] for every mesh these uvs live on, fetched once
+        """
+        if self.meshes is None:
+            self.meshes = [(get_mesh_uvs(i.mesh), i) for i in self.uvs]
+            tracer.tag('uvs', len(self))
+        return self.meshes
+
     def get_bounds(self):
-        self.bounds = pm.polyEvaluate(self.uvs, bc2=True)
-        self.xMin = self.bounds[0][0]
-        self.xMax = self.bounds[0][1]
-        self.yMin = self.bounds[1][0]
-        self.yMax = self.bounds[1][1]
+        self.set_bounds(core.bounds_union([core.uv_bounds(mesh, ids.mask(len(mesh)))
+                                           for mesh, ids in self.get_meshes()]))
         return self.bounds
 
+    def set_bounds(self, bounds):
+        self.xMin, self.xMax, self.yMin, self.yMax = [float(i) for i in bounds]
+        self.bounds = ((self.xMin, self.xMax), (self.yMin, self.yMax))
+
     def get_pivot(self):
-        piv = pm.polyEvaluate(self.uvs, bc2=True)
+        piv = self.get_bounds()
         pivu = ((piv[0][0] + piv[0][1]) * 0.5)
         pivv = ((piv[1][0] + piv[1][1]) * 0.5)
         return pivu, pivv
@@ -990,21 +2334,18 @@ class UV(object):
             pm.warning('Class is already a shell')
             return
 
-        cursel = pm.selected()
         self.shells = []
-        for uv in self.uvs:
-            found = False
-            for shell in self.shells:
-                if uv in shell.uvs:
-                    found = True
-            if not found:
-                pm.select(uv)
-                pm.mel.polySelectBorderShell(0)
-                sel = pm.ls(pm.polyListComponentConversion(tuv=True), fl=True)
-                thisShell = UV(sel)
-                thisShell.get_bounds()
+        for mesh, ids in self.get_meshes():
+            shells = uv_cache.shells(mesh)
+            touched = shells.touched(ids)
+            for i, ranges in zip(touched, shells.ranges(mesh.name, touched)):
+                thisShell = UV([ranges])
+                thisShell.type = 'shell'
+                thisShell.mesh = mesh
+                thisShell.meshes = [(mesh, ranges)]
+                thisShell.set_bounds(shells.bounds[i])
 
                 self.shells.append(thisShell)
 
-        pm.select(cursel)
+        tracer.tag('shells', len(self.shells))
         return self.shells
@@ -0,0 +1,450 @@
+"""
+Headless pbUV: run pbUV operations on explicit meshes across many Maya scenes, without the UI or a selection.
+
+    mayapy pbUVBatch.py assets/*.ma --op snap:center --op density:10.24:4096 --op layout:1001,1002 --save
+    python pbUVBatch.py --list scenes.txt --workers 8 --mayapy /path/to/mayapy --op align:left --report out.jsonl
+
+Operations run in the order given on every mesh of a scene (or the meshes matching --meshes), each --op is
+name[:arg:...]:
+
+    align:<left|centerU|right|bottom|centerV|top>
+    snap:<topLeft|topCenter|...|bottomRight>[:shell]
+    density:<pixels per unit>[:<map width>[:<map height>]]
+    layout[:<tiles, e.g. 1001,1002>[:<padding pixels>[:<map size>]]]
+    unfold[:<uv|u|v>]    least squares conformal unfold, u or v only moves that axis, meshes whose solve
+                         stopped short of converging are listed under "unconverged"
+    stack[:unstack]      stack shells that are copies of each other, or spread them side by side
+    snapshot[:<size>]    writes <out or scene folder>/<scene>_<mesh>.png
+    validate             flipped, degenerate and overlapping face counts
+    distortion[:<metric>=<max p95>,...[:<heatmap metric>]]
+                         area weighted stretch, angle and area distortion per scene, e.g.
+                         distortion:stretch=1.5,angle=1.3 lists the limits exceeded under "failed"
+
+With --workers above 1 every worker is a mayapy of its own, fed one scene at a time from a bounded queue so
+scene lists of any length stream through. --timeout kills a worker stuck on a scene, which is then reported
+failed like scenes whose worker crashed or could not start. One JSON line per scene goes to --report with the
+time and result of every operation. From Python, run() yields the same reports.
+"""
+from __future__ import print_function
+from collections import OrderedDict
+import argparse
+import fnmatch
+import glob
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+try:
+    import queue
+except ImportError:  # Python 2 mayapy
+    import Queue as queue
+
+
+RESULT = 'PBUV_RESULT '  # prefix of report lines on a worker's stdout, Maya may print anything else there
+
+
+# Operations
+def _op_align(pbUV, targets, context, side):
+    edits = pbUV.align_uvs(pbUV.mesh_targets(targets), side)
+    pbUV.write_uvs(edits)
+    return {'meshes': len(edits)}
+
+
+def _op_snap(pbUV, targets, context, pos, mode='tile'):
+    edits = pbUV.snap_uvs(pbUV.mesh_targets(targets), pos, mode == 'shell')
+    pbUV.write_uvs(edits)
+    return {'meshes': len(edits)}
+
+
+def _op_density(pbUV, targets, context, density, width=1024, height=None):
+    width = int(width)
+    edits = pbUV.density_uvs(pbUV.mesh_targets(targets), float(density), width, int(height or width))
+    pbUV.write_uvs(edits)
+    return {'meshes': len(edits)}
+
+
+def _op_layout(pbUV, targets, context, tiles='1001', padding=4, size=1024):
+    padding = float(padding) / float(size)
+    edits = pbUV.layout_uvs(pbUV.mesh_targets(targets), [int(i) for i in tiles.split(',')], (padding, padding))
+    pbUV.write_uvs(edits)
+    return {'meshes': len(edits)}
+
+
+def _op_unfold(pbUV, targets, context, axis='uv'):
+    edits, unconverged = pbUV.unfold_uvs(pbUV.mesh_targets(targets), {'uv': 0, 'v': 1, 'u': 2}[axis], processes=1)
+    pbUV.write_uvs(edits)
+    return {'meshes': len(edits), 'unconverged': unconverged}
+
+
+def _op_stack(pbUV, targets, context, mode='stack'):
+    meshes = pbUV.mesh_targets(targets)
+    edits = pbUV.unstack_uvs(meshes) if mode == 'unstack' else pbUV.stack_uvs(meshes)
+    pbUV.write_uvs(edits)
+    return {'meshes': len(edits)}
+
+
+def _op_snapshot(pbUV, targets, context, size=1024):
+    folder = context['out'] or os.path.dirname(os.path.abspath(context['scene']))
+    scene = os.path.splitext(os.path.basename(context['scene']))[0]
+    jobs = []
+    for mesh, uvset in targets:
+        name = mesh.split('|')[-1].replace(':', '_')
+        jobs.append((mesh, uvset, os.path.join(folder, '{0}_{1}.png'.format(scene, name))))
+    images = pbUV.batch_snapshots(jobs, int(size), int(size), processes=1)
+    return {'images': [i[0] for i in images]}
+
+
+def _op_validate(pbUV, targets, context):
+    reports = pbUV.validate_meshes(targets, processes=1)
+    result = OrderedDict()
+    for key in ('flipped', 'degenerate', 'overlapping'):
+        result[key] = sum(len(i.get(key, [])) for i in reports)
+    result['problems'] = [i['mesh'] for i in reports
+                          if any(len(i.get(k, [])) for k in ('flipped', 'degenerate', 'overlapping'))]
+    return result
+
+
+def _op_distortion(pbUV, targets, context, limits='', heatmap=None):
+    reports = pbUV.distortion_meshes(targets)
+    if heatmap:
+        pbUV.write_heatmap(reports, heatmap)
+    stats = pbUV.distortion_summary(reports)
+    result = OrderedDict([('faces', sum(len(i[2]) for i in reports)), ('degenerate', stats.pop('degenerate'))])
+    for key, value in stats.items():
+        result[key] = OrderedDict([('mean', value['mean']), ('p95', value['percentiles'][95]),
+                                   ('max', value['max'])])
+    result['failed'] = []
+    for limit in filter(None, limits.split(',')):
+        key, value = limit.split('=')
+        if result[key]['p95'] > float(value):
+            result['failed'].append(key)
+    return result
+
+
+OPS = OrderedDict([('align', _op_align), ('snap', _op_snap), ('density', _op_density), ('layout', _op_layout),
+                   ('unfold', _op_unfold), ('stack', _op_stack),
+                   ('snapshot', _op_snapshot), ('validate', _op_validate), ('distortion', _op_distortion)])
+
+
+def parse_ops(specs):
+    """
+    [(name, [args]), ...] from 'name:arg:...' strings, tuples pass through
+    """
+    ops = []
+    for spec in specs:
+        if isinstance(spec, (tuple, list)):
+            name, args = spec[0], list(spec[1:])
+        else:
+            parts = spec.split(':')
+            name, args = parts[0], parts[1:]
+        if name not in OPS:
+            raise ValueError('Unknown operation {0}, expected one of {1}'.format(name, ', '.join(OPS)))
+        ops.append((name, args))
+    return ops
+
+
+# Scenes
+def initialize():
+    """
+    Start Maya in this (mayapy) process with undo off, pbUV importable from next to this file
+    """
+    import maya.standalone
+    maya.standalone.initialize(name='python')
+    folder = os.path.dirname(os.path.abspath(__file__))
+    if folder not in sys.path:
+        sys.path.insert(0, folder)
+    import pymel.core as pm
+    pm.undoInfo(state=False)
+
+
+def scene_targets(pm, meshes=None, uvset=None):
+    """
+    [(mesh, uv set), ...] for every non intermediate mesh of the open scene, or those matching the patterns
+    """
+    targets = []
+    for shape in pm.ls(type='mesh', ni=True, long=True):
+        name = shape.longName()
+        if meshes and not any(fnmatch.fnmatch(name, i) or fnmatch.fnmatch(name.split('|')[-1], i) for i in meshes):
+            continue
+        targets.append((name, uvset))
+    return targets
+
+
+def process_scene(scene, ops, meshes=None, uvset=None, out=None, save=False):
+    """
+    Open a scene, run the operations on its meshes and optionally save it (into out when given), returns
+    the report for this scene. Needs a running Maya, see initialize().
+    """
+    import pymel.core as pm
+    import pbUV
+
+    report = OrderedDict([('scene', scene), ('ok', True), ('error', None), ('meshes', 0), ('seconds', 0.0),
+                          ('ops', [])])
+    start = time.time()
+    try:
+        pm.openFile(scene, force=True)
+        pbUV.uv_cache.clear()
+        targets = scene_targets(pm, meshes, uvset)
+        report['meshes'] = len(targets)
+        context = {'scene': scene, 'out': out}
+        for name, args in parse_ops(ops):
+            opstart = time.time()
+            result = OPS[name](pbUV, targets, context, *args)
+            report['ops'].append(OrderedDict([('op', name), ('args', args), ('seconds', time.time() - opstart),
+                                              ('result', result)]))
+        if save:
+            if out:
+                pm.saveAs(os.path.join(out, os.path.basename(scene)), force=True)
+            else:
+                pm.saveFile(force=True)
+    except Exception:
+        report['ok'] = False
+        report['error'] = traceback.format_exc()
+    report['seconds'] = time.time() - start
+    return report
+
+
+# Workers
+def serve(ops, options):
+    """
+    Worker side: process {"scene": path} lines from stdin until it closes, one RESULT line each
+    """
+    initialize()
+    for line in iter(sys.stdin.readline, ''):
+        if not line.strip():
+            continue
+        report = process_scene(json.loads(line)['scene'], ops, **options)
+        sys.stdout.write(RESULT + json.dumps(report) + '\n')
+        sys.stdout.flush()
+
+
+def _worker_command(mayapy, ops, options):
+    command = [mayapy, os.path.abspath(__file__).replace('.pyc', '.py'), '--worker']
+    for name, args in parse_ops(ops):
+        command += ['--op', ':'.join([name] + [str(i) for i in args])]
+    if options.get('meshes'):
+        command += ['--meshes'] + list(options['meshes'])
+    if options.get('uvset'):
+        command += ['--uvset', options['uvset']]
+    if options.get('out'):
+        command += ['--out', options['out']]
+    if options.get('save'):
+        command += ['--save']
+    return command
+
+
+def _failed(scene, error):
+    return OrderedDict([('scene', scene), ('ok', False), ('error', error), ('meshes', 0), ('seconds', 0.0),
+                        ('ops', [])])
+
+
+def _read_lines(stream, lines):
+    for line in iter(stream.readline, ''):
+        lines.put(line)
+    lines.put(None)
+
+
+def _start(command):
+    """
+    A mayapy worker, its stdout read into proc.lines by a thread so waiting for a result can time out
+    """
+    proc = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, universal_newlines=True)
+    proc.lines = queue.Queue()
+    reader = threading.Thread(target=_read_lines, args=(proc.stdout, proc.lines))
+    reader.daemon = True
+    reader.start()
+    return proc
+
+
+def _result(proc, timeout=None):
+    """
+    The next report of a worker, None when it exits first. Raises queue.Empty after timeout seconds.
+    """
+    end = None if timeout is None else time.time() + timeout
+    while True:
+        line = proc.lines.get(timeout=None if end is None else max(end - time.time(), 0))
+        if line is None:
+            return None
+        if line.startswith(RESULT):
+            return json.loads(line[len(RESULT):], object_pairs_hook=OrderedDict)
+
+
+def _feed(index, command, pending, done, timeout=None):
+    """
+    One worker thread: hand scenes to its own mayapy one at a time, restarting it if it dies or takes
+    longer than timeout seconds on a scene. Every scene gets a report, failures included.
+    """
+    proc = None
+    try:
+        while True:
+            scene = pending.get()
+            if scene is None:
+                break
+            start = time.time()
+            report = error = None
+            try:
+                if proc is None or proc.poll() is not None:
+                    proc = None
+                    proc = _start(command)
+                proc.stdin.write(json.dumps({'scene': scene}) + '\n')
+                proc.stdin.flush()
+                report = _result(proc, timeout)
+            except queue.Empty:
+                error = 'no result after {0}s, mayapy worker killed'.format(timeout)
+            except (IOError, OSError) as e:
+                error = 'mayapy worker failed: {0}'.format(e) if proc is not None else \
+                    'could not start mayapy worker {0}: {1}'.format(command[0], e)
+            except Exception:
+                error = traceback.format_exc()
+            if report is None:
+                if proc is not None:
+                    if proc.poll() is None:
+                        proc.kill()
+                    code = proc.wait()
+                    error = error or 'mayapy worker exited with {0}'.format(code)
+                report = _failed(scene, error)
+                report['seconds'] = time.time() - start
+                proc = None
+            report['worker'] = index
+            done.put(report)
+    finally:
+        if proc is not None:
+            proc.stdin.close()
+            proc.wait()
+        done.put(None)
+
+
+def run(scenes, ops, workers=1, mayapy=None, queue_size=None, timeout=None, **options):
+    """
+    Reports for every scene, in completion order. scenes may be any iterable, it is consumed lazily through
+    a queue holding at most queue_size scenes (two per worker by default). With workers above 1 each worker
+    is a separate mayapy (mayapy, default $MAYAPY or this interpreter), killed and reported failed when a
+    scene takes longer than timeout seconds, otherwise the scenes are processed here. options are
+    process_scene's meshes, uvset, out and save. Raises RuntimeError when scenes were left without a report.
+    """
+    ops = parse_ops(ops)
+    if workers <= 1:
+        initialize()
+        for scene in scenes:
+            yield process_scene(scene, ops, **options)
+        return
+
+    command = _worker_command(mayapy or os.environ.get('MAYAPY', sys.executable), ops, options)
+    pending = queue.Queue(maxsize=queue_size or workers * 2)
+    done = queue.Queue()
+
+    produced = {'scenes': 0, 'error': None}
+
+    def produce():
+        try:
+            for scene in scenes:
+                pending.put(scene)
+                produced['scenes'] += 1
+        except Exception:
+            produced['error'] = traceback.format_exc()
+        finally:
+            for _ in range(workers):
+                pending.put(None)
+
+    threads = [threading.Thread(target=produce)]
+    threads += [threading.Thread(target=_feed, args=(i, command, pending, done, timeout)) for i in range(workers)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    remaining = workers
+    reported = 0
+    while remaining:
+        report = done.get()
+        if report is None:
+            remaining -= 1
+        else:
+            reported += 1
+            yield report
+    if produced['error'] is not None:
+        raise RuntimeError('Reading the scenes failed:\n' + produced['error'])
+    if reported < produced['scenes']:
+        raise RuntimeError('{0} of {1} scenes got no report, the workers stopped'.format(
+            produced['scenes'] - reported, produced['scenes']))
+
+
+def iter_scenes(paths, listfile=None):
+    """
+    Scene paths from arguments (wildcards expanded) and then from a list file, one per line, read lazily
+    """
+    for path in paths:
+        for match in (sorted(glob.glob(path)) if glob.has_magic(path) else [path]):
+            yield match
+    if listfile:
+        with open(listfile) as f:
+            for line in f:
+                if line.strip():
+                    yield line.strip()
+
+
+def summary(reports, seconds):
+    failed = [i for i in reports if not i['ok']]
+    lines = ['{0} scenes in {1:.1f}s, {2} failed'.format(len(reports), seconds, len(failed))]
+    optimes = OrderedDict()
+    for report in reports:
+        for op in report['ops']:
+            optimes.setdefault(op['op'], []).append(op['seconds'])
+    for name, times in optimes.items():
+        lines.append('  {0:<10} {1:8.3f}s mean  {2:8.3f}s max'.format(name, sum(times) / len(times), max(times)))
+    for report in failed:
+        lines.append('FAILED {0}: {1}'.format(report['scene'], report['error'].strip().splitlines()[-1]))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run pbUV operations over Maya scenes without the UI.')
+    parser.add_argument('scenes', nargs='*', help='scene files, wildcards allowed')
+    parser.add_argument('--list', help='text file with one scene path per line')
+    parser.add_argument('--op', action='append', required=True, help='operation, name[:arg:...]')
+    parser.add_argument('--meshes', nargs='+', help='mesh name patterns, every mesh by default')
+    parser.add_argument('--uvset', help='uv set to work on, the current one by default')
+    parser.add_argument('--out', help='folder for snapshots and saved scenes')
+    parser.add_argument('--save', action='store_true', help='save the scenes, into --out when given')
+    parser.add_argument('--workers', type=int, default=1, help='mayapy processes to run')
+    parser.add_argument('--mayapy', help='mayapy executable for the workers, $MAYAPY by default')
+    parser.add_argument('--queue', type=int, help='scenes queued ahead of the workers, 2 per worker by default')
+    parser.add_argument('--timeout', type=float, help='seconds a worker may take per scene before it is killed')
+    parser.add_argument('--report', help='write one JSON line per scene here')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    options = {'meshes': args.meshes, 'uvset': args.uvset, 'out': args.out, 'save': args.save}
+    ops = parse_ops(args.op)
+    if args.worker:
+        serve(ops, options)
+        return 0
+    if args.out and not os.path.isdir(args.out):
+        os.makedirs(args.out)
+
+    start = time.time()
+    reports = []
+    report_file = open(args.report, 'w') if args.report else None
+    try:
+        for report in run(iter_scenes(args.scenes, args.list), ops, args.workers, args.mayapy, args.queue,
+                          args.timeout, **options):
+            reports.append(OrderedDict((k, report.get(k)) for k in ('scene', 'ok', 'seconds', 'error')))
+            reports[-1]['ops'] = report['ops']
+            if report_file is not None:
+                report_file.write(json.dumps(report) + '\n')
+                report_file.flush()
+            print('{0} {1} ({2:.2f}s)'.format('ok    ' if report['ok'] else 'FAILED', report['scene'],
+                                               report['seconds']))
+    finally:
+        if report_file is not None:
+            report_file.close()
+
+    print(summary(reports, time.time() - start))
+    return 1 if any(not i['ok'] for i in reports) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
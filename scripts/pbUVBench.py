@@ -0,0 +1,669 @@
+"""
+Benchmarks for the pbUV tools outside of Maya.
+
+pymel.core and maya.api.OpenMaya are replaced by an in-memory scene that knows just enough about meshes,
+uv components and selection to drive the tool methods, and counts every call the tools make into it.
+Each case runs on synthetic meshes of increasing size and reports wall time, backend calls and how the
+time scales. Run from a plain Python with NumPy:
+
+    python pbUVBench.py --sizes 1000 10000 100000 1000000 --save bench.json
+    python pbUVBench.py --baseline bench.json --tolerance 1.5
+
+With --baseline the run fails (exit code 1) when a case is slower than baseline * tolerance.
+tests/test_bench.py runs every case under pytest at small sizes, checking the backend call counts, which
+don't depend on timing, and the baseline gate.
+"""
+from collections import OrderedDict, defaultdict, deque
+import argparse
+import importlib
+import json
+import math
+import re
+import sys
+import time
+import types
+
+import numpy as np
+
+import pbUVCore as core
+
+
+# Fake Scene
+class FakeScene(object):
+    """
+    Meshes, selection and option vars behind the fake modules, plus a counter per backend call
+    """
+
+    def __init__(self):
+        self.meshes = OrderedDict()  # name: (MeshUVs, MeshPoints)
+        self.edges = {}  # name: (E, 2) vertex pairs, made on first use
+        self.colors = {}  # name: {color set: face colors}
+        self.selection = []  # component strings or mesh names
+        self.hilite = []
+        self.option_vars = {}
+        self.commands = {}
+        self.calls = defaultdict(int)
+        self.deferred = deque()  # pm.evalDeferred callables, run by idle()
+        self.on_select = None  # stands in for SelectionChanged script jobs
+        self.idle_seconds = 0.0
+
+    def count(self, name):
+        self.calls[name] += 1
+
+    def add_mesh(self, uvs, points):
+        self.meshes[uvs.name] = (uvs, points)
+        self.edges.pop(uvs.name, None)
+
+    def mesh_edges(self, name):
+        if name not in self.edges:
+            uvs, points = self.meshes[name]
+            self.edges[name] = core.mesh_edges(points.counts, points.ids)
+        return self.edges[name]
+
+    def select_all_uvs(self):
+        self.selection = ['{0}.map[0:{1}]'.format(name, len(uvs) - 1) for name, (uvs, points) in self.meshes.items()]
+        self.hilite = list(self.meshes)
+        self.selection_changed()
+
+    def select_uvs(self, name, indices):
+        self.selection = core.component_names(name, indices)
+        self.hilite = list(self.meshes)
+        self.selection_changed()
+
+    def selection_changed(self):
+        """
+        Run the selection callback and let the scene go idle, timed separately from the tool that follows
+        """
+        if self.on_select is not None:
+            start = time.time()
+            self.on_select()
+            self.idle_seconds += time.time() - start
+
+    def idle(self):
+        while self.deferred:
+            self.deferred.popleft()()
+
+
+scene = FakeScene()
+_COMP = re.compile(r'^(.+)\.(map|f|vtx|e)\[(\d+)(?::(\d+))?\]$')
+
+
+def _parse(comp):
+    match = _COMP.match(str(comp))
+    if not match:
+        return str(comp), None, None
+    start = int(match.group(3))
+    stop = int(match.group(4)) if match.group(4) else start
+    return match.group(1), match.group(2), np.arange(start, stop + 1)
+
+
+def _components(comps, kind):
+    """
+    Convert components or mesh names to compact components of kind ('map' or 'f')
+    """
+    result = []
+    for comp in comps:
+        name, comptype, ids = _parse(comp)
+        uvs, points = scene.meshes[name]
+        if comptype is None:
+            ids = np.arange(len(uvs) if kind == 'map' else len(points))
+        elif comptype != kind:
+            # faces <-> uvs through the face-vertex lists
+            starts = np.cumsum(uvs.uv_counts) - uvs.uv_counts
+            if comptype == 'f':
+                ids = np.unique(np.concatenate([uvs.uv_ids[starts[i]:starts[i] + uvs.uv_counts[i]] for i in ids]))
+            else:
+                face = np.repeat(np.arange(len(uvs.uv_counts)), uvs.uv_counts)
+                ids = np.unique(face[np.isin(uvs.uv_ids, ids)])
+        result.extend(core.component_names(name, ids, kind))
+    return result
+
+
+# Fake pymel.core
+class _OptionVars(dict):
+    pass
+
+
+class _Mel(object):
+    def eval(self, cmd):
+        scene.count('mel.eval')
+        words = cmd.split()
+        command = scene.commands[words[0]]()
+        command.doIt(_ArgList(words[1:]))
+        return None
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            scene.count('mel.' + name)
+
+        return call
+
+
+class _ArgList(list):
+    def asInt(self, index):
+        return int(self[index])
+
+
+class _Node(str):
+    def getShape(self):
+        return _Node(self)
+
+    def node(self):
+        return _Node(_parse(self)[0])
+
+
+class _Field(object):
+    def __init__(self, value):
+        self.value = value
+
+    def getValue(self):
+        return self.value
+
+    def setValue(self, value):
+        self.value = value
+
+    def getSelect(self):
+        return self.value
+
+
+def _make_pymel():
+    pm = types.ModuleType('pymel.core')
+
+    def counted(name, function):
+        def call(*args, **kwargs):
+            scene.count(name)
+            return function(*args, **kwargs)
+
+        return call
+
+    def poly_list_component_conversion(*args, **kwargs):
+        comps = args[0] if args else scene.selection
+        if isinstance(comps, str):
+            comps = [comps]
+        return _components(comps, 'map' if kwargs.get('tuv') else 'f')
+
+    def ls(*args, **kwargs):
+        if kwargs.get('hl'):
+            return [_Node(i) for i in scene.hilite]
+        items = args[0] if args else scene.selection
+        if isinstance(items, str):
+            items = [items]
+        if not kwargs.get('fl'):
+            return [_Node(i) for i in items]
+        flat = []
+        for item in items:
+            name, comptype, ids = _parse(item)
+            if comptype is None:
+                flat.append(_Node(item))
+            else:
+                flat.extend(_Node('{0}.{1}[{2}]'.format(name, comptype, i)) for i in ids)
+        return flat
+
+    pm.polyListComponentConversion = counted('polyListComponentConversion', poly_list_component_conversion)
+    pm.ls = counted('ls', ls)
+    pm.selected = counted('selected', lambda *args, **kwargs: [_Node(i) for i in scene.selection])
+    pm.select = counted('select', lambda *args, **kwargs: None)
+    pm.currentCtx = counted('currentCtx', lambda *args, **kwargs: 'selectSuperContext')
+    pm.setToolTo = counted('setToolTo', lambda *args, **kwargs: None)
+    pm.warning = counted('warning', lambda *args, **kwargs: None)
+    pm.displayInfo = counted('displayInfo', lambda *args, **kwargs: None)
+    pm.polyEditUV = counted('polyEditUV', lambda *args, **kwargs: None)
+    pm.objExists = counted('objExists', lambda name: str(name) in scene.meshes)
+    pm.setAttr = counted('setAttr', lambda *args, **kwargs: None)
+    pm.polyInfo = counted('polyInfo', lambda name, **kwargs: ['EDGE {0:6d}: {1:6d} {2:6d}  Hard\n'.format(
+        i, a, b) for i, (a, b) in enumerate(scene.mesh_edges(name).tolist())])
+    pm.polyMapCut = counted('polyMapCut', lambda *args, **kwargs: None)
+    pm.polyMapSewMove = counted('polyMapSewMove', lambda *args, **kwargs: None)
+    pm.pluginInfo = counted('pluginInfo', lambda *args, **kwargs: bool(scene.commands))
+    pm.loadPlugin = counted('loadPlugin',
+                            lambda *args, **kwargs: importlib.import_module('pbUVPlugin').initializePlugin(None))
+    pm.evalDeferred = counted('evalDeferred', lambda function, **kwargs: scene.deferred.append(function))
+    pm.melGlobals = {'gSelect': 'selectSuperContext', 'gMove': 'moveSuperContext'}
+    pm.optionVar = _OptionVars()
+    pm.mel = _Mel()
+    return pm
+
+
+# Fake maya.api.OpenMaya
+def _make_openmaya():
+    om = types.ModuleType('maya.api.OpenMaya')
+
+    class MSpace(object):
+        kWorld = 4
+        kObject = 2
+
+    class MFn(object):
+        kTransform = 110
+        kMesh = 296
+        kMeshEdgeComponent = 548
+        kMeshPolygonComponent = 550
+        kMeshVertComponent = 553
+        kMeshMapComponent = 813
+
+    comptypes = {'map': MFn.kMeshMapComponent, 'f': MFn.kMeshPolygonComponent, 'e': MFn.kMeshEdgeComponent,
+                 'vtx': MFn.kMeshVertComponent}
+
+    class MObject(object):
+        def __init__(self, name=None, ids=None, comptype=None):
+            self.name = name
+            self.ids = ids
+            self.comptype = comptype
+
+        def isNull(self):
+            return self.ids is None
+
+        def apiType(self):
+            return comptypes.get(self.comptype, 0)
+
+    class MDagPath(object):
+        def __init__(self, other=None):
+            self.name = other.name if other is not None else None
+
+        def fullPathName(self):
+            return self.name
+
+        def partialPathName(self):
+            return self.name
+
+        def node(self):
+            return MObject(self.name)
+
+        def hasFn(self, fn):
+            return fn == MFn.kMesh
+
+        def pop(self):
+            pass
+
+    class MSelectionList(object):
+        def __init__(self):
+            scene.count('MSelectionList')
+            self.items = OrderedDict()
+
+        def add(self, item):
+            name, comptype, ids = _parse(item)
+            if name not in scene.meshes:
+                raise RuntimeError('No object matches name: {0}'.format(item))
+            self.items.setdefault((name, comptype), [])
+            if ids is not None:
+                self.items[(name, comptype)].append(ids)
+
+        def length(self):
+            return len(self.items)
+
+        def getDagPath(self, i):
+            dag = MDagPath()
+            dag.name = list(self.items)[i][0]
+            return dag
+
+        def getComponent(self, i):
+            name, comptype = list(self.items)[i]
+            ids = self.items[(name, comptype)]
+            return self.getDagPath(i), MObject(name, np.unique(np.concatenate(ids)) if ids else None, comptype)
+
+    class MFnSingleIndexedComponent(object):
+        def __init__(self, comp):
+            self.comp = comp
+
+        def getElements(self):
+            scene.count('getElements')
+            return self.comp.ids.tolist()
+
+    class MFnMesh(object):
+        def __init__(self, dag):
+            self.uvs, self.points = scene.meshes[dag.fullPathName()]
+
+        def currentUVSetName(self):
+            return self.uvs.uvset
+
+        def getUVSetNames(self):
+            return [self.uvs.uvset]
+
+        def getUVs(self, uvset=None):
+            scene.count('getUVs')
+            return self.uvs.u.tolist(), self.uvs.v.tolist()
+
+        def getAssignedUVs(self, uvset=None):
+            scene.count('getAssignedUVs')
+            return self.uvs.uv_counts.tolist(), self.uvs.uv_ids.tolist()
+
+        def setUVs(self, u, v, uvset=None):
+            scene.count('setUVs')
+            self.uvs.u = np.asarray(u, dtype=np.float64)
+            self.uvs.v = np.asarray(v, dtype=np.float64)
+
+        def getColorSetNames(self):
+            return [i for i in scene.colors.get(self.uvs.name, {}) if i != 'current']
+
+        def createColorSet(self, colorset, clamped):
+            scene.colors.setdefault(self.uvs.name, {})[colorset] = None
+
+        def deleteColorSet(self, colorset):
+            scene.colors.get(self.uvs.name, {}).pop(colorset, None)
+
+        def setCurrentColorSetName(self, colorset):
+            scene.colors[self.uvs.name]['current'] = colorset
+
+        def setFaceColors(self, colors, faces):
+            scene.count('setFaceColors')
+            sets = scene.colors[self.uvs.name]
+            sets[sets['current']] = colors
+
+        def clearUVs(self, uvset=None):
+            scene.count('clearUVs')
+
+        def assignUVs(self, counts, ids, uvset=None):
+            scene.count('assignUVs')
+            self.uvs.uv_counts = np.asarray(counts, dtype=np.int64)
+            self.uvs.uv_ids = np.asarray(ids, dtype=np.int64)
+
+        def getPoints(self, space=None):
+            scene.count('getPoints')
+            return self.points.points.tolist()
+
+        def getVertices(self):
+            scene.count('getVertices')
+            return self.points.counts.tolist(), self.points.ids.tolist()
+
+    class MFnPlugin(object):
+        def __init__(self, plugin):
+            pass
+
+        def registerCommand(self, name, creator):
+            scene.commands[name] = creator
+
+        def deregisterCommand(self, name):
+            scene.commands.pop(name, None)
+
+    class MPxCommand(object):
+        def __init__(self):
+            pass
+
+    class MNodeMessage(object):
+        @staticmethod
+        def addNodeDirtyPlugCallback(node, function, data=None):
+            return id(function)
+
+        @staticmethod
+        def addNameChangedCallback(node, function, data=None):
+            return id(function)
+
+    class MMessage(object):
+        @staticmethod
+        def removeCallback(callback):
+            pass
+
+    class MFnDagNode(object):
+        def __init__(self, dag):
+            self.isIntermediateObject = False
+
+    class MGlobal(object):
+        @staticmethod
+        def getActiveSelectionList():
+            scene.count('getActiveSelectionList')
+            sel = MSelectionList()
+            for item in scene.selection:
+                sel.add(item)
+            sel.getSelectionStrings = lambda: list(scene.selection)
+            return sel
+
+    om.MSpace = MSpace
+    om.MFn = MFn
+    om.MObject = MObject
+    om.MDagPath = MDagPath
+    om.MSelectionList = MSelectionList
+    om.MFnSingleIndexedComponent = MFnSingleIndexedComponent
+    om.MFnMesh = MFnMesh
+    om.MFnDagNode = MFnDagNode
+    om.MFnPlugin = MFnPlugin
+    om.MPxCommand = MPxCommand
+    om.MNodeMessage = MNodeMessage
+    om.MMessage = MMessage
+    om.MGlobal = MGlobal
+    om.MFloatArray = list
+    om.MIntArray = list
+    om.MColorArray = list
+    return om
+
+
+def install():
+    """
+    Put the fake pymel / maya modules into sys.modules and import pbUV against them
+    """
+    pm = _make_pymel()
+    om = _make_openmaya()
+    common = types.ModuleType('pymel.util.common')
+    common.path = str
+    utils = types.ModuleType('maya.utils')
+    utils.executeDeferred = lambda function, *args, **kwargs: function(*args, **kwargs)
+    modules = {'pymel': types.ModuleType('pymel'), 'pymel.core': pm, 'pymel.util': types.ModuleType('pymel.util'),
+               'pymel.util.common': common, 'maya': types.ModuleType('maya'),
+               'maya.api': types.ModuleType('maya.api'), 'maya.api.OpenMaya': om, 'maya.utils': utils}
+    modules['pymel'].core = pm
+    modules['pymel'].util = modules['pymel.util']
+    modules['pymel.util'].common = common
+    modules['maya'].api = modules['maya.api']
+    modules['maya'].utils = utils
+    modules['maya.api'].OpenMaya = om
+    sys.modules.update(modules)
+
+    import pbUV
+    return pbUV
+
+
+# Synthetic Meshes
+def grid_mesh(name, uvcount, shell=16):
+    """
+    Quad mesh with roughly uvcount uvs, split into shells of shell x shell quads laid out in rows
+    """
+    per = (shell + 1) ** 2
+    shells = max(1, int(round(uvcount / float(per))))
+    side = int(math.ceil(math.sqrt(shells)))
+
+    gu, gv = np.meshgrid(np.arange(shell + 1, dtype=np.float64), np.arange(shell + 1, dtype=np.float64))
+    quad = np.arange(shell)[:, None] * (shell + 1) + np.arange(shell)[None, :]
+    quad = np.stack((quad, quad + 1, quad + shell + 2, quad + shell + 1), axis=-1).reshape(-1)
+
+    cell = 1.0 / side
+    s = np.arange(shells)
+    u = ((gu.reshape(1, -1) / shell * 0.9 + (s % side)[:, None]) * cell).reshape(-1)
+    v = ((gv.reshape(1, -1) / shell * 0.9 + (s // side)[:, None]) * cell).reshape(-1)
+    ids = (quad[None, :] + s[:, None] * per).reshape(-1)
+    counts = np.full(shells * shell * shell, 4)
+
+    points = np.column_stack((u * 10, v * 10, np.zeros(len(u))))
+    return core.MeshUVs(name, 'map1', u, v, counts, ids), core.MeshPoints(name, points, counts, ids)
+
+
+# Cases
+def _tool(pbUV, cls, **attrs):
+    tool = cls.__new__(cls)
+    for key, value in attrs.items():
+        setattr(tool, key, value)
+    return tool
+
+
+def case_get_shells(pbUV):
+    scene.select_all_uvs()
+    pbUV.UV().get_shells()
+
+
+def case_align_shells(pbUV):
+    scene.select_all_uvs()
+    _tool(pbUV, pbUV.AlignUI).align_shells('left')
+
+
+def case_snap_uvs(pbUV):
+    scene.select_all_uvs()
+    _tool(pbUV, pbUV.SnapUI).snap_uvs('center')
+
+
+def case_rotate(pbUV):
+    scene.select_all_uvs()
+    tool = _tool(pbUV, pbUV.TransformUI, manipValue=_Field(15.0), pivType=_Field(1))
+    for _ in range(5):
+        tool.rotate()
+
+
+def case_orient_bounds(pbUV):
+    scene.select_all_uvs()
+    _tool(pbUV, pbUV.TransformUI, pivType=_Field(1)).orient_bounds()
+
+
+def case_match_shell(pbUV):
+    name, (uvs, points) = next(iter(scene.meshes.items()))
+    scene.select_uvs(name, np.arange(min(len(uvs), 289)))
+    _tool(pbUV, pbUV.UnfoldUI).match_shell(0.01)
+
+
+def case_unfold(pbUV):
+    scene.select_all_uvs()
+    _tool(pbUV, pbUV.UnfoldUI).unfold(0)
+
+
+def case_tear_face(pbUV):
+    name, (uvs, points) = next(iter(scene.meshes.items()))
+    scene.selection = core.component_names(name, np.arange(len(points.counts) // 2), 'f')
+    scene.hilite = list(scene.meshes)
+    scene.selection_changed()
+    _tool(pbUV, pbUV.CutSewUI).tear_face()
+
+
+def case_sew_uv(pbUV):
+    name, (uvs, points) = next(iter(scene.meshes.items()))
+    edges = core.mesh_edges(points.counts, points.ids)
+    scene.selection = core.component_names(name, np.arange(0, len(edges), 7), 'e')
+    scene.hilite = list(scene.meshes)
+    scene.selection_changed()
+    _tool(pbUV, pbUV.CutSewUI).cut_uv()
+    _tool(pbUV, pbUV.CutSewUI).sew_uv()
+
+
+def case_show_distortion(pbUV):
+    scene.select_all_uvs()
+    _tool(pbUV, pbUV.DensityUI, metric=_Field('Stretch'), reports=[]).show_distortion()
+
+
+def case_sample_density(pbUV):
+    scene.select_all_uvs()
+    opts = types.SimpleNamespace(width=_Field(1024), height=_Field(1024)) if hasattr(types, 'SimpleNamespace') \
+        else type('Opts', (object,), {'width': _Field(1024), 'height': _Field(1024)})
+    _tool(pbUV, pbUV.DensityUI, opts=opts, texelDensity=_Field(0), stats=None).sample_density()
+
+
+CASES = OrderedDict([('UV.get_shells', case_get_shells),
+                     ('AlignUI.align_shells', case_align_shells),
+                     ('UnfoldUI.match_shell', case_match_shell),
+                     ('UnfoldUI.unfold', case_unfold),
+                     ('CutSewUI.tear_face', case_tear_face),
+                     ('CutSewUI.sew_uv', case_sew_uv),
+                     ('DensityUI.sample_density', case_sample_density),
+                     ('DensityUI.show_distortion', case_show_distortion),
+                     ('SnapUI.snap_uvs', case_snap_uvs),
+                     ('TransformUI.rotate', case_rotate),
+                     ('TransformUI.orient_bounds', case_orient_bounds)])
+
+
+def prefetched(pbUV):
+    """
+    Selection callback that starts pbUV's prefetch and waits for it as if the artist paused before clicking
+    """
+    def on_select():
+        pbUV.prefetch.start()
+        scene.idle()
+        worker = pbUV.prefetch.worker
+        with worker.lock:
+            while worker.jobs or worker.running:
+                worker.lock.wait()
+    return on_select
+
+
+def run(pbUV, sizes, cases=None, repeat=1, prefetch=False):
+    """
+    {case: [{'uvs', 'seconds', 'calls'}, ...]} for every case and size, best of repeat runs. With prefetch
+    the time spent warming up after the selection is left out.
+    """
+    scene.on_select = prefetched(pbUV) if prefetch else None
+    results = OrderedDict()
+    for name in cases or CASES:
+        results[name] = []
+        for size in sizes:
+            best = None
+            for _ in range(repeat):
+                scene.meshes.clear()
+                scene.add_mesh(*grid_mesh('benchShape', size))
+                pbUV.set_backend(pbUV.backend)
+                scene.calls.clear()
+                scene.idle_seconds = 0.0
+                start = time.time()
+                CASES[name](pbUV)
+                seconds = time.time() - start - scene.idle_seconds
+                if best is None or seconds < best['seconds']:
+                    best = {'uvs': len(scene.meshes['benchShape'][0]), 'seconds': seconds,
+                            'calls': dict(scene.calls)}
+            results[name].append(best)
+    return results
+
+
+def scaling(rows):
+    """
+    Slope of log(time) over log(uvs), ~1 for linear, ~2 for quadratic
+    """
+    rows = [i for i in rows if i['seconds'] > 0]
+    if len(rows) < 2:
+        return float('nan')
+    x = np.log([i['uvs'] for i in rows])
+    y = np.log([i['seconds'] for i in rows])
+    return float(np.polyfit(x, y, 1)[0])
+
+
+def report(results, out=sys.stdout):
+    for name, rows in results.items():
+        out.write('{0}  (scaling exponent {1:.2f})\n'.format(name, scaling(rows)))
+        for row in rows:
+            calls = sum(row['calls'].values())
+            out.write('  {0:>9} uvs  {1:9.4f}s  {2:6} backend calls\n'.format(row['uvs'], row['seconds'], calls))
+
+
+def compare(results, baseline, tolerance):
+    """
+    Cases slower than baseline * tolerance, as (case, uvs, seconds, baseline seconds)
+    """
+    slower = []
+    for name, rows in results.items():
+        base = dict((i['uvs'], i['seconds']) for i in baseline.get(name, []))
+        for row in rows:
+            if row['uvs'] in base and row['seconds'] > base[row['uvs']] * tolerance:
+                slower.append((name, row['uvs'], row['seconds'], base[row['uvs']]))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark pbUV tools against an in-memory Maya stand-in.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--cases', nargs='+', choices=list(CASES))
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--save', help='write results as json')
+    parser.add_argument('--baseline', help='json from an earlier --save to gate against')
+    parser.add_argument('--tolerance', type=float, default=1.5)
+    parser.add_argument('--prefetch', action='store_true', help='let the selection prefetch finish before each click')
+    args = parser.parse_args(argv)
+
+    pbUV = install()
+    pbUV.tracer.enabled = False
+    results = run(pbUV, args.sizes, args.cases, args.repeat, args.prefetch)
+    report(results)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = compare(results, json.load(f), args.tolerance)
+        for name, uvs, seconds, base in slower:
+            sys.stdout.write('SLOWER {0} at {1} uvs: {2:.4f}s vs {3:.4f}s\n'.format(name, uvs, seconds, base))
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
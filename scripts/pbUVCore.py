@@ -0,0 +1,2955 @@
+"""
+Array side of pbUV. Nothing in here imports Maya, the tools in pbUV.py fetch mesh data once and hand
+flat NumPy arrays to these functions.
+"""
+from collections import OrderedDict, deque
+import json
+import multiprocessing
+import os
+import struct
+import sys
+import threading
+import time
+import traceback
+import zlib
+
+import numpy as np
+
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+# Data Classes
+class MeshUVs(object):
+    """
+    UVs of one mesh and uv set, laid out like MFnMesh.getUVs() and MFnMesh.getAssignedUVs()
+    """
+    __slots__ = ('name', 'uvset', 'u', 'v', 'uv_counts', 'uv_ids')
+
+    def __init__(self, name, uvset, u, v, uv_counts, uv_ids):
+        self.name = name
+        self.uvset = uvset
+        self.u = np.asarray(u, dtype=np.float64)
+        self.v = np.asarray(v, dtype=np.float64)
+        self.uv_counts = np.asarray(uv_counts, dtype=np.int64)
+        self.uv_ids = np.asarray(uv_ids, dtype=np.int64)
+
+    def __getstate__(self):
+        return [getattr(self, i) for i in self.__slots__]
+
+    def __setstate__(self, state):
+        for key, value in zip(self.__slots__, state):
+            setattr(self, key, value)
+
+    def __repr__(self):
+        return 'MeshUVs({0!r}, {1!r}, {2} uvs)'.format(self.name, self.uvset, len(self.u))
+
+    def __len__(self):
+        return len(self.u)
+
+
+class MeshPoints(object):
+    """
+    Vertex positions and face-vertex layout of one mesh, as MFnMesh.getPoints() and MFnMesh.getVertices()
+    """
+    __slots__ = ('name', 'points', 'counts', 'ids')
+
+    def __init__(self, name, points, counts, ids):
+        self.name = name
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.ids = np.asarray(ids, dtype=np.int64)
+
+    def __repr__(self):
+        return 'MeshPoints({0!r}, {1} faces)'.format(self.name, len(self.counts))
+
+    def __len__(self):
+        return len(self.counts)
+
+
+class Shells(object):
+    """
+    UV shells of one mesh stored CSR style, shell i owns order[offsets[i]:offsets[i + 1]]
+    """
+    __slots__ = ('labels', 'order', 'offsets', 'bounds', 'tiles')
+
+    def __init__(self, labels, u, v):
+        self.labels = np.asarray(labels, dtype=np.int64)
+        count = self.labels.max() + 1 if len(self.labels) else 0
+
+        self.order = np.argsort(self.labels, kind='mergesort')
+        self.offsets = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.labels, minlength=count), out=self.offsets[1:])
+        self.set_bounds(u, v)
+
+    def set_bounds(self, u, v):
+        """
+        umin, umax, vmin, vmax per shell from the given uvs, the layout itself is kept
+        """
+        count = len(self.offsets) - 1
+        self.bounds = np.empty((count, 4), dtype=np.float64)
+        self.tiles = None
+        if count:
+            starts = self.offsets[:-1]
+            su = np.asarray(u)[self.order]
+            sv = np.asarray(v)[self.order]
+            self.bounds[:, 0] = np.minimum.reduceat(su, starts)
+            self.bounds[:, 1] = np.maximum.reduceat(su, starts)
+            self.bounds[:, 2] = np.minimum.reduceat(sv, starts)
+            self.bounds[:, 3] = np.maximum.reduceat(sv, starts)
+
+    def moved(self, u, v):
+        """
+        Copy sharing the layout with bounds from new uvs, for edits that don't change the shells
+        """
+        shells = Shells.__new__(Shells)
+        shells.labels = self.labels
+        shells.order = self.order
+        shells.offsets = self.offsets
+        shells.set_bounds(u, v)
+        return shells
+
+    def tile_index(self):
+        """
+        TileIndex of these shells, built on first use and kept until the bounds change
+        """
+        if self.tiles is None:
+            self.tiles = TileIndex(self.bounds)
+        return self.tiles
+
+    def __repr__(self):
+        return 'Shells({0})'.format(len(self))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, shell):
+        return self.order[self.offsets[shell]:self.offsets[shell + 1]]
+
+    def subset(self, shells):
+        """
+        (order, offsets) of just the given shells, in the same CSR layout
+        """
+        shells = np.asarray(shells, dtype=np.int64)
+        counts = self.offsets[shells + 1] - self.offsets[shells]
+        slots = _expand_ranges(self.offsets[shells], counts)[0]
+        return self.order[slots], np.concatenate(([0], np.cumsum(counts)))
+
+    def touched(self, indices):
+        """
+        Shell ids containing any of the given uv indices or IndexRanges, in ascending order
+        """
+        if isinstance(indices, IndexRanges):
+            return np.unique(self.labels[indices.mask(len(self.labels))])
+        return np.unique(self.labels[np.asarray(indices, dtype=np.int64)])
+
+    def ranges(self, mesh, shells):
+        """
+        IndexRanges of every given shell, the runs of all of them found in one pass over their uvs
+        """
+        if not len(shells):
+            return []
+        order, offsets = self.subset(shells)
+        starts = np.ones(len(order), dtype=bool)
+        starts[1:] = np.diff(order) != 1
+        starts[offsets[:-1]] = True
+        first = np.flatnonzero(starts)
+        last = np.append(first[1:], len(order)) - 1
+        runs = np.column_stack((order[first], order[last] + 1))
+        return [IndexRanges(mesh, i) for i in np.split(runs, np.searchsorted(first, offsets[1:-1]))]
+
+
+class TileIndex(object):
+    """
+    Shells bucketed by the UDIM tile holding their bounds center, tile t owns
+    order[offsets[i]:offsets[i + 1]] where tiles[i] == t
+    """
+    __slots__ = ('shell_tiles', 'tiles', 'order', 'offsets')
+
+    def __init__(self, bounds):
+        bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 4)
+        self.shell_tiles = udim_tile((bounds[:, 0] + bounds[:, 1]) * 0.5, (bounds[:, 2] + bounds[:, 3]) * 0.5)
+        self.order = np.argsort(self.shell_tiles, kind='mergesort')
+        self.tiles, counts = np.unique(self.shell_tiles, return_counts=True)
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def __repr__(self):
+        return 'TileIndex({0})'.format(self.tiles.tolist())
+
+    def __len__(self):
+        return len(self.tiles)
+
+    def __getitem__(self, tile):
+        """
+        Shell ids in a tile
+        """
+        i = np.searchsorted(self.tiles, tile)
+        if i == len(self.tiles) or self.tiles[i] != tile:
+            return self.order[:0]
+        return self.order[self.offsets[i]:self.offsets[i + 1]]
+
+
+# Shells
+def label_shells(num_uvs, uv_counts, uv_ids):
+    """
+    Label every uv with a shell id from 0..n-1.
+
+    Each face links its uvs to its first uv, roots get hooked onto the smaller label and paths are
+    compressed with pointer jumping until every link agrees. Unreferenced uvs end up in their own shell.
+    """
+    labels = np.arange(num_uvs, dtype=np.int64)
+    uv_counts = np.asarray(uv_counts, dtype=np.int64)
+    uv_ids = np.asarray(uv_ids, dtype=np.int64)
+
+    mapped = uv_counts > 0
+    if len(uv_ids) and mapped.any():
+        starts = (np.cumsum(uv_counts) - uv_counts)[mapped]
+        first = np.repeat(uv_ids[starts], uv_counts[mapped])
+        linked = first != uv_ids
+        labels = _union_labels(labels, first[linked], uv_ids[linked])
+
+    return np.unique(labels, return_inverse=True)[1].astype(np.int64).reshape(-1)
+
+
+def _union_labels(labels, a, b):
+    """
+    Join labels[a[i]] and labels[b[i]] until every link agrees, each group ends up on its smallest label
+    """
+    while True:
+        la = labels[a]
+        lb = labels[b]
+        diff = la != lb
+        if not diff.any():
+            return labels
+        lo = np.minimum(la[diff], lb[diff])
+        hi = np.maximum(la[diff], lb[diff])
+        labels[hi] = lo
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+
+
+def mesh_shells(mesh):
+    return Shells(label_shells(len(mesh), mesh.uv_counts, mesh.uv_ids), mesh.u, mesh.v)
+
+
+# Components
+def index_ranges(indices):
+    """
+    Sorted unique indices collapsed to inclusive (start, stop) runs
+    """
+    indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+    if len(indices) > 1 and not (indices[1:] > indices[:-1]).all():
+        indices = np.unique(indices)
+    if not len(indices):
+        return np.empty((0, 2), dtype=np.int64)
+    breaks = np.flatnonzero(np.diff(indices) != 1)
+    starts = np.concatenate(([indices[0]], indices[breaks + 1]))
+    stops = np.concatenate((indices[breaks], [indices[-1]]))
+    return np.column_stack((starts, stops))
+
+
+def _merge_ranges(ranges):
+    """
+    Sort half open [start, stop) rows and fuse the ones that overlap or touch
+    """
+    ranges = ranges[ranges[:, 1] > ranges[:, 0]]
+    if not len(ranges):
+        return ranges
+    ranges = ranges[np.lexsort((ranges[:, 1], ranges[:, 0]))]
+    reach = np.maximum.accumulate(ranges[:, 1])
+    new = np.ones(len(ranges), dtype=bool)
+    new[1:] = ranges[1:, 0] > reach[:-1]
+    starts = ranges[new, 0]
+    stops = reach[np.concatenate((np.flatnonzero(new)[1:] - 1, [len(ranges) - 1]))]
+    return np.column_stack((starts, stops))
+
+
+def _covered(ranges, x):
+    if not len(ranges):
+        return np.zeros(np.shape(x), dtype=bool)
+    i = np.searchsorted(ranges[:, 0], x, 'right') - 1
+    return (i >= 0) & (x < ranges[np.maximum(i, 0), 1])
+
+
+class IndexRanges(object):
+    """
+    Components of one mesh as sorted, non-overlapping half open [start, stop) index runs in an int32 array.
+    A whole shell or a fully selected mesh is a handful of rows instead of one Python object per uv,
+    the map[a:b] strings are only built with names() when a Maya command needs them.
+    """
+    __slots__ = ('mesh', 'ranges', 'comp')
+
+    def __init__(self, mesh, ranges=None, comp='map'):
+        self.mesh = mesh
+        self.comp = comp
+        if ranges is None:
+            ranges = np.empty((0, 2))
+        self.ranges = _merge_ranges(np.asarray(ranges, dtype=np.int64).reshape(-1, 2)).astype(np.int32)
+
+    @classmethod
+    def from_indices(cls, mesh, indices, comp='map'):
+        runs = index_ranges(indices)
+        runs[:, 1] += 1
+        return cls(mesh, runs, comp)
+
+    def __getstate__(self):
+        return self.mesh, self.ranges, self.comp
+
+    def __setstate__(self, state):
+        self.mesh, self.ranges, self.comp = state
+
+    def __repr__(self):
+        return 'IndexRanges({0!r}, {1} {2} in {3} runs)'.format(self.mesh, len(self), self.comp, len(self.ranges))
+
+    def __len__(self):
+        return int((self.ranges[:, 1].astype(np.int64) - self.ranges[:, 0]).sum())
+
+    def __bool__(self):
+        return bool(len(self.ranges))
+
+    __nonzero__ = __bool__
+
+    def __iter__(self):
+        for start, stop in self.ranges:
+            for i in range(start, stop):
+                yield i
+
+    def __contains__(self, index):
+        return bool(_covered(self.ranges, np.asarray([index]))[0])
+
+    def __eq__(self, other):
+        return (isinstance(other, IndexRanges) and self.mesh == other.mesh and self.comp == other.comp and
+                np.array_equal(self.ranges, other.ranges))
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def indices(self):
+        """
+        Every index as a flat int64 array
+        """
+        ranges = self.ranges.astype(np.int64)
+        return _expand_ranges(ranges[:, 0], ranges[:, 1] - ranges[:, 0])[0]
+
+    def mask(self, size):
+        """
+        Boolean array of length size that is True at every index, filled run by run without listing them
+        """
+        steps = np.zeros(size + 1, dtype=np.int8)
+        steps[self.ranges[:, 0]] = 1
+        steps[self.ranges[:, 1]] = -1
+        return np.cumsum(steps[:-1]) > 0
+
+    def contains(self, indices):
+        """
+        Vectorised membership test
+        """
+        return _covered(self.ranges, np.asarray(indices))
+
+    def _combine(self, other, keep):
+        if other.mesh != self.mesh or other.comp != self.comp:
+            raise ValueError('Cannot combine components of {0} and {1}'.format(self.mesh, other.mesh))
+        cuts = np.unique(np.concatenate((self.ranges.ravel(), other.ranges.ravel())))
+        lefts = cuts[:-1]
+        select = keep(_covered(self.ranges, lefts), _covered(other.ranges, lefts))
+        return IndexRanges(self.mesh, np.column_stack((lefts[select], cuts[1:][select])), self.comp)
+
+    def __or__(self, other):
+        return self._combine(other, np.logical_or)
+
+    def __and__(self, other):
+        return self._combine(other, np.logical_and)
+
+    def __sub__(self, other):
+        return self._combine(other, lambda a, b: a & ~b)
+
+    def __xor__(self, other):
+        return self._combine(other, np.logical_xor)
+
+    def names(self):
+        """
+        Compact Maya component strings, e.g. pCubeShape1.map[0:7]
+        """
+        names = []
+        for start, stop in self.ranges:
+            if stop - start == 1:
+                names.append('{0}.{1}[{2}]'.format(self.mesh, self.comp, start))
+            else:
+                names.append('{0}.{1}[{2}:{3}]'.format(self.mesh, self.comp, start, stop - 1))
+        return names
+
+
+def component_names(name, indices, comp='map'):
+    """
+    Compact component strings, e.g. pCubeShape1.map[0:7]
+    """
+    names = []
+    for start, stop in index_ranges(indices):
+        if start == stop:
+            names.append('{0}.{1}[{2}]'.format(name, comp, start))
+        else:
+            names.append('{0}.{1}[{2}:{3}]'.format(name, comp, start, stop))
+    return names
+
+
+def uv_bounds(mesh, indices):
+    """
+    umin, umax, vmin, vmax of the given uvs
+    """
+    u = mesh.u[indices]
+    v = mesh.v[indices]
+    return np.array([u.min(), u.max(), v.min(), v.max()])
+
+
+def bounds_union(bounds):
+    """
+    Combine (n, 4) umin, umax, vmin, vmax rows into one
+    """
+    bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 4)
+    return np.array([bounds[:, 0].min(), bounds[:, 1].max(), bounds[:, 2].min(), bounds[:, 3].max()])
+
+
+# Topology
+def _next_corners(counts):
+    """
+    Face-vertex position following each one around its face
+    """
+    ends = np.cumsum(counts)
+    nxt = np.arange(1, ends[-1] + 1 if len(ends) else 1)
+    nxt[ends[counts > 0] - 1] = (ends - counts)[counts > 0]
+    return nxt
+
+
+def _csr(keys, count):
+    """
+    (order, offsets) grouping positions by key, key k owns order[offsets[k]:offsets[k + 1]]
+    """
+    order = np.argsort(keys, kind='mergesort')
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=count), out=offsets[1:])
+    return order, offsets
+
+
+def mesh_edges(counts, ids):
+    """
+    (E, 2) vertex pairs of the edges of a face-vertex layout, numbered in order of first use
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    ids = np.asarray(ids, dtype=np.int64)
+    if not len(ids):
+        return np.zeros((0, 2), dtype=np.int64)
+    a, b = ids, ids[_next_corners(counts)]
+    pairs = np.column_stack((np.minimum(a, b), np.maximum(a, b)))
+    keys = pairs[:, 0] * (ids.max() + 1) + pairs[:, 1]
+    first = np.unique(keys, return_index=True)[1]
+    return pairs[np.sort(first)]
+
+
+def topology_key(counts, ids):
+    """
+    Value that changes whenever the face-vertex layout does, winding and spun edges included, for keeping a
+    Topology while it stays equal
+    """
+    counts = np.ascontiguousarray(counts, dtype=np.int64)
+    ids = np.ascontiguousarray(ids, dtype=np.int64)
+    return len(counts), len(ids), zlib.crc32(counts.tobytes()), zlib.crc32(ids.tobytes())
+
+
+class Topology(object):
+    """
+    Face, vertex, edge and uv adjacency of one mesh as CSR arrays, so component conversions are lookups.
+    Built from MFnMesh.getVertices() counts and ids, edges (vertex pairs by edge id, see MeshBackend.read_edges)
+    are only needed for edge conversions and can be set later. Conversions to and from uvs take the
+    MeshUVs of a uv set, the uv layout changes far more often than the mesh does.
+    """
+    __slots__ = ('counts', 'ids', 'starts', 'next', 'face', 'vertex_order', 'vertex_offsets', 'edges', 'fv_edges',
+                 'edge_order', 'edge_offsets')
+
+    def __init__(self, counts, ids, edges=None):
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.starts = np.cumsum(self.counts) - self.counts
+        self.next = _next_corners(self.counts)
+        self.face = np.repeat(np.arange(len(self.counts)), self.counts)
+        self.vertex_order, self.vertex_offsets = _csr(self.ids, self.ids.max() + 1 if len(self.ids) else 0)
+        self.edges = None
+        if edges is not None:
+            self.set_edges(edges)
+
+    def __repr__(self):
+        return 'Topology({0} faces, {1} edges)'.format(len(self.counts),
+                                                      'unknown' if self.edges is None else len(self.edges))
+
+    def set_edges(self, edges):
+        """
+        Number the side of every face-vertex (to the next one around its face) with the mesh's edge ids
+        """
+        self.edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        span = int(max(self.ids.max(initial=-1), self.edges.max(initial=-1))) + 1
+        keys = self.edges.min(axis=1) * span + self.edges.max(axis=1)
+        a, b = self.ids, self.ids[self.next]
+        sides = np.minimum(a, b) * span + np.maximum(a, b)
+        order = np.argsort(keys)
+        found = np.minimum(np.searchsorted(keys[order], sides), max(len(keys) - 1, 0))
+        hit = keys[order][found] == sides if len(keys) else np.zeros(len(sides), dtype=bool)
+        if not hit.all():
+            raise ValueError('{0} face sides have no edge'.format(len(hit) - hit.sum()))
+        self.fv_edges = order[found]
+        self.edge_order, self.edge_offsets = _csr(self.fv_edges, len(self.edges))
+
+    def corners(self, faces):
+        """
+        Face-vertex positions of the given faces
+        """
+        faces = np.asarray(faces, dtype=np.int64)
+        return _expand_ranges(self.starts[faces], self.counts[faces])[0]
+
+    def corner_uvs(self, uvs):
+        """
+        uv id of every face-vertex, -1 on faces without uvs
+        """
+        return _corner_uvs(self, uvs)
+
+    def face_uvs(self, uvs, faces):
+        found = self.corner_uvs(uvs)[self.corners(faces)]
+        return np.unique(found[found >= 0])
+
+    def face_vertices(self, faces):
+        return np.unique(self.ids[self.corners(faces)])
+
+    def face_edges(self, faces, internal=False):
+        """
+        Edges of the faces, with internal only those whose faces are all among them
+        """
+        sides = self.fv_edges[self.corners(faces)]
+        edges = np.unique(sides)
+        if internal:
+            inside = np.bincount(sides, minlength=len(self.edges))[edges]
+            edges = edges[inside == np.diff(self.edge_offsets)[edges]]
+        return edges
+
+    def uv_faces(self, uvs, ids, contained=False):
+        """
+        Faces using any of the uvs, with contained only faces whose uvs are all among them
+        """
+        hit = np.zeros(len(uvs) + 1, dtype=bool)
+        hit[np.asarray(ids, dtype=np.int64)] = True
+        corner = hit[self.corner_uvs(uvs)]  # -1 lands on the spare False
+        count = np.bincount(self.face, corner, minlength=len(self.counts))
+        return np.flatnonzero(count == self.counts if contained else count > 0)
+
+    def vertex_corners(self, vertices):
+        vertices = np.asarray(vertices, dtype=np.int64)
+        counts = np.diff(self.vertex_offsets)[vertices]
+        return self.vertex_order[_expand_ranges(self.vertex_offsets[vertices], counts)[0]]
+
+    def vertex_faces(self, vertices):
+        return np.unique(self.face[self.vertex_corners(vertices)])
+
+    def vertex_uvs(self, uvs, vertices):
+        found = self.corner_uvs(uvs)[self.vertex_corners(vertices)]
+        return np.unique(found[found >= 0])
+
+    def edge_corners(self, edges):
+        """
+        Face-vertex positions starting a side on one of the edges
+        """
+        edges = np.asarray(edges, dtype=np.int64)
+        return self.edge_order[_expand_ranges(self.edge_offsets[edges], np.diff(self.edge_offsets)[edges])[0]]
+
+    def edge_faces(self, edges):
+        return np.unique(self.face[self.edge_corners(edges)])
+
+    def edge_uvs(self, uvs, edges):
+        """
+        uvs at both ends of the edges, on every face using them
+        """
+        start = self.edge_corners(edges)
+        found = self.corner_uvs(uvs)[np.concatenate((start, self.next[start]))]
+        return np.unique(found[found >= 0])
+
+    def uv_border_edges(self, uvs):
+        """
+        Edges on a uv border: mesh border edges, and edges whose faces don't share both uvs (seams)
+        """
+        corner = self.corner_uvs(uvs)
+        a, b = corner, corner[self.next]
+        key = np.minimum(a, b) * (len(uvs) + 1) + np.maximum(a, b)
+        key[(a < 0) | (b < 0)] = -1 - np.arange(((a < 0) | (b < 0)).sum())  # unmapped sides never match
+        # a side is on a border unless another side of the same edge uses the same two uvs
+        order = np.lexsort((key, self.fv_edges))
+        same = (self.fv_edges[order][1:] == self.fv_edges[order][:-1]) & (key[order][1:] == key[order][:-1])
+        shared = np.zeros(len(key), dtype=bool)
+        shared[order[1:][same]] = True
+        shared[order[:-1][same]] = True
+        return np.unique(self.fv_edges[~shared])
+
+
+# Cut and Sew
+def _edge_partners(topo, edges):
+    """
+    (corner, corner) pairs facing each other across the edges, every side linked to the first side of its
+    edge. Both ends of a side are paired with the face-vertex on the same vertex of the other side.
+    """
+    sides = topo.edge_corners(edges)
+    first = topo.edge_order[topo.edge_offsets[topo.fv_edges[sides]]]
+    sides, first = sides[sides != first], first[sides != first]
+    s0, s1 = sides, topo.next[sides]
+    p0, p1 = first, topo.next[first]
+    q0 = np.where(topo.ids[p0] == topo.ids[s0], p0, p1)
+    q1 = np.where(topo.ids[p1] == topo.ids[s1], p1, p0)
+    return np.concatenate((s0, s1)), np.concatenate((q0, q1))
+
+
+def _merged(uvs, corner, a, b):
+    """
+    MeshUVs with uvs a[i] and b[i] made one, at the mean of what was merged. Unused uvs are dropped and the
+    rest renumbered in order.
+    """
+    labels = _union_labels(np.arange(len(uvs), dtype=np.int64), a, b)
+    used = np.zeros(len(uvs), dtype=bool)
+    used[corner[corner >= 0]] = True
+    roots, group = np.unique(labels[used], return_inverse=True)
+    remap = np.full(len(uvs), -1, dtype=np.int64)
+    remap[used] = group
+    count = np.bincount(group, minlength=len(roots))
+    u = np.bincount(group, uvs.u[used], minlength=len(roots)) / count
+    v = np.bincount(group, uvs.v[used], minlength=len(roots)) / count
+    return MeshUVs(uvs.name, uvs.uvset, u, v, uvs.uv_counts, remap[corner[corner >= 0]])
+
+
+def cut_uvs(topo, uvs, edges):
+    """
+    MeshUVs with the uvs split along the edges. The faces around a uv stay together as long as they are
+    joined by an edge that is not cut, every other group of faces gets a copy of the uv.
+    """
+    corner = topo.corner_uvs(uvs)
+    cut = np.zeros(len(topo.edges), dtype=bool)
+    cut[np.asarray(edges, dtype=np.int64)] = True
+    ends = np.unique(corner[np.concatenate((topo.edge_corners(np.flatnonzero(cut)),
+                                            topo.next[topo.edge_corners(np.flatnonzero(cut))]))])
+    ends = ends[ends >= 0]
+    if not len(ends):
+        return uvs
+
+    a, b = _edge_partners(topo, np.flatnonzero(~cut))
+    joined = (corner[a] == corner[b]) & (corner[a] >= 0)
+    labels = _union_labels(np.arange(len(corner), dtype=np.int64), a[joined], b[joined])
+
+    touched = np.zeros(len(uvs) + 1, dtype=bool)
+    touched[ends] = True
+    found = np.flatnonzero(touched[corner])
+    keys, inverse = np.unique(corner[found] * len(corner) + labels[found], return_inverse=True)
+    owner = keys // len(corner)
+    split = np.concatenate(([False], owner[1:] == owner[:-1]))
+    ids = owner.copy()
+    ids[split] = len(uvs) + np.arange(split.sum())
+    corner[found] = ids[inverse]
+    return MeshUVs(uvs.name, uvs.uvset, np.concatenate((uvs.u, uvs.u[owner[split]])),
+                   np.concatenate((uvs.v, uvs.v[owner[split]])), uvs.uv_counts, corner[corner >= 0])
+
+
+def sew_uvs(topo, uvs, edges):
+    """
+    MeshUVs with the uvs on both sides of the edges merged, each at the midpoint of the uvs it replaces
+    """
+    corner = topo.corner_uvs(uvs)
+    a, b = _edge_partners(topo, edges)
+    a, b = corner[a], corner[b]
+    keep = (a >= 0) & (b >= 0) & (a != b)
+    if not keep.any():
+        return uvs
+    return _merged(uvs, corner, a[keep], b[keep])
+
+
+def weld_uvs(topo, uvs, ids, distance):
+    """
+    MeshUVs with the given uvs merged when they are on the same vertex and at most distance apart, like
+    polyMergeUV. Candidates come from a SpatialHash over the given uvs.
+    """
+    corner = topo.corner_uvs(uvs)
+    ids = np.unique(np.asarray(ids, dtype=np.int64))
+    vertex = np.full(len(uvs), -1, dtype=np.int64)
+    vertex[corner[corner >= 0]] = topo.ids[corner >= 0]
+
+    points = np.column_stack((uvs.u[ids], uvs.v[ids]))
+    i, j = SpatialHash(points, max(distance, 1e-9)).candidates(points)
+    keep = (i < j) & (vertex[ids[i]] == vertex[ids[j]])
+    keep[keep] = ((points[i[keep]] - points[j[keep]]) ** 2).sum(axis=1) <= distance ** 2
+    if not keep.any():
+        return uvs
+    return _merged(uvs, corner, ids[i[keep]], ids[j[keep]])
+
+
+# Nearest Neighbour
+def _expand_ranges(starts, counts):
+    """
+    Concatenated arange(start, start + count) for every pair, plus the owner of each element
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    owner = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.cumsum(counts) - counts
+    return np.repeat(starts, counts) + (np.arange(counts.sum()) - offsets[owner]), owner
+
+
+def _closest(owner, cand, dist2, count):
+    """
+    Per owner the candidate with the smallest distance, -1 where an owner has none
+    """
+    index = np.full(count, -1, dtype=np.int64)
+    best = np.full(count, np.inf)
+    if len(owner):
+        order = np.lexsort((dist2, owner))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = owner[order][1:] != owner[order][:-1]
+        pick = order[first]
+        index[owner[pick]] = cand[pick]
+        best[owner[pick]] = dist2[pick]
+    return index, best
+
+
+class SpatialHash(object):
+    """
+    Uniform grid over 2d points, cells are sorted by key so lookups are searchsorted calls
+    """
+    __slots__ = ('points', 'cell', 'origin', 'keys', 'order', 'width')
+
+    def __init__(self, points, cell):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.cell = float(cell)
+        self.origin = self.points.min(axis=0) if len(self.points) else np.zeros(2)
+        ij = self._cells(self.points)
+        self.width = ij[:, 0].max() + 3 if len(ij) else 3
+        keys = self._keys(ij)
+        self.order = np.argsort(keys, kind='mergesort')
+        self.keys = keys[self.order]
+
+    def _cells(self, points):
+        return np.floor((points - self.origin) / self.cell).astype(np.int64)
+
+    def _keys(self, ij):
+        return (ij[:, 1] + 1) * self.width + (ij[:, 0] + 1)
+
+    def candidates(self, queries):
+        """
+        (point index, query index) pairs for every point in the 3x3 cells around each query
+        """
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, 2)
+        ij = self._cells(queries)
+        outside = (ij[:, 0] < -1) | (ij[:, 0] > self.width - 2)
+        starts, counts, owners = [], [], []
+        for du in (-1, 0, 1):
+            for dv in (-1, 0, 1):
+                keys = self._keys(ij + (du, dv))
+                lo = np.searchsorted(self.keys, keys, 'left')
+                hi = np.searchsorted(self.keys, keys, 'right')
+                hi[outside] = lo[outside]
+                starts.append(lo)
+                counts.append(hi - lo)
+                owners.append(np.arange(len(queries)))
+        starts = np.concatenate(starts)
+        counts = np.concatenate(counts)
+        owners = np.concatenate(owners)
+        slots, pair = _expand_ranges(starts, counts)
+        return self.order[slots], owners[pair]
+
+    def count(self, queries):
+        """
+        Number of candidate pairs candidates() would produce, without producing them
+        """
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, 2)
+        ij = self._cells(queries)
+        total = 0
+        for du in (-1, 0, 1):
+            for dv in (-1, 0, 1):
+                keys = self._keys(ij + (du, dv))
+                total += int((np.searchsorted(self.keys, keys, 'right') -
+                              np.searchsorted(self.keys, keys, 'left')).sum())
+        return total
+
+    def nearest(self, queries, maxrange):
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, 2)
+        cand, owner = self.candidates(queries)
+        dist2 = ((self.points[cand] - queries[owner]) ** 2).sum(axis=1)
+        keep = dist2 < maxrange * maxrange
+        index, best = _closest(owner[keep], cand[keep], dist2[keep], len(queries))
+        return index, np.sqrt(best)
+
+
+class KDTree(object):
+    """
+    Median split tree over 2d points, queries walk every query through the tree level by level
+    """
+    __slots__ = ('points', 'order', 'lo', 'hi', 'start', 'stop', 'left', 'right')
+
+    def __init__(self, points, leafsize=16):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.order = np.arange(len(self.points))
+        lo, hi, start, stop, left, right = [], [], [], [], [], []
+
+        stack = [(0, len(self.points), -1, 0)]
+        while stack:
+            a, b, parent, side = stack.pop()
+            node = len(start)
+            if parent >= 0:
+                (left if side == 0 else right)[parent] = node
+            pts = self.points[self.order[a:b]]
+            lo.append(pts.min(axis=0) if b > a else np.zeros(2))
+            hi.append(pts.max(axis=0) if b > a else np.zeros(2))
+            start.append(a)
+            stop.append(b)
+            left.append(-1)
+            right.append(-1)
+            if b - a > leafsize:
+                axis = int(np.argmax(hi[-1] - lo[-1]))
+                mid = (b - a) // 2
+                part = np.argpartition(pts[:, axis], mid)
+                self.order[a:b] = self.order[a:b][part]
+                stack.append((a, a + mid, node, 0))
+                stack.append((a + mid, b, node, 1))
+
+        self.lo = np.array(lo).reshape(-1, 2)
+        self.hi = np.array(hi).reshape(-1, 2)
+        self.start = np.array(start, dtype=np.int64)
+        self.stop = np.array(stop, dtype=np.int64)
+        self.left = np.array(left, dtype=np.int64)
+        self.right = np.array(right, dtype=np.int64)
+
+    def _gap(self, queries, node):
+        gap = np.maximum(self.lo[node] - queries, 0) + np.maximum(queries - self.hi[node], 0)
+        return (gap ** 2).sum(axis=1)
+
+    def _visit(self, queries, q, node, index, best):
+        slots, pair = _expand_ranges(self.start[node], self.stop[node] - self.start[node])
+        cand = self.order[slots]
+        owner = q[pair]
+        dist2 = ((self.points[cand] - queries[owner]) ** 2).sum(axis=1)
+        found, dist2 = _closest(owner, cand, dist2, len(queries))
+        better = dist2 < best
+        index[better] = found[better]
+        best[better] = dist2[better]
+
+    def nearest(self, queries, maxrange=np.inf):
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, 2)
+        index = np.full(len(queries), -1, dtype=np.int64)
+        best = np.full(len(queries), float(maxrange) ** 2)
+        if not len(self.points):
+            return index, np.sqrt(best)
+
+        # greedy descent to the nearer leaf gives every query a starting radius to prune with
+        q = np.arange(len(queries))
+        node = np.zeros(len(queries), dtype=np.int64)
+        inner = self.left[node] >= 0
+        while inner.any():
+            l, r = self.left[node[inner]], self.right[node[inner]]
+            dl = self._gap(queries[inner], l)
+            dr = self._gap(queries[inner], r)
+            node[inner] = np.where(dl <= dr, l, r)
+            inner = self.left[node] >= 0
+        self._visit(queries, q, node, index, best)
+
+        node = np.zeros(len(queries), dtype=np.int64)
+        while len(q):
+            keep = self._gap(queries[q], node) < best[q]
+            q, node = q[keep], node[keep]
+
+            leaf = self.left[node] < 0
+            if leaf.any():
+                self._visit(queries, q[leaf], node[leaf], index, best)
+
+            q, node = q[~leaf], node[~leaf]
+            q = np.concatenate((q, q))
+            node = np.concatenate((self.left[node], self.right[node]))
+
+        best[index < 0] = np.inf
+        return index, np.sqrt(best)
+
+
+def nearest_points(points, queries, maxrange=None, budget=64):
+    """
+    Closest point index per query within maxrange (-1 when nothing is in range) and its distance.
+
+    The spatial hash is used for radius limited queries, the KD-tree when there is no radius or the
+    points are clumped enough that the 3x3 cell neighbourhoods would hold more than budget points per query.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    queries = np.asarray(queries, dtype=np.float64).reshape(-1, 2)
+    if not len(points) or not len(queries):
+        return np.full(len(queries), -1, dtype=np.int64), np.full(len(queries), np.inf)
+
+    if maxrange is not None and 0 < maxrange < np.inf:
+        grid = SpatialHash(points, maxrange)
+        if grid.count(queries) <= budget * len(queries) + len(points):
+            return grid.nearest(queries, maxrange)
+        return KDTree(points).nearest(queries, maxrange)
+    return KDTree(points).nearest(queries)
+
+
+# Transforms
+def affine(angle=0.0, su=1.0, sv=1.0):
+    """
+    2x2 matrices that scale by (su, sv) and then rotate counter clockwise by angle degrees, arguments broadcast
+    """
+    angle, su, sv = np.broadcast_arrays(np.radians(np.asarray(angle, dtype=np.float64)),
+                                        np.asarray(su, dtype=np.float64), np.asarray(sv, dtype=np.float64))
+    c = np.cos(angle)
+    s = np.sin(angle)
+    matrix = np.empty(angle.shape + (2, 2))
+    matrix[..., 0, 0] = c * su
+    matrix[..., 0, 1] = -s * sv
+    matrix[..., 1, 0] = s * su
+    matrix[..., 1, 1] = c * sv
+    return matrix
+
+
+def affine2d(angle=0.0, su=1.0, sv=1.0, pivot=(0.0, 0.0), offset=(0.0, 0.0)):
+    """
+    3x3 homogeneous matrix that scales and rotates (degrees) about pivot and then translates by offset
+    """
+    matrix = np.eye(3)
+    matrix[:2, :2] = affine(angle, su, sv)
+    pivot = np.asarray(pivot, dtype=np.float64)
+    matrix[:2, 2] = pivot - np.dot(matrix[:2, :2], pivot) + np.asarray(offset, dtype=np.float64)
+    return matrix
+
+
+def transform_uvs(u, v, matrix):
+    matrix = np.asarray(matrix, dtype=np.float64)
+    return (matrix[0, 0] * u + matrix[0, 1] * v + matrix[0, 2],
+            matrix[1, 0] * u + matrix[1, 1] * v + matrix[1, 2])
+
+
+def uv_diff(mesh, u, v):
+    """
+    (indices, du, dv) of the uvs that differ between mesh and the new u, v arrays
+    """
+    du = np.asarray(u) - mesh.u
+    dv = np.asarray(v) - mesh.v
+    changed = np.flatnonzero((du != 0) | (dv != 0))
+    return changed, du[changed], dv[changed]
+
+
+class UVBatch(object):
+    """
+    Collects per group translate/rotate/scale edits over any number of meshes and resolves them in one
+    vectorised pass per mesh. Groups of one mesh are expected not to overlap, a uv listed twice takes the
+    last edit.
+    """
+
+    def __init__(self):
+        self.meshes = OrderedDict()
+        self.groups = OrderedDict()
+
+    def __len__(self):
+        return sum(len(j[1]) for i in self.groups.values() for j in i)
+
+    def add(self, mesh, indices, u=0.0, v=0.0, angle=0.0, su=1.0, sv=1.0, pu=0.0, pv=0.0):
+        indices = np.asarray(indices, dtype=np.int64)
+        self.add_groups(mesh, indices, [0, len(indices)], u, v, angle, su, sv, pu, pv)
+
+    def add_groups(self, mesh, order, offsets, u=0.0, v=0.0, angle=0.0, su=1.0, sv=1.0, pu=0.0, pv=0.0):
+        """
+        Several groups at once, laid out like Shells: group i is order[offsets[i]:offsets[i + 1]] and every
+        other argument is a scalar or has one value per group
+        """
+        counts = np.diff(np.asarray(offsets, dtype=np.int64))
+        n = len(counts)
+        if mesh.name not in self.meshes:
+            self.meshes[mesh.name] = mesh
+            self.groups[mesh.name] = []
+        self.groups[mesh.name].append((np.asarray(order, dtype=np.int64)[offsets[0]:offsets[-1]], counts,
+                                       affine(angle, su, sv) * np.ones((n, 1, 1)),
+                                       np.column_stack(np.broadcast_arrays(pu, pv, np.zeros(n))[:2]),
+                                       np.column_stack(np.broadcast_arrays(u, v, np.zeros(n))[:2])))
+
+    def apply(self):
+        """
+        [(MeshUVs, new u, new v), ...] with every queued edit resolved
+        """
+        result = []
+        for name, mesh in self.meshes.items():
+            groups = self.groups[name]
+            counts = np.concatenate([i[1] for i in groups])
+            indices = np.concatenate([i[0] for i in groups])
+            matrix = np.repeat(np.concatenate([i[2] for i in groups]), counts, axis=0)
+            pivot = np.repeat(np.concatenate([i[3] for i in groups]), counts, axis=0)
+            offset = np.repeat(np.concatenate([i[4] for i in groups]), counts, axis=0)
+
+            uv = np.column_stack((mesh.u[indices], mesh.v[indices])) - pivot
+            uv = np.einsum('nij,nj->ni', matrix, uv) + pivot + offset
+
+            u = mesh.u.copy()
+            v = mesh.v.copy()
+            u[indices] = uv[:, 0]
+            v[indices] = uv[:, 1]
+            result.append((mesh, u, v))
+        return result
+
+    def diff(self):
+        """
+        {mesh name: (indices, du, dv)} of what apply() would change
+        """
+        return OrderedDict((mesh.name, uv_diff(mesh, u, v)) for mesh, u, v in self.apply())
+
+
+# Orientation
+def _segment_argmin(keys, starts, owner):
+    """
+    Position of the smallest element of every contiguous, non empty segment, ties broken by the following keys
+    """
+    pick = np.ones(len(owner), dtype=bool)
+    for key in keys:
+        key = np.where(pick, key, np.inf)
+        pick &= key == np.minimum.reduceat(key, starts)[owner]
+    hits = np.flatnonzero(pick)
+    first = np.ones(len(hits), dtype=bool)
+    first[1:] = owner[hits][1:] != owner[hits][:-1]
+    return hits[first]
+
+
+def convex_hulls(u, v, order, offsets):
+    """
+    Counter clockwise convex hull of every group laid out like Shells, as (hull order, hull offsets) into u, v.
+    Every group needs at least one point.
+    Points inside the quad of each group's extreme points are dropped first (Akl-Toussaint), the rest is
+    gift wrapped one hull vertex per round for all groups at once.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    counts = np.diff(offsets)
+    n = len(counts)
+    ids = np.asarray(order, dtype=np.int64)[offsets[0]:offsets[-1]]
+    owner = np.repeat(np.arange(n), counts)
+    pu = u[ids]
+    pv = v[ids]
+
+    # left, bottom, right, top is counter clockwise
+    quad = [_segment_argmin((key,), offsets[:-1] - offsets[0], owner) for key in (pu, pv, -pu, -pv)]
+    inside = np.ones(len(ids), dtype=bool)
+    for a, b in zip(quad, quad[1:] + quad[:1]):
+        a = a[owner]
+        b = b[owner]
+        cross = (pu[b] - pu[a]) * (pv - pv[a]) - (pv[b] - pv[a]) * (pu - pu[a])
+        inside &= cross > 1e-12
+    keep = ~inside
+    ids, owner, pu, pv = ids[keep], owner[keep], pu[keep], pv[keep]
+    kcounts = np.bincount(owner, minlength=n)
+    kstarts = np.cumsum(kcounts) - kcounts
+
+    start = _segment_argmin((pv, pu), kstarts, owner)
+    current = start.copy()
+    direction = np.tile([1.0, 0.0], (n, 1))
+    groups = np.flatnonzero(kcounts)
+    found = [(groups, current[groups], np.zeros(len(groups), dtype=np.int64))]
+    step = 0
+    while len(groups):
+        step += 1
+        slots, local = _expand_ranges(kstarts[groups], kcounts[groups])
+        c = current[groups][local]
+        d = direction[groups][local]
+        wu = pu[slots] - pu[c]
+        wv = pv[slots] - pv[c]
+        turn = np.arctan2(d[:, 0] * wv - d[:, 1] * wu, d[:, 0] * wu + d[:, 1] * wv)
+        turn[turn < -1e-12] += 2 * np.pi
+        dist = wu * wu + wv * wv
+        turn[dist == 0] = np.inf
+        best = _segment_argmin((turn, -dist), np.cumsum(kcounts[groups]) - kcounts[groups], local)
+        pick = slots[best]
+
+        # back at the start, or nothing left but copies of the current point
+        done = (pick == start[groups]) | (step >= kcounts[groups]) | np.isinf(turn[best])
+        direction[groups, 0] = pu[pick] - pu[current[groups]]
+        direction[groups, 1] = pv[pick] - pv[current[groups]]
+        current[groups] = pick
+        more = ~done
+        found.append((groups[more], pick[more], np.full(more.sum(), step, dtype=np.int64)))
+        groups = groups[more]
+
+    group = np.concatenate([i[0] for i in found])
+    vertex = np.concatenate([i[1] for i in found])
+    rank = np.concatenate([i[2] for i in found])
+    sort = np.lexsort((rank, group))
+    hcounts = np.bincount(group, minlength=n)
+    return ids[vertex[sort]], np.concatenate(([0], np.cumsum(hcounts)))
+
+
+def min_area_rects(u, v, order, offsets, chunk=1 << 22):
+    """
+    Minimum area bounding rectangle of every non empty group laid out like Shells, as (angle, center, size). The
+    rectangle shares a side with the convex hull, so every hull edge direction is tried (rotating calipers)
+    and the smallest area kept. angle is the direction of the rectangle's u side in degrees, [0, 90).
+    """
+    horder, hoffsets = convex_hulls(u, v, order, offsets)
+    hcounts = np.diff(hoffsets)
+    n = len(hcounts)
+    hu = u[horder]
+    hv = v[horder]
+
+    # one candidate edge per hull vertex, to the next vertex of the same hull
+    owner = np.repeat(np.arange(n), hcounts)
+    nxt = np.arange(len(horder)) + 1
+    nxt[hoffsets[1:] - 1] = hoffsets[:-1]
+    theta = np.arctan2(hv[nxt] - hv, hu[nxt] - hu) % (np.pi / 2)
+
+    area = np.empty(len(theta))
+    extents = np.empty((len(theta), 4))
+    pairs = hcounts[owner]
+    bounds = np.searchsorted(np.cumsum(pairs), np.arange(chunk, pairs.sum() + chunk, chunk))
+    lo = 0
+    for hi in np.unique(np.append(bounds, len(theta))):
+        if hi <= lo:
+            continue
+        edges = np.arange(lo, hi)
+        slots, local = _expand_ranges(hoffsets[owner[edges]], pairs[edges])
+        cos = np.cos(theta[edges])[local]
+        sin = np.sin(theta[edges])[local]
+        x = hu[slots] * cos + hv[slots] * sin
+        y = hv[slots] * cos - hu[slots] * sin
+        at = np.cumsum(pairs[edges]) - pairs[edges]
+        ext = np.column_stack((np.minimum.reduceat(x, at), np.maximum.reduceat(x, at),
+                               np.minimum.reduceat(y, at), np.maximum.reduceat(y, at)))
+        extents[edges] = ext
+        area[edges] = (ext[:, 1] - ext[:, 0]) * (ext[:, 3] - ext[:, 2])
+        lo = hi
+
+    best = _segment_argmin((area,), hoffsets[:-1], owner)
+    t = theta[best]
+    ext = extents[best]
+    cx = (ext[:, 0] + ext[:, 1]) * 0.5
+    cy = (ext[:, 2] + ext[:, 3]) * 0.5
+    angle = np.degrees(t)
+    center = np.column_stack((cx * np.cos(t) - cy * np.sin(t), cx * np.sin(t) + cy * np.cos(t)))
+    size = np.column_stack((ext[:, 1] - ext[:, 0], ext[:, 3] - ext[:, 2]))
+    return angle, center, size
+
+
+def fit_lines(u, v, labels, count):
+    """
+    Line fitted through the points of every label as (direction in degrees, center), the direction is nan
+    for labels with fewer than two distinct points. Two points give the exact edge direction.
+    """
+    labels = np.asarray(labels, dtype=np.int64)
+    n = np.bincount(labels, minlength=count).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mu = np.bincount(labels, u, minlength=count) / n
+        mv = np.bincount(labels, v, minlength=count) / n
+    du = u - mu[labels]
+    dv = v - mv[labels]
+    cuu = np.bincount(labels, du * du, minlength=count)
+    cvv = np.bincount(labels, dv * dv, minlength=count)
+    cuv = np.bincount(labels, du * dv, minlength=count)
+    angle = np.degrees(0.5 * np.arctan2(2 * cuv, cuu - cvv))
+    angle[(n < 2) | (cuu + cvv <= 1e-24)] = np.nan
+    return angle, np.column_stack((mu, mv))
+
+
+def axis_rotation(angle):
+    """
+    Smallest rotation in degrees that lines a direction up with the u or v axis, (-45, 45]
+    """
+    return -((np.asarray(angle, dtype=np.float64) + 45.0) % 90.0 - 45.0)
+
+
+# Stacking
+_HASH_WEIGHTS = (np.random.RandomState(0x5eed).randint(1, 1 << 62, size=4096, dtype=np.int64).astype(np.uint64) |
+                 np.uint64(1))
+
+
+def shell_fingerprints(uvs, shells, tol=1e-4):
+    """
+    One int64 row per shell that is equal for shells that are copies of each other up to rotation and
+    translation: uv, face and face-vertex counts, a hash of the faces over uv ranks within the shell, and
+    signed area, edge length sum, rms edge length and radius of gyration quantized to tol
+    """
+    count = len(shells.offsets) - 1
+    rank = np.empty(len(uvs), dtype=np.int64)
+    rank[shells.order] = np.arange(len(uvs)) - np.repeat(shells.offsets[:-1], np.diff(shells.offsets))
+
+    counts = uvs.uv_counts[uvs.uv_counts > 0]
+    starts = np.cumsum(counts) - counts
+    fshell = shells.labels[uvs.uv_ids[starts]]
+    corner = np.repeat(fshell, counts)
+
+    # faces of a shell in mesh order, each uv rank weighted by its position in that stream
+    forder = np.argsort(fshell, kind='mergesort')
+    stream = _expand_ranges(starts[forder], counts[forder])[0]
+    stream_shell = corner[stream]
+    fv_count = np.bincount(stream_shell, minlength=count)
+    fv_start = np.cumsum(fv_count) - fv_count
+    pos = np.arange(len(stream)) - fv_start[stream_shell]
+    first = np.zeros(len(uvs.uv_ids), dtype=np.uint64)
+    first[starts] = 1 << 32
+    value = (rank[uvs.uv_ids[stream]].astype(np.uint64) + 1 + first[stream]) * _HASH_WEIGHTS[pos % len(_HASH_WEIGHTS)]
+    topo = np.zeros(count, dtype=np.uint64)
+    nonempty = fv_count > 0
+    if len(stream):
+        topo[nonempty] = np.add.reduceat(value, fv_start[nonempty])
+
+    # polygon edges, every face-vertex to the next one around its face
+    nxt = np.arange(len(uvs.uv_ids)) + 1
+    nxt[starts + counts - 1] = starts
+    a, b = uvs.uv_ids, uvs.uv_ids[nxt]
+    length = np.hypot(uvs.u[b] - uvs.u[a], uvs.v[b] - uvs.v[a])
+    edges = np.bincount(corner, length, minlength=count)
+    edges2 = np.bincount(corner, length ** 2, minlength=count)
+
+    tris, face = uv_triangles(uvs)
+    pu, pv = uvs.u[tris], uvs.v[tris]
+    signed = (pu[:, 1] - pu[:, 0]) * (pv[:, 2] - pv[:, 0]) - (pu[:, 2] - pu[:, 0]) * (pv[:, 1] - pv[:, 0])
+    area = 0.5 * np.bincount(shells.labels[tris[:, 0]], signed, minlength=count)
+
+    n = np.maximum(np.diff(shells.offsets), 1)
+    cu = np.bincount(shells.labels, uvs.u, minlength=count) / n
+    cv = np.bincount(shells.labels, uvs.v, minlength=count) / n
+    gyration = np.bincount(shells.labels, (uvs.u - cu[shells.labels]) ** 2 + (uvs.v - cv[shells.labels]) ** 2,
+                           minlength=count) / n
+
+    quantized = [np.sign(area) * np.sqrt(np.abs(area)), edges, np.sqrt(edges2 / np.maximum(fv_count, 1)),
+                 np.sqrt(gyration)]
+    return np.column_stack([np.diff(shells.offsets), np.bincount(fshell, minlength=count), fv_count,
+                            topo.view(np.int64)] + [np.round(i / tol).astype(np.int64) for i in quantized])
+
+
+def group_fingerprints(fingerprints):
+    """
+    Group id per row, rows with equal fingerprints share one, plus the number of groups
+    """
+    if not len(fingerprints):
+        return np.zeros(0, dtype=np.int64), 0
+    keys, group = np.unique(fingerprints, axis=0, return_inverse=True)
+    return group.reshape(-1), len(keys)
+
+
+def rigid_fits(pu, pv, qu, qv, owner, count):
+    """
+    Rotation (degrees, counter clockwise) per owner that takes points p onto their partners q with the least
+    squared error after matching centroids (2D Procrustes, no scaling or reflection). Returns angle,
+    centroids of p and q as (count, 2) and the rms distance left.
+    """
+    n = np.maximum(np.bincount(owner, minlength=count), 1)
+    cp = np.column_stack((np.bincount(owner, pu, minlength=count),
+                          np.bincount(owner, pv, minlength=count))) / n[:, None]
+    cq = np.column_stack((np.bincount(owner, qu, minlength=count),
+                          np.bincount(owner, qv, minlength=count))) / n[:, None]
+    xu, xv = pu - cp[owner, 0], pv - cp[owner, 1]
+    yu, yv = qu - cq[owner, 0], qv - cq[owner, 1]
+    theta = np.arctan2(np.bincount(owner, xu * yv - xv * yu, minlength=count),
+                       np.bincount(owner, xu * yu + xv * yv, minlength=count))
+    c, s = np.cos(theta)[owner], np.sin(theta)[owner]
+    err = np.bincount(owner, (c * xu - s * xv - yu) ** 2 + (s * xu + c * xv - yv) ** 2, minlength=count)
+    return np.degrees(theta), cp, cq, np.sqrt(err / n)
+
+
+def stack_shells(groups, tol=1e-4):
+    """
+    Fit every shell of [(MeshUVs, Shells, shell ids), ...] onto the first shell with the same fingerprint,
+    uvs are paired by rank within their shell. Returns per shell (concatenated over groups) its fingerprint
+    group, angle, pivot and offset for UVBatch, and whether the fit is within tol (shells that are not are
+    left alone: zero angle and offset).
+    """
+    prints, streams = [], []
+    for mesh, shells, ids in groups:
+        prints.append(shell_fingerprints(mesh, shells, tol)[ids])
+        order, offsets = shells.subset(ids)
+        streams.append((mesh.u[order], mesh.v[order], np.diff(offsets)))
+    if not prints:
+        empty = np.zeros(0)
+        return np.zeros(0, dtype=np.int64), empty, np.zeros((0, 2)), np.zeros((0, 2)), np.zeros(0, dtype=bool)
+
+    group, count = group_fingerprints(np.concatenate(prints))
+    u = np.concatenate([i[0] for i in streams])
+    v = np.concatenate([i[1] for i in streams])
+    sizes = np.concatenate([i[2] for i in streams])
+    starts = np.cumsum(sizes) - sizes
+    n = len(sizes)
+
+    # first shell of every group is where its copies go
+    reference = np.full(count, n, dtype=np.int64)
+    np.minimum.at(reference, group, np.arange(n))
+    owner = np.repeat(np.arange(n), sizes)
+    partner = starts[reference[group]][owner] + (np.arange(len(u)) - starts[owner])
+    angle, pivot, target, rms = rigid_fits(u, v, u[partner], v[partner], owner, n)
+
+    fits = rms <= tol
+    angle = np.where(fits, angle, 0.0)
+    offset = np.where(fits[:, None], target - pivot, 0.0)
+    return group, angle, pivot, offset, fits
+
+
+def unstack_offsets(group, bounds, padding=0.0):
+    """
+    Offsets that spread the shells of every group along u, the k-th shell of a group moving k times the
+    widest shell of that group plus padding
+    """
+    if not len(group):
+        return np.zeros((0, 2))
+    order = np.argsort(group, kind='mergesort')
+    rank = np.empty(len(group), dtype=np.int64)
+    counts = np.bincount(group)
+    rank[order] = np.arange(len(group)) - np.repeat(np.cumsum(counts) - counts, counts)
+    width = np.zeros(len(counts))
+    np.maximum.at(width, group, bounds[:, 1] - bounds[:, 0])
+    offset = np.zeros((len(group), 2))
+    offset[:, 0] = rank * (width[group] + padding)
+    return offset
+
+
+# Cache
+class UVCache(object):
+    """
+    LRU of MeshUVs keyed by (mesh name, uv set), with shells worked out on first use. Bounded both by entry
+    count and by the memory held in arrays. on_evict(key) is called for entries dropped to stay in bounds,
+    warm(mesh) may return shells worked out ahead of time before they are computed here.
+    """
+
+    def __init__(self, max_items=256, max_bytes=512 * 1024 ** 2, on_evict=None, warm=None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self.warm = warm
+        self.entries = OrderedDict()
+        self.nbytes = 0
+
+    def __repr__(self):
+        return 'UVCache({0} meshes, {1:.1f} MB)'.format(len(self.entries), self.nbytes / 1024.0 ** 2)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    @staticmethod
+    def _size(mesh, shells):
+        size = mesh.u.nbytes + mesh.v.nbytes + mesh.uv_counts.nbytes + mesh.uv_ids.nbytes
+        if shells is not None:
+            size += shells.labels.nbytes + shells.order.nbytes + shells.offsets.nbytes + shells.bounds.nbytes
+        return size
+
+    def _store(self, key, mesh, shells):
+        self._drop(key)
+        entry = [mesh, shells, self._size(mesh, shells)]
+        self.entries[key] = entry
+        self.nbytes += entry[2]
+        self._trim()
+
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry[2]
+        return entry
+
+    def _trim(self):
+        while len(self.entries) > 1 and (len(self.entries) > self.max_items or self.nbytes > self.max_bytes):
+            key = next(iter(self.entries))
+            self._drop(key)
+            if self.on_evict is not None:
+                self.on_evict(key)
+
+    def get(self, key, loader):
+        """
+        Cached MeshUVs for key, loader() is only called on a miss
+        """
+        entry = self._drop(key)
+        if entry is None:
+            self._store(key, loader(), None)
+        else:
+            self.entries[key] = entry
+            self.nbytes += entry[2]
+        return self.entries[key][0]
+
+    def shells(self, mesh):
+        """
+        Shells of a mesh, cached alongside it while the mesh is the current entry for its key
+        """
+        key = (mesh.name, mesh.uvset)
+        entry = self.entries.get(key)
+        if entry is None or entry[0] is not mesh:
+            return mesh_shells(mesh)
+        if entry[1] is None:
+            shells = self.warm(mesh) if self.warm is not None else None
+            self._store(key, mesh, shells if shells is not None else mesh_shells(mesh))
+        return self.entries[key][1]
+
+    def peek_shells(self, mesh):
+        """
+        Shells already cached for mesh, None when they would have to be worked out
+        """
+        entry = self.entries.get((mesh.name, mesh.uvset))
+        if entry is None or entry[0] is not mesh:
+            return None
+        return entry[1]
+
+    def update(self, mesh, shells=None):
+        """
+        Store mesh (and its shells) as the current entry for its key, after writing its uvs ourselves
+        """
+        self._store((mesh.name, mesh.uvset), mesh, shells)
+
+    def invalidate(self, name, uvset=None):
+        for key in [i for i in self.entries if i[0] == name and (uvset is None or i[1] == uvset)]:
+            self._drop(key)
+
+    def clear(self):
+        keys = list(self.entries)
+        self.entries.clear()
+        self.nbytes = 0
+        if self.on_evict is not None:
+            for key in keys:
+                self.on_evict(key)
+
+
+# Backends
+class MeshBackend(object):
+    """
+    Reads and writes whole meshes as arrays. Meshes are addressed by full path name and uv set, pbUV asks
+    the active backend for every mesh it reads and hands it every write.
+    """
+
+    def current_uvset(self, name):
+        raise NotImplementedError
+
+    def uvset_names(self, name):
+        raise NotImplementedError
+
+    def read_uvs(self, name, uvset):
+        """
+        MeshUVs of a mesh and uv set
+        """
+        raise NotImplementedError
+
+    def read_points(self, name, world=True):
+        """
+        MeshPoints of a mesh, in world or object space
+        """
+        raise NotImplementedError
+
+    def read_faces(self, name):
+        """
+        Face-vertex counts and vertex ids of a mesh, as MFnMesh.getVertices()
+        """
+        points = self.read_points(name, False)
+        return points.counts, points.ids
+
+    def read_edges(self, name):
+        """
+        (E, 2) vertex pairs of a mesh by edge id
+        """
+        return mesh_edges(*self.read_faces(name))
+
+    def set_uvs(self, name, uvset, u, v):
+        """
+        Replace the uvs of a mesh and uv set, the layout (uv counts and ids) stays as is
+        """
+        raise NotImplementedError
+
+    def set_layout(self, name, uvset, u, v, uv_counts, uv_ids):
+        """
+        Replace the uvs of a mesh and uv set along with which face-vertex uses which uv, for cuts and sews
+        """
+        raise NotImplementedError
+
+    def set_face_colors(self, name, colorset, colors):
+        """
+        Make colorset the displayed color set of a mesh, with one (N, 3) RGB row per face. None deletes it.
+        """
+        raise NotImplementedError
+
+    def write(self, name, uvset, uvs):
+        """
+        set_uvs for (u, v), set_layout for (u, v, uv counts, uv ids)
+        """
+        if len(uvs) > 2:
+            self.set_layout(name, uvset, *uvs)
+        else:
+            self.set_uvs(name, uvset, *uvs)
+
+    def commit(self, writes):
+        """
+        Apply [(name, uvset, old uvs, new uvs), ...] as one step, uvs as write takes them
+        """
+        for name, uvset, old, new in writes:
+            self.write(name, uvset, new)
+
+    def watch(self, name, callback):
+        """
+        Call callback(name) whenever the mesh changes or is renamed, returns a handle for unwatch
+        """
+        return None
+
+    def unwatch(self, handle):
+        pass
+
+
+class MemoryBackend(MeshBackend):
+    """
+    Meshes held in memory, loaded from JSON or OBJ files (see load). Commits are kept for undo().
+    """
+
+    def __init__(self):
+        self.meshes = OrderedDict()  # name: [MeshPoints or None, OrderedDict(uvset: MeshUVs), current uvset]
+        self.watchers = {}
+        self.history = []
+        self.colors = {}  # (name, color set): face colors
+
+    def __repr__(self):
+        return 'MemoryBackend({0} meshes)'.format(len(self.meshes))
+
+    def add(self, uvs, points=None, current=False):
+        """
+        Add a uv set (MeshUVs) to a mesh, the first uv set of a mesh becomes its current one
+        """
+        mesh = self.meshes.setdefault(uvs.name, [None, OrderedDict(), uvs.uvset])
+        mesh[1][uvs.uvset] = MeshUVs(uvs.name, uvs.uvset, uvs.u, uvs.v, uvs.uv_counts, uvs.uv_ids)
+        if points is not None:
+            mesh[0] = points
+        if current:
+            mesh[2] = uvs.uvset
+
+    def _mesh(self, name):
+        if name not in self.meshes:
+            raise KeyError('No mesh {0}'.format(name))
+        return self.meshes[name]
+
+    def current_uvset(self, name):
+        return self._mesh(name)[2]
+
+    def uvset_names(self, name):
+        return list(self._mesh(name)[1])
+
+    def read_uvs(self, name, uvset):
+        uvs = self._mesh(name)[1][uvset]
+        return MeshUVs(name, uvset, uvs.u.copy(), uvs.v.copy(), uvs.uv_counts, uvs.uv_ids)
+
+    def read_points(self, name, world=True):
+        points = self._mesh(name)[0]
+        if points is None:
+            raise ValueError('{0} has no points'.format(name))
+        return points
+
+    def set_uvs(self, name, uvset, u, v):
+        uvs = self._mesh(name)[1][uvset]
+        uvs.u = np.array(u, dtype=np.float32).astype(np.float64)
+        uvs.v = np.array(v, dtype=np.float32).astype(np.float64)
+        for callback in list(self.watchers.get(name, {}).values()):
+            callback(name)
+
+    def set_layout(self, name, uvset, u, v, uv_counts, uv_ids):
+        uvs = self._mesh(name)[1][uvset]
+        uvs.uv_counts = np.array(uv_counts, dtype=np.int64)
+        uvs.uv_ids = np.array(uv_ids, dtype=np.int64)
+        self.set_uvs(name, uvset, u, v)
+
+    def set_face_colors(self, name, colorset, colors):
+        self._mesh(name)
+        if colors is None:
+            self.colors.pop((name, colorset), None)
+        else:
+            self.colors[(name, colorset)] = np.asarray(colors, dtype=np.float64)
+
+    def commit(self, writes):
+        MeshBackend.commit(self, writes)
+        self.history.append(writes)
+
+    def undo(self):
+        for name, uvset, old, new in reversed(self.history.pop()):
+            self.write(name, uvset, old)
+
+    def watch(self, name, callback):
+        handle = object()
+        self.watchers.setdefault(name, {})[handle] = callback
+        return (name, handle)
+
+    def unwatch(self, handle):
+        self.watchers.get(handle[0], {}).pop(handle[1], None)
+
+    @classmethod
+    def load(cls, path, uvset='map1'):
+        """
+        Meshes from an OBJ file (uvs only, every object or group a mesh) or a JSON file laid out as
+        {"meshes": [{"name", "points", "counts", "ids", "current", "uvsets": {uvset: {"u", "v", "uv_counts",
+        "uv_ids"}}}]}, points, counts and ids (MFnMesh.getVertices) are optional
+        """
+        backend = cls()
+        if os.path.splitext(path)[1].lower() == '.obj':
+            for uvs in read_obj_uvs(path, uvset):
+                backend.add(uvs)
+            return backend
+
+        with open(path) as f:
+            data = json.load(f)
+        for mesh in data['meshes']:
+            points = None
+            if 'points' in mesh:
+                points = MeshPoints(mesh['name'], mesh['points'], mesh['counts'], mesh['ids'])
+            for name, uvs in mesh['uvsets'].items():
+                backend.add(MeshUVs(mesh['name'], name, uvs['u'], uvs['v'], uvs['uv_counts'], uvs['uv_ids']),
+                            points, name == mesh.get('current'))
+        return backend
+
+    def save(self, path):
+        """
+        Write every mesh as JSON in the layout load reads
+        """
+        meshes = []
+        for name, (points, uvsets, current) in self.meshes.items():
+            mesh = OrderedDict([('name', name), ('current', current)])
+            if points is not None:
+                mesh['points'] = points.points.tolist()
+                mesh['counts'] = points.counts.tolist()
+                mesh['ids'] = points.ids.tolist()
+            mesh['uvsets'] = OrderedDict((key, OrderedDict([('u', i.u.tolist()), ('v', i.v.tolist()),
+                                                            ('uv_counts', i.uv_counts.tolist()),
+                                                            ('uv_ids', i.uv_ids.tolist())]))
+                                         for key, i in uvsets.items())
+            meshes.append(mesh)
+        with open(path, 'w') as f:
+            json.dump({'meshes': meshes}, f)
+
+
+# Background Work
+class Prefetcher(object):
+    """
+    A worker thread running submitted functions in order, for array work that can start before a tool asks
+    for it. Everything belongs to the generation it was submitted in: start() begins a new one, dropping
+    queued jobs and the results of older generations, so quick successions of start() never pile up work.
+    A job that raises gives no result, the next get() on the calling thread writes its traceback to stderr,
+    once for each distinct error.
+    """
+    idle = 30.0  # seconds the thread waits for work before exiting, it is restarted by the next submit
+
+    def __init__(self):
+        self.generation = 0
+        self.jobs = deque()
+        self.results = {}
+        self.running = None
+        self.error = None  # (key, traceback text) of the last failed job, reported by the next get()
+        self.reported = set()
+        self.thread = None
+        self.lock = threading.Condition()
+
+    def __repr__(self):
+        return 'Prefetcher(generation {0}, {1} queued, {2} done)'.format(self.generation, len(self.jobs),
+                                                                       len(self.results))
+
+    def start(self):
+        with self.lock:
+            self.generation += 1
+            self.jobs.clear()
+            self.results.clear()
+            self.lock.notify_all()
+            return self.generation
+
+    def submit(self, key, function, *args):
+        with self.lock:
+            self.jobs.append((self.generation, key, function, args))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='pbUVPrefetch')
+                self.thread.daemon = True
+                self.thread.start()
+            self.lock.notify_all()
+
+    def get(self, key, wait=True):
+        """
+        Result of key in the current generation or None. A running job is waited for when wait is set, a
+        queued one is dropped since the caller will do the work itself.
+        """
+        self._report()
+        with self.lock:
+            while key not in self.results:
+                if wait and self.running == (self.generation, key):
+                    self.lock.wait()
+                    continue
+                queued = [i for i in self.jobs if i[1] == key]
+                for i in queued:
+                    self.jobs.remove(i)
+                return None
+            return self.results[key]
+
+    def _report(self):
+        with self.lock:
+            error, self.error = self.error, None
+        if error is not None and error[1] not in self.reported:
+            self.reported.add(error[1])
+            sys.stderr.write('pbUV prefetch of {0} failed:\n{1}'.format(error[0], error[1]))
+
+    def _run(self):
+        while True:
+            with self.lock:
+                deadline = _clock() + self.idle
+                while not self.jobs and _clock() < deadline:
+                    self.lock.wait(deadline - _clock())
+                if not self.jobs:
+                    self.thread = None
+                    return
+                generation, key, function, args = self.jobs.popleft()
+                self.running = (generation, key)
+
+            try:
+                result = function(*args)
+            except Exception:
+                result = None
+                error = (key, traceback.format_exc())
+                generation = None
+            else:
+                error = None
+
+            with self.lock:
+                self.running = None
+                if error is not None:
+                    self.error = error
+                if generation == self.generation:
+                    self.results[key] = result
+                self.lock.notify_all()
+
+
+# Density
+def fan_triangles(counts):
+    """
+    Face-vertex offsets (a, b, c) of a triangle fan over every polygon, plus the face of each triangle
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    tris = np.maximum(counts - 2, 0)
+    starts = np.cumsum(counts) - counts
+    face = np.repeat(np.arange(len(counts)), tris)
+    local = np.arange(tris.sum()) - np.repeat(np.cumsum(tris) - tris, tris)
+    a = starts[face]
+    b = a + local + 1
+    return a, b, b + 1, face
+
+
+def _corner_uvs(geo, uvs):
+    """
+    uv id of every face-vertex of geo, -1 on faces without uvs. uv ids only exist for mapped faces,
+    this scatters them back onto the full face-vertex layout.
+    """
+    mapped = uvs.uv_counts == geo.counts
+    fv = np.full(len(geo.ids), -1, dtype=np.int64)
+    fv[np.repeat(mapped, geo.counts)] = uvs.uv_ids[np.repeat(mapped[uvs.uv_counts > 0],
+                                                             uvs.uv_counts[uvs.uv_counts > 0])]
+    return fv
+
+
+def face_areas(geo, uvs):
+    """
+    World and uv area per face. Faces without uvs on this set get a uv area of 0.
+    """
+    a, b, c, face = fan_triangles(geo.counts)
+    pa = geo.points[geo.ids[a]]
+    cross = np.cross(geo.points[geo.ids[b]] - pa, geo.points[geo.ids[c]] - pa)
+    world = 0.5 * np.bincount(face, np.sqrt((cross ** 2).sum(axis=1)), minlength=len(geo))
+
+    fv = _corner_uvs(geo, uvs)
+    valid = (uvs.uv_counts == geo.counts)[face]
+    ua = uvs.u[fv[a[valid]]]
+    va = uvs.v[fv[a[valid]]]
+    signed = ((uvs.u[fv[b[valid]]] - ua) * (uvs.v[fv[c[valid]]] - va) -
+              (uvs.u[fv[c[valid]]] - ua) * (uvs.v[fv[b[valid]]] - va))
+    uv = 0.5 * np.abs(np.bincount(face[valid], signed, minlength=len(geo)))
+    return world, uv
+
+
+def texel_density(world, uv):
+    """
+    sqrt(uv area / world area) per face, 0 for degenerate faces
+    """
+    density = np.zeros(len(world))
+    np.sqrt(np.divide(uv, world, out=density, where=world > 0), out=density)
+    return density
+
+
+def weighted_percentile(values, weights, q):
+    order = np.argsort(values)
+    cum = np.cumsum(np.asarray(weights, dtype=np.float64)[order])
+    if not len(cum) or cum[-1] <= 0:
+        return np.zeros(len(np.atleast_1d(q)))
+    return np.interp(np.asarray(q, dtype=np.float64) / 100.0 * cum[-1], cum, np.asarray(values)[order])
+
+
+def density_stats(density, weights, percentiles=(5, 25, 50, 75, 95), bins=32):
+    """
+    Area weighted summary of per face densities: mean, percentiles and a histogram
+    """
+    density = np.asarray(density, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    total = weights.sum()
+    if len(density):
+        # faces of one even density can differ by rounding only, give those a usable range
+        lo, hi = density.min(), density.max()
+        if hi - lo <= 1e-9 * max(hi, 1.0):
+            lo, hi = lo - 0.5, hi + 0.5
+        hist, edges = np.histogram(density, bins=bins, range=(lo, hi), weights=weights)
+    else:
+        hist, edges = np.zeros(bins), np.zeros(bins + 1)
+    return {'mean': float((density * weights).sum() / total) if total > 0 else 0.0,
+            'min': float(density.min()) if len(density) else 0.0,
+            'max': float(density.max()) if len(density) else 0.0,
+            'percentiles': OrderedDict(zip(percentiles, weighted_percentile(density, weights, percentiles).tolist())),
+            'histogram': (hist, edges),
+            'faces': len(density),
+            'area': float(total)}
+
+
+def face_shells(uvs, shells):
+    """
+    Shell id per face, -1 for faces without uvs
+    """
+    mapped = uvs.uv_counts > 0
+    starts = (np.cumsum(uvs.uv_counts) - uvs.uv_counts)[mapped]
+    result = np.full(len(uvs.uv_counts), -1, dtype=np.int64)
+    result[mapped] = shells.labels[uvs.uv_ids[starts]]
+    return result
+
+
+def shell_areas(world, uv, fshell, count):
+    """
+    World and uv area summed per shell
+    """
+    valid = fshell >= 0
+    return (np.bincount(fshell[valid], world[valid], minlength=count),
+            np.bincount(fshell[valid], uv[valid], minlength=count))
+
+
+def density_scale(world, uv, target, width, height):
+    """
+    Uniform uv scale that takes each area pair to target pixels per unit on a width x height map,
+    1 where the density is undefined
+    """
+    world = np.asarray(world, dtype=np.float64)
+    uv = np.asarray(uv, dtype=np.float64)
+    valid = (world > 0) & (uv > 0)
+    scale = np.ones(len(world))
+    scale[valid] = target / np.sqrt(uv[valid] * width * height / world[valid])
+    return scale
+
+
+# Distortion
+# Heatmap range per metric, values at the low end show blue, at the high end red. area is shown as
+# abs(log2), so a face twice or half its share of the uv space is red either way.
+DISTORTION_RANGES = OrderedDict([('stretch', (1.0, 2.0)), ('angle', (1.0, 2.0)), ('area', (0.0, 1.0))])
+
+
+def singular_values(geo, uvs):
+    """
+    Singular values s1 >= s2 of the uv to world Jacobian of every fan triangle with uvs, with the face and
+    world and uv area of each triangle. Triangles without uv area get inf.
+    """
+    a, b, c, face = fan_triangles(geo.counts)
+    fv = _corner_uvs(geo, uvs)
+    valid = (uvs.uv_counts == geo.counts)[face]
+    a, b, c, face = a[valid], b[valid], c[valid], face[valid]
+    pa = geo.points[geo.ids[a]]
+    q1 = geo.points[geo.ids[b]] - pa
+    q2 = geo.points[geo.ids[c]] - pa
+    ta, tb, tc = fv[a], fv[b], fv[c]
+    du1, dv1 = uvs.u[tb] - uvs.u[ta], uvs.v[tb] - uvs.v[ta]
+    du2, dv2 = uvs.u[tc] - uvs.u[ta], uvs.v[tc] - uvs.v[ta]
+    det = du1 * dv2 - du2 * dv1
+    world = 0.5 * np.sqrt((np.cross(q1, q2) ** 2).sum(axis=1))
+    uv = 0.5 * np.abs(det)
+
+    # columns of J = [q1 q2] [[du1 du2] [dv1 dv2]]^-1, then the eigenvalues of J^T J
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ju = (q1 * dv2[:, None] - q2 * dv1[:, None]) / det[:, None]
+        jv = (q2 * du1[:, None] - q1 * du2[:, None]) / det[:, None]
+    e = (ju * ju).sum(axis=1)
+    f = (ju * jv).sum(axis=1)
+    g = (jv * jv).sum(axis=1)
+    root = np.sqrt((e - g) ** 2 + 4 * f ** 2)
+    s1 = np.sqrt(0.5 * (e + g + root))
+    s2 = np.sqrt(np.maximum(0.5 * (e + g - root), 0.0))
+    flat = ~(uv > 1e-12 * np.maximum(world, 1e-30))
+    s1[flat] = np.inf
+    s2[flat] = np.inf
+    return s1, s2, face, world, uv
+
+
+def face_distortion(geo, uvs):
+    """
+    Per face distortion of the uvs against the mesh, every metric 1 where the uvs are the mesh evenly scaled:
+
+        stretch    L2 stretch, sqrt((s1^2 + s2^2) / 2) averaged over the face
+        angle      s1 / s2, 1 for angle preserving uvs
+        area       world area / uv area of the face against the mesh as a whole
+        sigma_max  largest s1 of the face
+        sigma_min  smallest s2 of the face
+
+    s1, s2 are the singular values of the uv to world Jacobian, scaled by sqrt(uv area / world area) of the
+    whole mesh. Returns (OrderedDict(metric: values), world area per face), faces without uvs are nan and
+    faces with a degenerate uv triangle inf.
+    """
+    s1, s2, face, world, uv = singular_values(geo, uvs)
+    flat = np.isinf(s1)
+    total = uv[~flat].sum()
+    scale = np.sqrt(total / world[~flat].sum()) if total > 0 else 1.0
+    s1, s2 = s1 * scale, s2 * scale
+
+    count = len(geo)
+    weight = np.bincount(face, world, minlength=count)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        metrics = OrderedDict([
+            ('stretch', np.sqrt(np.bincount(face, world * 0.5 * (s1 ** 2 + s2 ** 2), minlength=count) / weight)),
+            ('angle', np.bincount(face, world * (s1 / s2), minlength=count) / weight),
+            ('area', weight / np.bincount(face, uv, minlength=count) * scale ** 2)])
+    # fan triangles come face by face
+    mapped = np.zeros(count, dtype=bool)
+    mapped[face] = True
+    starts = np.flatnonzero(np.concatenate(([True], face[1:] != face[:-1])))[:mapped.sum()]
+    metrics['sigma_max'] = np.zeros(count)
+    metrics['sigma_min'] = np.zeros(count)
+    if len(face):
+        metrics['sigma_max'][mapped] = np.maximum.reduceat(s1, starts)
+        metrics['sigma_min'][mapped] = np.minimum.reduceat(s2, starts)
+
+    broken = np.zeros(count, dtype=bool)
+    broken[face[flat]] = True
+    for values in metrics.values():
+        values[broken] = np.inf
+        values[~mapped] = np.nan
+    return metrics, np.bincount(face, world, minlength=count)
+
+
+def distortion_stats(metrics, world, **kwargs):
+    """
+    density_stats of every metric of face_distortion, area weighted over the faces with uvs, plus the number
+    of faces with degenerate uvs. kwargs go to density_stats.
+    """
+    world = np.asarray(world, dtype=np.float64)
+    stats = OrderedDict()
+    broken = np.zeros(len(world), dtype=bool)
+    for key, values in metrics.items():
+        valid = np.isfinite(values)
+        broken |= np.isinf(values)
+        stats[key] = density_stats(values[valid], world[valid], **kwargs)
+    stats['degenerate'] = int(broken.sum())
+    return stats
+
+
+def heatmap_colors(metric, values):
+    """
+    RGB per face, blue through green and yellow to red over DISTORTION_RANGES[metric]. Degenerate faces
+    are red, faces without uvs grey.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if metric == 'area':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = np.abs(np.log2(values))
+    lo, hi = DISTORTION_RANGES[metric]
+    with np.errstate(invalid='ignore'):
+        t = np.clip((values - lo) / (hi - lo), 0.0, 1.0) * 3
+    t[np.isinf(values)] = 3
+    ramp = np.array([[0.0, 0.0, 1.0], [0.0, 1.0, 0.0], [1.0, 1.0, 0.0], [1.0, 0.0, 0.0]])
+    low = np.minimum(np.nan_to_num(t).astype(np.int64), 2)
+    f = (np.nan_to_num(t) - low)[:, None]
+    colors = ramp[low] * (1 - f) + ramp[low + 1] * f
+    colors[np.isnan(values)] = 0.5
+    return colors
+
+
+# Snapshot
+def uv_edges(uvs):
+    """
+    Unique (a, b) uv index pairs of every polygon edge
+    """
+    counts = uvs.uv_counts[uvs.uv_counts > 0]
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    local = np.arange(len(uvs.uv_ids)) - starts
+    nxt = starts + (local + 1) % np.repeat(counts, counts)
+    edges = np.column_stack((uvs.uv_ids, uvs.uv_ids[nxt]))
+    edges.sort(axis=1)
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    return np.unique(edges, axis=0) if len(edges) else edges.reshape(-1, 2)
+
+
+def edge_segments(meshes, width, height):
+    """
+    Pixel space (x0, y0, x1, y1) rows for the uv edges of all meshes, row 0 at the top of the 0-1 tile
+    """
+    segs = []
+    for uvs in meshes:
+        edges = uv_edges(uvs)
+        x = uvs.u * width - 0.5
+        y = (1.0 - uvs.v) * height - 0.5
+        segs.append(np.column_stack((x[edges[:, 0]], y[edges[:, 0]], x[edges[:, 1]], y[edges[:, 1]])))
+    return np.concatenate(segs) if segs else np.empty((0, 4))
+
+
+def rasterize_band(segs, width, top, rows, aa=True):
+    """
+    Line coverage 0-1 for image rows top..top + rows. Lines are stepped along their major axis, with
+    anti-aliasing each step is split over the two nearest pixels of the minor axis.
+    """
+    cover = np.zeros(rows * width, dtype=np.float32)
+    ymin = np.minimum(segs[:, 1], segs[:, 3])
+    ymax = np.maximum(segs[:, 1], segs[:, 3])
+    segs = segs[(ymax >= top - 1) & (ymin <= top + rows)]
+    if not len(segs):
+        return cover.reshape(rows, width)
+
+    x0, y0, x1, y1 = segs.T
+    steep = np.abs(y1 - y0) > np.abs(x1 - x0)
+    a0 = np.where(steep, y0, x0)
+    b0 = np.where(steep, x0, y0)
+    a1 = np.where(steep, y1, x1)
+    b1 = np.where(steep, x1, y1)
+
+    # clip the major axis range to the band / image so long edges don't expand into millions of steps
+    lo = np.minimum(a0, a1)
+    hi = np.maximum(a0, a1)
+    limit_lo = np.where(steep, top - 1, -1)
+    limit_hi = np.where(steep, top + rows, width)
+    start = np.ceil(np.maximum(lo, limit_lo)).astype(np.int64)
+    stop = np.floor(np.minimum(hi, limit_hi)).astype(np.int64)
+    counts = np.maximum(stop - start + 1, 0)
+    steps, owner = _expand_ranges(start, counts)
+
+    span = a1 - a0
+    slope = np.divide(b1 - b0, span, out=np.zeros_like(span), where=span != 0)
+    minor = b0[owner] + (steps - a0[owner]) * slope[owner]
+
+    if aa:
+        base = np.floor(minor).astype(np.int64)
+        frac = (minor - base).astype(np.float32)
+        minor = np.concatenate((base, base + 1))
+        weight = np.concatenate((1 - frac, frac))
+        steps = np.concatenate((steps, steps))
+        owner = np.concatenate((owner, owner))
+    else:
+        minor = np.floor(minor + 0.5).astype(np.int64)
+        weight = np.ones(len(minor), dtype=np.float32)
+
+    px = np.where(steep[owner], minor, steps)
+    py = np.where(steep[owner], steps, minor) - top
+    inside = (px >= 0) & (px < width) & (py >= 0) & (py < rows)
+    np.maximum.at(cover, py[inside] * width + px[inside], weight[inside])
+    return cover.reshape(rows, width)
+
+
+class _TgaWriter(object):
+    def __init__(self, path, width, height):
+        self.file = open(path, 'wb')
+        # uncompressed true colour, 32 bit, 8 alpha bits, top-left origin
+        self.file.write(struct.pack('<BBBHHBHHHHBB', 0, 0, 2, 0, 0, 0, 0, 0, width, height, 32, 0x28))
+
+    def write(self, rows):
+        self.file.write(np.ascontiguousarray(rows[..., [2, 1, 0, 3]]).tobytes())
+
+    def close(self):
+        self.file.close()
+
+
+class _PngWriter(object):
+    def __init__(self, path, width, height):
+        self.file = open(path, 'wb')
+        self.zip = zlib.compressobj(6)
+        self.file.write(b'\x89PNG\r\n\x1a\n')
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+
+    def _chunk(self, tag, data):
+        self.file.write(struct.pack('>I', len(data)) + tag + data)
+        self.file.write(struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+
+    def write(self, rows):
+        filtered = np.zeros((rows.shape[0], rows.shape[1] * 4 + 1), dtype=np.uint8)
+        filtered[:, 1:] = rows.reshape(rows.shape[0], -1)
+        data = self.zip.compress(filtered.tobytes())
+        if data:
+            self._chunk(b'IDAT', data)
+
+    def close(self):
+        self._chunk(b'IDAT', self.zip.flush())
+        self._chunk(b'IEND', b'')
+        self.file.close()
+
+
+class _TiffWriter(object):
+    def __init__(self, path, width, height):
+        self.file = open(path, 'wb')
+        tags = [(256, 4, 1, width), (257, 4, 1, height), (258, 3, 4, 0), (259, 3, 1, 1), (262, 3, 1, 2),
+                (273, 4, 1, 0), (277, 3, 1, 4), (278, 4, 1, height), (279, 4, 1, width * height * 4),
+                (284, 3, 1, 1), (338, 3, 1, 2)]
+        ifd = 8
+        bits = ifd + 2 + len(tags) * 12 + 4
+        data = bits + 8
+        self.file.write(b'II*\x00' + struct.pack('<I', ifd) + struct.pack('<H', len(tags)))
+        for tag, kind, count, value in tags:
+            if tag == 258:
+                value = bits
+            elif tag == 273:
+                value = data
+            if kind == 3 and count == 1:
+                self.file.write(struct.pack('<HHIHH', tag, kind, count, value, 0))
+            else:
+                self.file.write(struct.pack('<HHII', tag, kind, count, value))
+        self.file.write(struct.pack('<I', 0) + struct.pack('<HHHH', 8, 8, 8, 8))
+
+    def write(self, rows):
+        self.file.write(np.ascontiguousarray(rows).tobytes())
+
+    def close(self):
+        self.file.close()
+
+
+class _PilWriter(object):
+    """
+    Formats without a streaming writer here go through Pillow, which needs the whole image in memory. These
+    have no alpha, the lines are composited over black.
+    """
+
+    def __init__(self, path, width, height):
+        from PIL import Image
+        self.image = Image
+        self.path = path
+        self.rows = []
+
+    def write(self, rows):
+        alpha = rows[..., 3:].astype(np.float32) / 255
+        self.rows.append((rows[..., :3] * alpha + 0.5).astype(np.uint8))
+
+    def close(self):
+        self.image.fromarray(np.concatenate(self.rows)).save(self.path)
+
+
+IMAGE_WRITERS = {'.tga': _TgaWriter, '.png': _PngWriter, '.tif': _TiffWriter, '.tiff': _TiffWriter,
+                 '.jpg': _PilWriter, '.jpeg': _PilWriter}
+
+
+def render_snapshot(meshes, path, width, height, color=(255, 255, 255), aa=True, band=256):
+    """
+    Draw the uv edges of one or more MeshUVs into an image file, band rows at a time. Images with alpha
+    get straight (unassociated) alpha: every covered pixel has the full color and alpha is the coverage.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in IMAGE_WRITERS:
+        raise ValueError('Unsupported snapshot format: {0}'.format(ext))
+    if isinstance(meshes, MeshUVs):
+        meshes = [meshes]
+
+    segs = edge_segments(meshes, width, height)
+    color = np.asarray(color, dtype=np.float32)
+    writer = IMAGE_WRITERS[ext](path, width, height)
+    try:
+        for top in range(0, height, band):
+            rows = min(band, height - top)
+            cover = rasterize_band(segs, width, top, rows, aa)
+            pixels = np.empty((rows, width, 4), dtype=np.uint8)
+            pixels[..., :3] = np.where(cover[..., None] > 0, color + 0.5, 0).astype(np.uint8)
+            pixels[..., 3] = (cover * 255 + 0.5).astype(np.uint8)
+            writer.write(pixels)
+    finally:
+        writer.close()
+    return path
+
+
+def _render_job(job):
+    start = time.time()
+    meshes, path, kwargs = job
+    render_snapshot(meshes, path, **kwargs)
+    return path, time.time() - start
+
+
+def render_batch(jobs, processes=None):
+    """
+    Render [(meshes, path, render_snapshot kwargs), ...] over a pool of worker processes,
+    returns [(path, seconds), ...] in job order
+    """
+    jobs = list(jobs)
+    if processes == 1 or len(jobs) < 2:
+        return [_render_job(i) for i in jobs]
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(_render_job, jobs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+# Unfold
+def border_uvs(uvs):
+    """
+    Mask of the uvs on a shell border, ends of uv edges used by a single face
+    """
+    counts = uvs.uv_counts
+    starts = np.cumsum(counts) - counts
+    nxt = np.arange(len(uvs.uv_ids)) + 1
+    ends = np.cumsum(counts)
+    last = ends[counts > 0] - 1
+    nxt[last] = starts[counts > 0]
+    a, b = uvs.uv_ids, uvs.uv_ids[nxt]
+    pairs = np.column_stack((np.minimum(a, b), np.maximum(a, b)))
+    edges, count = np.unique(pairs, axis=0, return_counts=True)
+    mask = np.zeros(len(uvs), dtype=bool)
+    mask[edges[count == 1].ravel()] = True
+    return mask
+
+
+def unfold_triangles(geo, uvs):
+    """
+    Fan triangles of every mapped face as (uv ids (n, 3), world corners (n, 3, 3))
+    """
+    a, b, c, face = fan_triangles(geo.counts)
+    valid = (uvs.uv_counts == geo.counts)[face]
+    corners = np.column_stack((a, b, c))[valid]
+    return _corner_uvs(geo, uvs)[corners], geo.points[geo.ids[corners]]
+
+
+def lscm_system(tris, corners, mirror=None):
+    """
+    Least squares conformal map energy as COO (rows, cols, values) of A in |A [u, v]|^2, two rows per triangle
+    over 2 * (largest uv id + 1) unknowns, u first. Each triangle is laid flat in its own frame, mirrored
+    triangles (flipped shells) are laid out mirrored so they unfold the way they already face.
+    """
+    n = tris.max() + 1 if len(tris) else 0
+    e1 = corners[:, 1] - corners[:, 0]
+    e2 = corners[:, 2] - corners[:, 0]
+    l1 = np.sqrt((e1 ** 2).sum(axis=1))
+    area2 = np.sqrt((np.cross(e1, e2) ** 2).sum(axis=1))
+    keep = (l1 > 0) & (area2 > 1e-12 * np.maximum(l1, 1.0) ** 2)
+    tris, e1, e2, l1, area2 = tris[keep], e1[keep], e2[keep], l1[keep], area2[keep]
+
+    x = np.zeros((len(tris), 3))
+    y = np.zeros((len(tris), 3))
+    x[:, 1] = l1
+    x[:, 2] = (e1 * e2).sum(axis=1) / l1
+    y[:, 2] = area2 / l1
+    if mirror is not None:
+        y[mirror[keep]] *= -1
+
+    # W_j = z_(j+2) - z_(j+1), the energy of a triangle is |sum W_j (u_j + i v_j)|^2 / (2 area)
+    scale = 1.0 / np.sqrt(area2)
+    wr = (np.roll(x, -2, axis=1) - np.roll(x, -1, axis=1)) * scale[:, None]
+    wi = (np.roll(y, -2, axis=1) - np.roll(y, -1, axis=1)) * scale[:, None]
+    row = np.repeat(np.arange(len(tris)) * 2, 3)
+    ids = tris.ravel()
+    rows = np.concatenate((row, row, row + 1, row + 1))
+    cols = np.concatenate((ids, ids + n, ids, ids + n))
+    vals = np.concatenate((wr.ravel(), -wi.ravel(), wi.ravel(), wr.ravel()))
+    return rows, cols, vals
+
+
+def _cg(matvec, b, x, diag, tol, maxiter):
+    """
+    Jacobi preconditioned conjugate gradient from the guess x, returns (x, converged)
+    """
+    r = b - matvec(x)
+    z = r / diag
+    p = z.copy()
+    rz = r.dot(z)
+    limit = tol * max(np.sqrt(b.dot(b)), 1e-30)
+    for i in range(maxiter):
+        if np.sqrt(r.dot(r)) <= limit:
+            return x, True
+        ap = matvec(p)
+        alpha = rz / p.dot(ap)
+        x += alpha * p
+        r -= alpha * ap
+        z = r / diag
+        rz, rz_old = r.dot(z), rz
+        p = z + (rz / rz_old) * p
+    return x, bool(np.sqrt(r.dot(r)) <= limit)
+
+
+def solve_least_squares(rows, cols, vals, x, fixed, tol=1e-6, maxiter=2000):
+    """
+    Minimize |A x|^2 over the unfixed entries of x, the fixed ones are held at their value. The normal
+    equations are solved by conjugate gradient warm started from x, with SciPy's sparse matrices when
+    available and plain NumPy otherwise. The NumPy fallback is several times slower on large meshes.
+    Returns (x, converged), converged is False when maxiter ran out before reaching tol.
+    """
+    x = np.array(x, dtype=np.float64)
+    free = np.flatnonzero(~fixed)
+    if not len(free):
+        return x, True
+    m = rows.max() + 1 if len(rows) else 0
+    held = np.where(fixed, x, 0.0)
+    diag = np.bincount(cols, vals ** 2, minlength=len(x))[free]
+    diag[diag == 0] = 1.0
+
+    try:
+        import scipy.sparse as sparse
+        import scipy.sparse.linalg as splinalg
+    except ImportError:
+        sparse = None
+
+    if sparse is not None:
+        matrix = sparse.csc_matrix((vals, (rows, cols)), shape=(m, len(x)))
+        af = matrix[:, free]
+        normal = (af.T * af).tocsr()
+        b = -(af.T * (matrix * held))
+        precond = sparse.diags(1.0 / diag)
+        try:
+            result, info = splinalg.cg(normal, b, x0=x[free], rtol=tol, maxiter=maxiter, M=precond)
+        except TypeError:  # SciPy before 1.12
+            result, info = splinalg.cg(normal, b, x0=x[free], tol=tol, maxiter=maxiter, M=precond)
+        x[free] = result
+        return x, info == 0
+
+    full = np.zeros(len(x))
+
+    def matvec(p):
+        full[free] = p
+        ap = np.bincount(rows, vals * full[cols], minlength=m)
+        return np.bincount(cols, vals * ap[rows], minlength=len(x))[free]
+
+    b = -np.bincount(cols, vals * np.bincount(rows, vals * held[cols], minlength=m)[rows], minlength=len(x))[free]
+    x[free], converged = _cg(matvec, b, x[free], diag, tol, maxiter)
+    return x, converged
+
+
+def _unfold_job(job):
+    u, v, tris, corners, mirror, pinned, axis, tol, maxiter = job
+    rows, cols, vals = lscm_system(tris, corners, mirror)
+    n = len(u)
+    fixed = np.concatenate((pinned, pinned))
+    if axis == 1:
+        fixed[:n] = True
+    elif axis == 2:
+        fixed[n:] = True
+    x, converged = solve_least_squares(rows, cols, vals, np.concatenate((u, v)), fixed, tol, maxiter)
+    return x[:n], x[n:], converged
+
+
+def lscm_unfold(geo, uvs, labels, shells=None, pinned=None, pin_border=False, axis=0, tol=1e-6,
+                maxiter=2000, processes=None, min_parallel=100000):
+    """
+    Unfold shells (ids into labels, every shell when None) of a mesh with least squares conformal maps,
+    returns new (u, v) for the whole mesh. pinned uvs and, with pin_border, border uvs stay in place, a
+    shell with fewer than two pins keeps its two uvs furthest apart along its longer side so it stays
+    where it is. axis 1 only moves v, axis 2 only u. Every solve warm starts from the current uvs, with
+    processes other than 1 and at least min_parallel triangles shells are spread over a process pool.
+    Returns (u, v, converged), converged is False when a solve stopped at maxiter short of tol.
+    """
+    count = labels.max() + 1 if len(labels) else 0
+    solve = np.zeros(count, dtype=bool)
+    solve[np.arange(count) if shells is None else shells] = True
+    pinned = np.zeros(len(uvs), dtype=bool) if pinned is None else np.array(pinned, dtype=bool)
+    if pin_border:
+        pinned |= border_uvs(uvs)
+
+    tris, corners = unfold_triangles(geo, uvs)
+    tris_shell = labels[tris[:, 0]]
+    keep = solve[tris_shell]
+    tris, corners, tris_shell = tris[keep], corners[keep], tris_shell[keep]
+    used = np.zeros(len(uvs), dtype=bool)
+    used[tris.ravel()] = True
+    pinned |= ~used
+
+    # flipped shells unfold mirrored, shells short of two pins get their extremes pinned
+    pu, pv = uvs.u[tris], uvs.v[tris]
+    signed = (pu[:, 1] - pu[:, 0]) * (pv[:, 2] - pv[:, 0]) - (pu[:, 2] - pu[:, 0]) * (pv[:, 1] - pv[:, 0])
+    mirror = (np.bincount(tris_shell, signed, minlength=count) < 0)[tris_shell]
+
+    ids = np.flatnonzero(used)
+    short = np.bincount(labels[ids], pinned[ids], minlength=count) < 2
+    ids = ids[short[labels[ids]]]
+    if len(ids):
+        ids = ids[np.argsort(labels[ids], kind='mergesort')]
+        owner = labels[ids]
+        first = np.r_[True, owner[1:] != owner[:-1]]
+        starts = np.flatnonzero(first)
+        seg = np.cumsum(first) - 1
+        su, sv = uvs.u[ids], uvs.v[ids]
+        wide = (np.maximum.reduceat(su, starts) - np.minimum.reduceat(su, starts) >=
+                np.maximum.reduceat(sv, starts) - np.minimum.reduceat(sv, starts))
+        key = np.where(wide[seg], su, sv)
+        pinned[ids[_segment_argmin([key], starts, seg)]] = True
+        pinned[ids[_segment_argmin([-key], starts, seg)]] = True
+
+    # jobs of whole shells with about the same number of triangles each
+    if processes == 1 or len(tris) < min_parallel:
+        parts = 1
+    else:
+        parts = min(int(solve.sum()), (processes or multiprocessing.cpu_count()) * 4)
+    tri_count = np.bincount(tris_shell, minlength=count)
+    part = np.minimum((np.cumsum(tri_count) - tri_count) * parts // max(len(tris), 1), parts - 1)
+
+    jobs, maps = [], []
+    for i in range(parts):
+        mine = np.flatnonzero(part[tris_shell] == i)
+        if not len(mine):
+            continue
+        local, inverse = np.unique(tris[mine], return_inverse=True)
+        jobs.append((uvs.u[local], uvs.v[local], inverse.reshape(-1, 3), corners[mine], mirror[mine],
+                     pinned[local], axis, tol, maxiter))
+        maps.append(local)
+
+    if len(jobs) < 2:
+        results = [_unfold_job(i) for i in jobs]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_unfold_job, jobs, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    u, v = uvs.u.copy(), uvs.v.copy()
+    converged = True
+    for local, (ju, jv, done) in zip(maps, results):
+        u[local] = ju
+        v[local] = jv
+        converged &= done
+    return u, v, converged
+
+
+# Validation
+def uv_triangles(uvs):
+    """
+    Fan triangles of every mapped face as (uv ids (n, 3), face of each triangle)
+    """
+    a, b, c, face = fan_triangles(uvs.uv_counts)
+    return np.column_stack((uvs.uv_ids[a], uvs.uv_ids[b], uvs.uv_ids[c])), face
+
+
+def signed_uv_areas(uvs):
+    """
+    Signed uv area per face, negative for faces wound clockwise in uv space (flipped), 0 without uvs
+    """
+    tris, face = uv_triangles(uvs)
+    pu = uvs.u[tris]
+    pv = uvs.v[tris]
+    signed = (pu[:, 1] - pu[:, 0]) * (pv[:, 2] - pv[:, 0]) - (pu[:, 2] - pu[:, 0]) * (pv[:, 1] - pv[:, 0])
+    return 0.5 * np.bincount(face, signed, minlength=len(uvs.uv_counts))
+
+
+def _grid_cells(lo_u, lo_v, hi_u, hi_v, limit=8):
+    """
+    Uniform grid over the boxes as (cell size, first column, first row, columns, rows), the cell starts at
+    twice the median box size and grows until the boxes cover no more than limit cells each on average
+    """
+    size = np.maximum(hi_u - lo_u, hi_v - lo_v)
+    cell = 2 * float(np.median(size)) if len(size) else 1.0
+    span = max(float(hi_u.max() - lo_u.min()), float(hi_v.max() - lo_v.min())) if len(size) else 1.0
+    cell = max(cell, span * 1e-6, 1e-12)
+    while True:
+        x0 = np.floor((lo_u - lo_u.min()) / cell).astype(np.int64)
+        y0 = np.floor((lo_v - lo_v.min()) / cell).astype(np.int64)
+        nx = np.floor((hi_u - lo_u.min()) / cell).astype(np.int64) - x0 + 1
+        ny = np.floor((hi_v - lo_v.min()) / cell).astype(np.int64) - y0 + 1
+        if (nx * ny).sum() <= limit * len(size) or cell >= span:
+            return x0, y0, nx, ny
+        cell *= 2
+
+
+def _triangle_axes(pu, pv):
+    """
+    Unit edge normals of every triangle (n, 3, 2) and the triangle's own extent along them as (lo, hi),
+    degenerate edges get a zero normal
+    """
+    nu = -(np.roll(pv, -1, axis=1) - pv)
+    nv = np.roll(pu, -1, axis=1) - pu
+    length = np.sqrt(nu * nu + nv * nv)
+    length[length == 0] = np.inf
+    normals = np.stack((nu / length, nv / length), axis=-1)
+    edge = pu * normals[..., 0] + pv * normals[..., 1]
+    opposite = np.roll(pu, -2, axis=1) * normals[..., 0] + np.roll(pv, -2, axis=1) * normals[..., 1]
+    return normals, np.minimum(edge, opposite), np.maximum(edge, opposite)
+
+
+def _separated(i, j, pu, pv, axes, eps):
+    """
+    True for triangle pairs with a separating axis among the edge normals of either triangle. Pairs only
+    touching along an edge or a corner count as separated.
+    """
+    normals, lo, hi = axes
+    result = np.zeros(len(i), dtype=bool)
+    left = np.arange(len(i))
+    for a, b in ((i, j), (j, i)):
+        # the second triangle's axes only for pairs the first one didn't separate
+        a = a[left]
+        b = b[left]
+        n = normals[a]
+        proj = n[:, :, 0, None] * pu[b][:, None, :] + n[:, :, 1, None] * pv[b][:, None, :]
+        apart = ((proj.max(axis=2) <= lo[a] + eps) | (proj.min(axis=2) >= hi[a] - eps)).any(axis=1)
+        result[left[apart]] = True
+        left = left[~apart]
+    return result
+
+
+def overlapping_triangles(u, v, tris, owner=None, eps=1e-9, chunk=1 << 21):
+    """
+    Pairs of triangles whose interiors overlap as (i, j) arrays with i < j. A uniform grid is the broad
+    phase, candidates sharing a cell go through an exact separating axis test. Pairs with the same owner
+    and degenerate triangles are skipped. Work stays close to linear in the triangle count unless a lot of
+    them are stacked.
+    """
+    tris = np.asarray(tris, dtype=np.int64).reshape(-1, 3)
+    n = len(tris)
+    if n < 2:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    owner = np.arange(n) if owner is None else np.asarray(owner, dtype=np.int64)
+    pu = u[tris]
+    pv = v[tris]
+    lo_u, hi_u = pu.min(axis=1), pu.max(axis=1)
+    lo_v, hi_v = pv.min(axis=1), pv.max(axis=1)
+    axes = _triangle_axes(pu, pv)
+    solid = (axes[2] - axes[1]).min(axis=1) > eps
+
+    # one entry per triangle and covered cell, sorted so every cell is a run
+    x0, y0, nx, ny = _grid_cells(lo_u, lo_v, hi_u, hi_v)
+    local, tri = _expand_ranges(np.zeros(n, dtype=np.int64), nx * ny)
+    x = x0[tri] + local // ny[tri]
+    y = y0[tri] + local % ny[tri]
+    rows = int((y0 + ny).max()) + 1
+    key = x * rows + y
+    order = np.argsort(key, kind='mergesort')
+    key = key[order]
+    tri = tri[order]
+    ends = np.searchsorted(key, key, side='right')
+    partners = ends - np.arange(len(key)) - 1
+
+    found_i, found_j = [], []
+    bounds = np.searchsorted(np.cumsum(partners), np.arange(chunk, partners.sum() + chunk, chunk))
+    lo = 0
+    for hi in np.unique(np.minimum(np.append(bounds + 1, len(key)), len(key))):
+        if hi <= lo:
+            continue
+        entries = np.arange(lo, hi)
+        other, at = _expand_ranges(entries + 1, partners[entries])
+        i = tri[entries][at]
+        j = tri[other]
+        cell = key[entries][at]
+        lo = hi
+
+        # count a pair only in the first cell both boxes share, skip same owner and disjoint boxes
+        keep = (cell == np.maximum(x0[i], x0[j]) * rows + np.maximum(y0[i], y0[j])) & (owner[i] != owner[j])
+        keep &= solid[i] & solid[j]
+        keep &= (np.minimum(hi_u[i], hi_u[j]) > np.maximum(lo_u[i], lo_u[j]) + eps)
+        keep &= (np.minimum(hi_v[i], hi_v[j]) > np.maximum(lo_v[i], lo_v[j]) + eps)
+        i = i[keep]
+        j = j[keep]
+        hit = ~_separated(i, j, pu, pv, axes, eps)
+        found_i.append(np.minimum(i[hit], j[hit]))
+        found_j.append(np.maximum(i[hit], j[hit]))
+
+    return np.concatenate(found_i), np.concatenate(found_j)
+
+
+def validate_uvs(uvs, flipped=True, overlaps=True, eps=1e-9):
+    """
+    Problem faces of one mesh and uv set: 'flipped' (wound clockwise), 'degenerate' (no uv area) and
+    'overlapping' (sharing uv space with another face), plus the number of overlapping triangle 'pairs'
+    """
+    start = time.time()
+    report = OrderedDict([('mesh', uvs.name), ('uvset', uvs.uvset), ('faces', len(uvs.uv_counts))])
+    if flipped:
+        area = signed_uv_areas(uvs)
+        mapped = uvs.uv_counts > 0
+        report['flipped'] = np.flatnonzero(mapped & (area < -eps * eps))
+        report['degenerate'] = np.flatnonzero(mapped & (np.abs(area) <= eps * eps))
+    if overlaps:
+        tris, face = uv_triangles(uvs)
+        i, j = overlapping_triangles(uvs.u, uvs.v, tris, face, eps)
+        report['overlapping'] = np.unique(np.concatenate((face[i], face[j])))
+        report['pairs'] = len(i)
+    report['seconds'] = time.time() - start
+    return report
+
+
+def read_obj_uvs(path, uvset='map1'):
+    """
+    MeshUVs for every object (o) or group (g) of a Wavefront OBJ file, faces without vt get no uvs
+    """
+    vt = []
+    objects = OrderedDict()
+    name = os.path.splitext(os.path.basename(path))[0]
+    with open(path) as f:
+        for line in f:
+            if line.startswith('vt '):
+                vt.append([float(i) for i in line.split()[1:3]])
+            elif line.startswith('f '):
+                ids = []
+                for corner in line.split()[1:]:
+                    parts = corner.split('/')
+                    if len(parts) < 2 or not parts[1]:
+                        ids = []
+                        break
+                    i = int(parts[1])
+                    ids.append(i - 1 if i > 0 else len(vt) + i)
+                counts, faces = objects.setdefault(name, ([], []))
+                counts.append(len(ids))
+                faces.extend(ids)
+            elif line.startswith(('o ', 'g ')) and line.split()[1:]:
+                name = line.split()[1]
+
+    vt = np.asarray(vt, dtype=np.float64).reshape(-1, 2)
+    meshes = []
+    for name, (counts, ids) in objects.items():
+        used, ids = np.unique(np.asarray(ids, dtype=np.int64), return_inverse=True)
+        meshes.append(MeshUVs(name, uvset, vt[used, 0], vt[used, 1], np.asarray(counts, dtype=np.int64),
+                              ids.astype(np.int64)))
+    return meshes
+
+
+def _validate_job(job):
+    source, kwargs = job
+    meshes = read_obj_uvs(source) if isinstance(source, str) else [source]
+    reports = []
+    for mesh in meshes:
+        report = validate_uvs(mesh, **kwargs)
+        if isinstance(source, str):
+            report['source'] = source
+        reports.append(report)
+    return reports
+
+
+def validate_batch(sources, processes=None, **kwargs):
+    """
+    validate_uvs over MeshUVs or OBJ paths in a pool of worker processes, one report per mesh in source order
+    """
+    jobs = [(i, kwargs) for i in sources]
+    if processes == 1 or len(jobs) < 2:
+        results = [_validate_job(i) for i in jobs]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_validate_job, jobs, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    return [report for reports in results for report in reports]
+
+
+# Layout
+def udim_tile(u, v):
+    """
+    UDIM tile number holding each (u, v), columns past 0 - 9 are clamped into the row
+    """
+    col = np.clip(np.floor(np.asarray(u, dtype=np.float64)), 0, 9).astype(np.int64)
+    row = np.maximum(np.floor(np.asarray(v, dtype=np.float64)), 0).astype(np.int64)
+    return 1001 + col + row * 10
+
+
+def group_bounds(keys, bounds):
+    """
+    Union of (n, 4) umin, umax, vmin, vmax rows sharing a key, as (unique keys, bounds, first row of each key)
+    """
+    keys = np.asarray(keys)
+    bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 4)
+    order = np.argsort(keys, kind='mergesort')
+    unique, starts = np.unique(keys[order], return_index=True)
+    b = bounds[order]
+    if not len(unique):
+        return unique, b, order
+    return unique, np.column_stack((np.minimum.reduceat(b[:, 0], starts), np.maximum.reduceat(b[:, 1], starts),
+                                    np.minimum.reduceat(b[:, 2], starts),
+                                    np.maximum.reduceat(b[:, 3], starts))), order[starts]
+
+
+def snap_offsets(bounds, tiles, align_u=None, align_v=None):
+    """
+    (du, dv) that move each bounds row inside its UDIM tile, align_u / align_v are -1 for the low side,
+    0 for the center and 1 for the high side of the tile, None leaves that axis alone
+    """
+    bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 4)
+    origin = udim_offset(tiles).reshape(-1, 2)
+    offsets = []
+    for axis, align in ((0, align_u), (1, align_v)):
+        lo = bounds[:, axis * 2]
+        hi = bounds[:, axis * 2 + 1]
+        if align is None:
+            offsets.append(np.zeros(len(bounds)))
+        elif align < 0:
+            offsets.append(origin[:, axis] - lo)
+        elif align > 0:
+            offsets.append(origin[:, axis] + 1 - hi)
+        else:
+            offsets.append(origin[:, axis] + 0.5 - (lo + hi) * 0.5)
+    return offsets[0], offsets[1]
+
+
+def align_offsets(bounds, target, align_u=None, align_v=None):
+    """
+    (du, dv) that line each bounds row up with a side or the center of the matching target row, align_u /
+    align_v as in snap_offsets
+    """
+    bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 4)
+    target = np.asarray(target, dtype=np.float64).reshape(-1, 4)
+    offsets = []
+    for axis, align in ((0, align_u), (1, align_v)):
+        lo = bounds[:, axis * 2]
+        hi = bounds[:, axis * 2 + 1]
+        tlo = target[:, axis * 2]
+        thi = target[:, axis * 2 + 1]
+        if align is None:
+            offsets.append(np.zeros(len(bounds)))
+        elif align < 0:
+            offsets.append(tlo - lo)
+        elif align > 0:
+            offsets.append(thi - hi)
+        else:
+            offsets.append((tlo + thi - lo - hi) * 0.5)
+    return offsets[0], offsets[1]
+
+
+def udim_offset(tile):
+    """
+    (u, v) of the lower left corner of a UDIM tile, 1001 is (0, 0)
+    """
+    tile = np.asarray(tile, dtype=np.int64) - 1001
+    return np.stack((tile % 10, tile // 10), axis=-1).astype(np.float64)
+
+
+def shelf_pack(w, h, width):
+    """
+    Next fit decreasing height shelf packing into a strip of the given width: rects sorted by height (then
+    width and input order) fill shelves left to right, a rect that doesn't fit starts the next shelf.
+    Every shelf is one searchsorted over the running widths, so the loop is per shelf, not per rect.
+    Returns x, y per rect and the height used.
+    """
+    n = len(w)
+    x = np.zeros(n)
+    y = np.zeros(n)
+    order = np.lexsort((np.arange(n), -w, -h))
+    ends = np.cumsum(w[order])
+    top = 0.0
+    start = 0
+    while start < n:
+        base = ends[start - 1] if start else 0.0
+        stop = max(int(np.searchsorted(ends, base + width * (1 + 1e-12), 'right')), start + 1)
+        shelf = order[start:stop]
+        x[shelf] = ends[start:stop] - w[shelf] - base
+        y[shelf] = top
+        top += h[order[start]]
+        start = stop
+    return x, y, top
+
+
+def _pack_at(w, h, padding, scale, tries):
+    """
+    Shelf pack rects with padding (in final uv units) as it is at the given scale, the best of the strip
+    widths in tries. Returns x, y of the lower left corners and the extent, all before scaling.
+    """
+    if not len(w):
+        return np.empty(0), np.empty(0), 0.0
+    pw = w + padding[0] / scale
+    ph = h + padding[1] / scale
+    best = None
+    for factor in tries:
+        x, y, height = shelf_pack(pw, ph, max(pw.max(), np.sqrt((pw * ph).sum()) * factor))
+        extent = max((x + pw).max(), height)
+        if best is None or extent < best[2]:
+            best = (x + padding[0] / scale * 0.5, y + padding[1] / scale * 0.5, extent)
+    return best
+
+
+def _fit_packs(rects, padding, tries, tol=1e-4, iterations=40):
+    """
+    Pack every [(w, h), ...] entry at one common scale, the largest found where all of them fit into the
+    unit square with the full padding. The padding shrinks in packing units as the scale grows, so the scale
+    is bisected between one that fits and one that doesn't until they are within tol of each other, at most
+    iterations packs in all. Returns the scale and (x, y, extent) per entry.
+    """
+    def pack(scale):
+        packs = [_pack_at(w, h, padding, scale, tries) for w, h in rects]
+        extent = max([p[2] for p in packs] + [1e-12])
+        return packs, extent, scale * extent <= 1.0 + 1e-12
+
+    # without padding the rects fill the square at 1 / extent, padding only ever takes room away. Halve
+    # from there to a scale that fits, then bisect.
+    high = 1.0 / max([_pack_at(w, h, (0.0, 0.0), 1.0, tries)[2] for w, h in rects] + [1e-12])
+    best = None
+    low = high
+    for _ in range(iterations):
+        packs, extent, fits = pack(low)
+        if fits:
+            best = (low, packs)
+            break
+        high, low = low, low * 0.5
+    if best is None:
+        # padding alone doesn't fit, keep the shells inside the tile at least
+        return 1.0 / extent, packs
+
+    for _ in range(iterations):
+        if high - best[0] <= tol * best[0]:
+            break
+        scale = (best[0] + high) * 0.5
+        packs, extent, fits = pack(scale)
+        if fits:
+            best = (scale, packs)
+        else:
+            high = scale
+    return best
+
+
+def pack_rects(w, h, padding=(0.0, 0.0), rotate=True, tries=(1.0, 1.15, 1.3)):
+    """
+    Pack rects into the unit square. Returns (x, y) of each rect's lower left corner before scaling,
+    whether it was turned 90 degrees and the uniform scale that fits the result into 0-1.
+    padding is in final uv units and kept around every rect.
+    """
+    rot, w, h = _turned(w, h, rotate)
+    scale, packs = _fit_packs([(w, h)], padding, tries)
+    return packs[0][0], packs[0][1], rot, scale
+
+
+def _turned(w, h, rotate):
+    """
+    Which rects to turn 90 degrees (upright ones when rotate) and their widths and heights after turning
+    """
+    w = np.asarray(w, dtype=np.float64)
+    h = np.asarray(h, dtype=np.float64)
+    rot = (h > w) if rotate else np.zeros(len(w), dtype=bool)
+    return rot, np.where(rot, h, w), np.where(rot, w, h)
+
+
+def _shell_transforms(bounds, x, y, rot, scale, origin):
+    """
+    Per shell (angle, scale, pivot, offset) for UVBatch that turns, scales and moves each shell's bounds
+    so their lower left corner lands on origin + (x, y) * scale
+    """
+    w = bounds[:, 1] - bounds[:, 0]
+    h = bounds[:, 3] - bounds[:, 2]
+    pivot = np.column_stack(((bounds[:, 0] + bounds[:, 1]) * 0.5, (bounds[:, 2] + bounds[:, 3]) * 0.5))
+    size = np.column_stack((np.where(rot, h, w), np.where(rot, w, h))) * np.reshape(scale, (-1, 1))
+    offset = origin + np.column_stack((x, y)) * np.reshape(scale, (-1, 1)) + size * 0.5 - pivot
+    return np.where(rot, 90.0, 0.0), np.broadcast_to(scale, len(bounds)).astype(np.float64), pivot, offset
+
+
+def pack_shells(bounds, tiles=(1001,), padding=(0.0, 0.0), rotate=True):
+    """
+    Layout (n, 4) shell bounds over the given UDIM tiles with one texel density for all of them.
+    Shells are dealt out to tiles largest first onto the emptiest tile. Returns (angle, scale, pivot, offset)
+    per shell, see UVBatch.add_groups.
+    """
+    bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 4)
+    area = (bounds[:, 1] - bounds[:, 0]) * (bounds[:, 3] - bounds[:, 2])
+    tiles = list(tiles)
+
+    owner = np.zeros(len(bounds), dtype=np.int64)
+    if len(tiles) > 1:
+        filled = np.zeros(len(tiles))
+        for i in np.lexsort((np.arange(len(area)), -area)):
+            owner[i] = np.argmin(filled)
+            filled[owner[i]] += area[i]
+
+    # every tile is packed at the common final scale, so the padding comes out the same on all of them
+    ids = [np.flatnonzero(owner == t) for t in range(len(tiles))]
+    turned = [_turned(bounds[i, 1] - bounds[i, 0], bounds[i, 3] - bounds[i, 2], rotate) for i in ids]
+    scale, packs = _fit_packs([(w, h) for rot, w, h in turned], padding, tries=(1.0, 1.15, 1.3))
+
+    angle = np.zeros(len(bounds))
+    pivot = np.zeros((len(bounds), 2))
+    offset = np.zeros((len(bounds), 2))
+    for tile, i, (rot, w, h), (x, y, extent) in zip(tiles, ids, turned, packs):
+        # clamp into the tile against rounding
+        x = np.clip(x, 0.0, np.maximum(1.0 / scale - w, 0.0))
+        y = np.clip(y, 0.0, np.maximum(1.0 / scale - h, 0.0))
+        angle[i], _, pivot[i], offset[i] = _shell_transforms(bounds[i], x, y, rot, scale, udim_offset(tile))
+    return angle, np.full(len(bounds), scale), pivot, offset
+
+
+def pack_axis(bounds, axis=0, padding=0.0):
+    """
+    Line shells up along u (axis 0) or v (axis 1) in their current order, scaled down uniformly when they
+    don't fit in 0-1, leaving the other axis where it is. Returns (angle, scale, pivot, offset).
+    """
+    bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 4)
+    lo, hi = bounds[:, 2 * axis], bounds[:, 2 * axis + 1]
+    size = hi - lo
+    total = size.sum()
+    room = 1.0 - padding * max(len(bounds) - 1, 0)
+    scale = min(1.0, room / total) if total > 0 and room > 0 else 1.0
+
+    order = np.lexsort((np.arange(len(lo)), lo))
+    start = np.zeros(len(bounds))
+    start[order] = np.concatenate(([0.0], np.cumsum(size[order] * scale + padding)[:-1]))
+
+    x = np.empty(len(bounds))
+    y = np.empty(len(bounds))
+    other = bounds[:, 2 * (1 - axis)] / scale
+    (x, y)[axis][:] = start / scale
+    (x, y)[1 - axis][:] = other
+    return _shell_transforms(bounds, x, y, np.zeros(len(bounds), dtype=bool), scale, np.zeros(2))
+
+
+# Instrumentation
+class Tracer(object):
+    """
+    Ring buffer of timed tool actions. Each action records its duration, the scene calls counted while it
+    ran and any tags (uv counts, ...). Nested actions are recorded too and fold their counts into the parent.
+    When disabled, wrapped functions cost one attribute check.
+    """
+
+    def __init__(self, size=1024, enabled=True):
+        self.enabled = enabled
+        self.events = deque(maxlen=size)
+        self.stack = []
+        self.origin = _clock()
+
+    def __repr__(self):
+        return 'Tracer({0} events, {1})'.format(len(self.events), 'on' if self.enabled else 'off')
+
+    def begin(self, name):
+        self.stack.append({'name': name, 'start': _clock(), 'calls': {}, 'tags': {}})
+
+    def end(self):
+        event = self.stack.pop()
+        event['duration'] = _clock() - event['start']
+        event['start'] -= self.origin
+        event['depth'] = len(self.stack)
+        if self.stack:
+            calls = self.stack[-1]['calls']
+            for key, value in event['calls'].items():
+                calls[key] = calls.get(key, 0) + value
+        self.events.append(event)
+        return event
+
+    def count(self, call, n=1):
+        if self.stack:
+            calls = self.stack[-1]['calls']
+            calls[call] = calls.get(call, 0) + n
+
+    def tag(self, key, value, add=True):
+        if self.stack:
+            tags = self.stack[-1]['tags']
+            tags[key] = tags.get(key, 0) + value if add else value
+
+    def wrap(self, name):
+        def decorator(function):
+            def decorated_function(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                self.begin(name)
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.end()
+
+            decorated_function.__name__ = function.__name__
+            decorated_function.__doc__ = function.__doc__
+            return decorated_function
+
+        return decorator
+
+    def clear(self):
+        self.events.clear()
+
+    def to_json(self):
+        return json.dumps(list(self.events), indent=1, sort_keys=True)
+
+    def to_chrome_trace(self):
+        """
+        chrome://tracing / Perfetto "complete" events, timestamps in microseconds
+        """
+        events = []
+        for event in self.events:
+            args = dict(event['tags'])
+            args.update(('calls.' + k, v) for k, v in event['calls'].items())
+            events.append({'name': event['name'], 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+                           'ts': event['start'] * 1e6, 'dur': event['duration'] * 1e6, 'args': args})
+        return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'})
+
+    def dump(self, path, chrome=None):
+        """
+        Write the buffer to path, as a chrome trace when chrome is set or the path ends in .trace
+        """
+        if chrome is None:
+            chrome = path.endswith('.trace')
+        with open(path, 'w') as f:
+            f.write(self.to_chrome_trace() if chrome else self.to_json())
+        return path
@@ -0,0 +1,52 @@
+"""
+Maya plug-in with pbUV's undoable uv write, loaded by pbUV.MayaBackend.commit the first time it writes.
+
+    pbUVSetUVs <id>
+
+applies the writes MayaBackend.commit handed over under that id through the pbUV backend as one undo step.
+"""
+import maya.api.OpenMaya as om
+
+import pbUV
+
+maya_useNewAPI = True
+
+
+class SetUVsCmd(om.MPxCommand):
+    """
+    Writes [(name, uvset, old uvs, new uvs), ...] on redo and the old uvs back in reverse order on undo
+    """
+    name = 'pbUVSetUVs'
+
+    def __init__(self):
+        om.MPxCommand.__init__(self)
+        self.backend = None
+        self.edits = []
+
+    @staticmethod
+    def creator():
+        return SetUVsCmd()
+
+    def isUndoable(self):
+        return True
+
+    def doIt(self, args):
+        self.backend = pbUV.backend
+        self.edits = self.backend.take_writes(args.asInt(0))
+        self.redoIt()
+
+    def redoIt(self):
+        for name, uvset, old, new in self.edits:
+            self.backend.write(name, uvset, new)
+
+    def undoIt(self):
+        for name, uvset, old, new in reversed(self.edits):
+            self.backend.write(name, uvset, old)
+
+
+def initializePlugin(plugin):
+    om.MFnPlugin(plugin).registerCommand(SetUVsCmd.name, SetUVsCmd.creator)
+
+
+def uninitializePlugin(plugin):
+    om.MFnPlugin(plugin).deregisterCommand(SetUVsCmd.name)
@@ -0,0 +1,51 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+import pbUVCore as core  # noqa: E402
+
+
+def grid_mesh(name, nx, ny, split=False):
+    """
+    A flat nx by ny quad grid as a MemoryBackend.load mesh entry. The uvs follow the vertices, or with split
+    every face gets its own four uvs shrunk a little towards its center, so every face is a shell.
+    """
+    x, y = np.meshgrid(np.arange(nx + 1), np.arange(ny + 1))
+    points = np.column_stack((x.ravel(), y.ravel(), np.zeros(x.size)))
+    i, j = np.meshgrid(np.arange(nx), np.arange(ny))
+    corner = (j * (nx + 1) + i).ravel()
+    ids = np.column_stack((corner, corner + 1, corner + nx + 2, corner + nx + 1)).ravel()
+    counts = np.full(nx * ny, 4)
+    if split:
+        center = points[ids].reshape(-1, 4, 3).mean(axis=1)
+        uv = (center[:, None, :2] + (points[ids].reshape(-1, 4, 3)[..., :2] - center[:, None, :2]) * 0.9)
+        uv = uv.reshape(-1, 2)
+        uv_ids = np.arange(len(ids))
+    else:
+        uv = points[:, :2]
+        uv_ids = ids
+    uv = uv / [nx, ny]
+    return {'name': name, 'current': 'map1', 'points': points.tolist(), 'counts': counts.tolist(),
+            'ids': ids.tolist(), 'uvsets': {'map1': {'u': uv[:, 0].tolist(), 'v': uv[:, 1].tolist(),
+                                                     'uv_counts': counts.tolist(), 'uv_ids': uv_ids.tolist()}}}
+
+
+@pytest.fixture
+def scene_path(tmp_path):
+    """
+    JSON scene with a 3 x 2 grid in one shell and a 2 x 2 grid with every face a shell
+    """
+    path = str(tmp_path / 'scene.json')
+    with open(path, 'w') as f:
+        json.dump({'meshes': [grid_mesh('gridShape', 3, 2), grid_mesh('splitShape', 2, 2, split=True)]}, f)
+    return path
+
+
+@pytest.fixture
+def backend(scene_path):
+    return core.MemoryBackend.load(scene_path)
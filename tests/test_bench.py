@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+import pbUVBench as bench
+
+# Calls into the fake pymel / OpenMaya per case on the 300 uv bench mesh. They don't depend on timing, a
+# change here means a tool now reads or writes the scene more (or less) often than it did.
+CALLS = {'UV.get_shells': 8, 'AlignUI.align_shells': 13, 'UnfoldUI.match_shell': 10, 'UnfoldUI.unfold': 15,
+         'CutSewUI.tear_face': 34, 'CutSewUI.sew_uv': 36, 'DensityUI.sample_density': 15,
+         'DensityUI.show_distortion': 14, 'SnapUI.snap_uvs': 12, 'TransformUI.rotate': 64,
+         'TransformUI.orient_bounds': 12}
+
+
+@pytest.fixture(scope='module')
+def pbUV():
+    module = bench.install()
+    module.tracer.enabled = False
+    # the first write loads the plug-in, keep that out of the counts
+    bench.run(module, [300], ['AlignUI.align_shells'])
+    return module
+
+
+def test_every_case_is_counted():
+    assert sorted(CALLS) == sorted(bench.CASES)
+
+
+@pytest.mark.parametrize('case', list(bench.CASES))
+def test_case_calls(pbUV, case):
+    small, large = bench.run(pbUV, [300, 3000], [case])[case]
+    assert sum(small['calls'].values()) == CALLS[case]
+    assert bench.run(pbUV, [300], [case])[case][0]['calls'] == small['calls']
+    # bulk reads and writes, ten times the uvs never means more calls
+    assert sum(large['calls'].values()) <= sum(small['calls'].values())
+    assert large['calls'].get('getUVs', 0) <= 2
+
+
+@pytest.mark.parametrize('case', ['UV.get_shells', 'DensityUI.sample_density'])
+def test_case_with_prefetch(pbUV, case):
+    row = bench.run(pbUV, [300], [case], prefetch=True)[case][0]
+    assert row['seconds'] >= 0 and row['calls']
+
+
+def test_compare():
+    results = {'a': [{'uvs': 100, 'seconds': 0.2, 'calls': {}}, {'uvs': 1000, 'seconds': 2.0, 'calls': {}}]}
+    baseline = {'a': [{'uvs': 100, 'seconds': 0.1}, {'uvs': 1000, 'seconds': 1.9}], 'b': [{'uvs': 100, 'seconds': 1}]}
+    assert bench.compare(results, baseline, 1.5) == [('a', 100, 0.2, 0.1)]
+    assert bench.compare(results, baseline, 2.5) == []
+    assert bench.compare(results, {}, 1.0) == []
+
+
+def test_baseline_gate(pbUV, tmp_path, capsys):
+    path = str(tmp_path / 'bench.json')
+    args = ['--sizes', '300', '--cases', 'SnapUI.snap_uvs']
+    assert bench.main(args + ['--save', path]) == 0
+    assert bench.main(args + ['--baseline', path, '--tolerance', '1000']) == 0
+
+    with open(path) as f:
+        saved = json.load(f)
+    saved['SnapUI.snap_uvs'][0]['seconds'] = 1e-9
+    with open(path, 'w') as f:
+        json.dump(saved, f)
+    assert bench.main(args + ['--baseline', path]) == 1
+    assert 'SLOWER SnapUI.snap_uvs' in capsys.readouterr().out
@@ -0,0 +1,157 @@
+import numpy as np
+import pytest
+
+import pbUVCore as core
+
+
+def _edge(topo, a, b):
+    return int(np.flatnonzero((topo.edges.min(axis=1) == min(a, b)) & (topo.edges.max(axis=1) == max(a, b)))[0])
+
+
+def _topology(backend, name):
+    points = backend.read_points(name)
+    return core.Topology(points.counts, points.ids, core.mesh_edges(points.counts, points.ids))
+
+
+# Backend
+def test_load_reads_every_mesh(backend):
+    assert list(backend.meshes) == ['gridShape', 'splitShape']
+    uvs = backend.read_uvs('gridShape', backend.current_uvset('gridShape'))
+    assert len(uvs) == 12
+    assert uvs.uv_counts.tolist() == [4] * 6
+    assert len(backend.read_points('splitShape')) == 4
+
+
+def test_save_round_trip(backend, tmp_path):
+    path = str(tmp_path / 'saved.json')
+    backend.save(path)
+    loaded = core.MemoryBackend.load(path)
+    for name in backend.meshes:
+        a = backend.read_uvs(name, 'map1')
+        b = loaded.read_uvs(name, 'map1')
+        for key in ('u', 'v', 'uv_counts', 'uv_ids'):
+            assert np.array_equal(getattr(a, key), getattr(b, key))
+
+
+def test_commit_and_undo(backend):
+    old = backend.read_uvs('gridShape', 'map1')
+    backend.commit([('gridShape', 'map1', (old.u, old.v), (old.u + 1, old.v))])
+    assert np.allclose(backend.read_uvs('gridShape', 'map1').u, old.u + 1)
+    backend.undo()
+    assert np.allclose(backend.read_uvs('gridShape', 'map1').u, old.u)
+
+
+# Shells
+def test_label_shells(backend):
+    grid = backend.read_uvs('gridShape', 'map1')
+    assert core.label_shells(len(grid), grid.uv_counts, grid.uv_ids).tolist() == [0] * 12
+    split = backend.read_uvs('splitShape', 'map1')
+    labels = core.label_shells(len(split), split.uv_counts, split.uv_ids)
+    assert labels.tolist() == np.repeat(np.arange(4), 4).tolist()
+
+
+def test_label_shells_chain_and_unused():
+    # faces link the chain from its far end, uv 5 is not used by any face
+    labels = core.label_shells(6, [2, 2, 0, 2], [3, 4, 2, 3, 0, 1])
+    assert labels.tolist() == [0, 0, 1, 1, 1, 2]
+
+
+# Components
+@pytest.mark.parametrize('a, b', [([], []), ([1, 2, 3, 7], []), ([], [0, 5]), ([0, 1, 2, 3, 9], [2, 3, 4, 10, 11]),
+                                  ([5], [5])])
+def test_index_ranges_algebra(a, b):
+    ra = core.IndexRanges.from_indices('m', a)
+    rb = core.IndexRanges.from_indices('m', b)
+    expected = {'|': set(a) | set(b), '&': set(a) & set(b), '-': set(a) - set(b), '^': set(a) ^ set(b)}
+    for op, result in (('|', ra | rb), ('&', ra & rb), ('-', ra - rb), ('^', ra ^ rb)):
+        assert result.indices().tolist() == sorted(expected[op])
+    assert ra.contains(np.arange(12)).tolist() == [i in a for i in range(12)]
+    assert ra.mask(12).tolist() == [i in a for i in range(12)]
+    assert all((i in ra) == (i in a) for i in range(12))
+    assert len(ra) == len(set(a))
+    assert bool(ra) == bool(a)
+
+
+def test_shell_ranges():
+    labels = [0, 1, 0, 0, 2, 1, 2, 2, 0]
+    shells = core.Shells(labels, np.zeros(9), np.zeros(9))
+    ranges = shells.ranges('m', shells.touched(core.IndexRanges('m', [[4, 6]])))
+    assert [i.ranges.tolist() for i in ranges] == [[[1, 2], [5, 6]], [[4, 5], [6, 8]]]
+    assert shells.ranges('m', []) == []
+    assert [i.indices().tolist() for i in shells.ranges('m', [0])] == [[0, 2, 3, 8]]
+
+
+def test_index_ranges_names():
+    ranges = core.IndexRanges.from_indices('pCubeShape1', [0, 1, 2, 5, 8, 9])
+    assert ranges.names() == ['pCubeShape1.map[0:2]', 'pCubeShape1.map[5]', 'pCubeShape1.map[8:9]']
+    with pytest.raises(ValueError):
+        ranges | core.IndexRanges('other', [[0, 1]])
+
+
+def test_topology_key_sees_winding(backend):
+    points = backend.read_points('gridShape')
+    key = core.topology_key(points.counts, points.ids)
+    assert core.topology_key(points.counts, points.ids.copy()) == key
+    ids = points.ids.copy()
+    ids[:4] = ids[:4][::-1]
+    assert core.topology_key(points.counts, ids) != key
+
+
+# Cut and Sew
+def test_cut_then_sew(backend):
+    uvs = backend.read_uvs('gridShape', 'map1')
+    topo = _topology(backend, 'gridShape')
+    # the column of edges between x = 1 and x = 2 runs from border to border
+    edges = [_edge(topo, 1, 5), _edge(topo, 5, 9)]
+
+    cut = core.cut_uvs(topo, uvs, edges)
+    assert len(cut) == len(uvs) + 3
+    labels = core.label_shells(len(cut), cut.uv_counts, cut.uv_ids)
+    assert labels.max() == 1
+    assert np.allclose(cut.u[cut.uv_ids], uvs.u[uvs.uv_ids])
+    assert np.allclose(cut.v[cut.uv_ids], uvs.v[uvs.uv_ids])
+
+    sewn = core.sew_uvs(topo, cut, edges)
+    assert len(sewn) == len(uvs)
+    assert core.label_shells(len(sewn), sewn.uv_counts, sewn.uv_ids).max() == 0
+    assert np.allclose(sewn.u[sewn.uv_ids], uvs.u[uvs.uv_ids])
+
+
+def test_cut_and_sew_without_change(backend):
+    uvs = backend.read_uvs('gridShape', 'map1')
+    topo = _topology(backend, 'gridShape')
+    # sewing what is already joined keeps the same object
+    assert core.sew_uvs(topo, uvs, [_edge(topo, 1, 5)]) is uvs
+    split = backend.read_uvs('splitShape', 'map1')
+    split_topo = _topology(backend, 'splitShape')
+    assert core.cut_uvs(split_topo, split, []) is split
+
+
+def test_sew_split_faces(backend):
+    split = backend.read_uvs('splitShape', 'map1')
+    topo = _topology(backend, 'splitShape')
+    sewn = core.sew_uvs(topo, split, np.arange(len(topo.edges)))
+    assert len(sewn) == 9
+    assert core.label_shells(len(sewn), sewn.uv_counts, sewn.uv_ids).max() == 0
+
+
+# Validation
+def test_overlapping_triangles():
+    u = np.array([0.0, 1.0, 0.0, 0.2, 1.2, 0.2, 1.0, 2.0, 1.0, 3.0, 4.0, 3.0])
+    v = np.array([0.0, 0.0, 1.0, 0.2, 0.2, 1.2, 0.0, 1.0, 1.0, 0.0, 0.0, 1.0])
+    tris = np.arange(12).reshape(4, 3)
+    # 1 overlaps 0 and 2, 0 and 2 only share the corner (1, 0), 3 is far away
+    i, j = core.overlapping_triangles(u, v, tris)
+    assert sorted(zip(i.tolist(), j.tolist())) == [(0, 1), (1, 2)]
+    # the same owner never counts
+    i, j = core.overlapping_triangles(u, v, tris, owner=[0, 0, 1, 2])
+    assert sorted(zip(i.tolist(), j.tolist())) == [(1, 2)]
+
+
+def test_validate_uvs(backend):
+    grid = backend.read_uvs('gridShape', 'map1')
+    report = core.validate_uvs(grid)
+    assert len(report['flipped']) == 0 and len(report['overlapping']) == 0
+    # winding the first face the other way round flips only that face
+    grid.uv_ids[:4] = grid.uv_ids[:4][::-1]
+    assert core.validate_uvs(grid)['flipped'].tolist() == [0]
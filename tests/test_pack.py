@@ -0,0 +1,98 @@
+import time
+
+import numpy as np
+import pytest
+
+import pbUVCore as core
+
+
+def _random_bounds(count, seed=0):
+    rng = np.random.RandomState(seed)
+    lo = rng.rand(count, 2) * 4
+    size = rng.rand(count, 2) * 0.3 + 0.01
+    return np.column_stack((lo[:, 0], lo[:, 0] + size[:, 0], lo[:, 1], lo[:, 1] + size[:, 1]))
+
+
+def _placed(bounds, angle, scale, pivot, offset):
+    """
+    umin, umax, vmin, vmax of every shell's bounds after the pack_shells transform
+    """
+    w = bounds[:, 1] - bounds[:, 0]
+    h = bounds[:, 3] - bounds[:, 2]
+    turned = angle == 90.0
+    size = np.column_stack((np.where(turned, h, w), np.where(turned, w, h))) * scale[:, None] * 0.5
+    center = pivot + offset
+    return np.column_stack((center[:, 0] - size[:, 0], center[:, 0] + size[:, 0],
+                            center[:, 1] - size[:, 1], center[:, 1] + size[:, 1]))
+
+
+def _gaps(placed):
+    """
+    Smallest distance between two rects along the axis that separates them, for every pair
+    """
+    i, j = np.triu_indices(len(placed), 1)
+    gap_u = np.maximum(placed[j, 0] - placed[i, 1], placed[i, 0] - placed[j, 1])
+    gap_v = np.maximum(placed[j, 2] - placed[i, 3], placed[i, 2] - placed[j, 3])
+    return np.maximum(gap_u, gap_v)
+
+
+@pytest.mark.parametrize('tiles', [(1001,), (1001, 1002, 1011)])
+@pytest.mark.parametrize('padding', [0.0, 0.004])
+def test_pack_shells(tiles, padding):
+    bounds = _random_bounds(200)
+    angle, scale, pivot, offset = core.pack_shells(bounds, tiles, (padding, padding))
+    placed = _placed(bounds, angle, scale, pivot, offset)
+
+    # one texel density for every shell
+    assert np.allclose(scale, scale[0])
+
+    # every shell inside one of the tiles
+    tile = core.udim_tile((placed[:, 0] + placed[:, 1]) * 0.5, (placed[:, 2] + placed[:, 3]) * 0.5)
+    assert set(np.unique(tile).tolist()) <= set(tiles)
+    corner = core.udim_offset(tile)
+    assert (placed[:, 0] >= corner[:, 0] - 1e-9).all() and (placed[:, 1] <= corner[:, 0] + 1 + 1e-9).all()
+    assert (placed[:, 2] >= corner[:, 1] - 1e-9).all() and (placed[:, 3] <= corner[:, 1] + 1 + 1e-9).all()
+
+    # no overlaps, with at least the padding in between
+    assert _gaps(placed).min() >= padding - 1e-9
+
+
+def test_pack_shells_padding_matches_across_tiles():
+    # one big shell fills a tile by itself, the small ones still get the full padding on the other tile
+    bounds = np.array([[0, 1, 0, 1], [0, 0.1, 0, 0.1], [0, 0.1, 0, 0.1]], dtype=np.float64)
+    angle, scale, pivot, offset = core.pack_shells(bounds, (1001, 1002), (0.01, 0.01))
+    placed = _placed(bounds, angle, scale, pivot, offset)
+    assert _gaps(placed[1:]).min() >= 0.01 - 1e-9
+    assert 0.99 * (1 - 1e-4) <= scale[0] <= 0.99 + 1e-9
+    assert placed[0, 1] <= 1.0 and placed[1:, 0].min() >= 1.0
+
+
+def test_pack_shells_uses_the_tile():
+    bounds = _random_bounds(500, seed=1)
+    angle, scale, pivot, offset = core.pack_shells(bounds, (1001,), (0.002, 0.002))
+    placed = _placed(bounds, angle, scale, pivot, offset)
+    # the fixed point iteration grows the scale until the layout reaches the edge of the tile
+    assert max(placed[:, 1].max(), placed[:, 3].max()) > 0.98
+
+
+def test_pack_shells_is_deterministic():
+    bounds = _random_bounds(100, seed=2)
+    first = core.pack_shells(bounds, (1001, 1002), (0.004, 0.004))
+    second = core.pack_shells(bounds.copy(), (1001, 1002), (0.004, 0.004))
+    for a, b in zip(first, second):
+        assert np.array_equal(a, b)
+
+
+def test_pack_shells_speed():
+    # the LayoutUI default of 4 pixels padding on a 1024 map, 10k shells are meant to pack well under a second
+    bounds = _random_bounds(10000, seed=3)
+    start = time.time()
+    angle, scale, pivot, offset = core.pack_shells(bounds, (1001,), (4.0 / 1024, 4.0 / 1024))
+    assert time.time() - start < 1.0
+    assert _gaps(_placed(bounds, angle, scale, pivot, offset)[:2000]).min() >= 4.0 / 1024 - 1e-9
+
+
+def test_pack_rects_rotates_upright_rects():
+    x, y, rot, scale = core.pack_rects([0.1, 0.5], [0.4, 0.2])
+    assert rot.tolist() == [True, False]
+    assert 0 < scale
@@ -0,0 +1,109 @@
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+import pbUVCore as core
+
+WIDTH, HEIGHT = 40, 24
+COLOR = (255, 128, 0)
+
+
+def _triangle():
+    return core.MeshUVs('triShape', 'map1', [0.1, 0.9, 0.4], [0.1, 0.3, 0.9], [3], [0, 1, 2])
+
+
+def _expected(aa=True):
+    """
+    RGBA pixels render_snapshot should write for _triangle, rasterized directly
+    """
+    cover = core.rasterize_band(core.edge_segments([_triangle()], WIDTH, HEIGHT), WIDTH, 0, HEIGHT, aa)
+    pixels = np.zeros((HEIGHT, WIDTH, 4), dtype=np.uint8)
+    pixels[cover > 0, :3] = COLOR
+    pixels[..., 3] = (cover * 255 + 0.5).astype(np.uint8)
+    return pixels
+
+
+def _read_png(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    pos, chunks = 8, []
+    while pos < len(data):
+        size = struct.unpack('>I', data[pos:pos + 4])[0]
+        tag, body = data[pos + 4:pos + 8], data[pos + 8:pos + 8 + size]
+        assert struct.unpack('>I', data[pos + 8 + size:pos + 12 + size])[0] == zlib.crc32(tag + body) & 0xffffffff
+        chunks.append((tag, body))
+        pos += 12 + size
+    assert chunks[0][0] == b'IHDR' and chunks[-1][0] == b'IEND'
+    width, height, depth, kind = struct.unpack('>IIBB', chunks[0][1][:10])
+    assert (depth, kind) == (8, 6)
+    raw = zlib.decompress(b''.join(body for tag, body in chunks if tag == b'IDAT'))
+    rows = np.frombuffer(raw, dtype=np.uint8).reshape(height, width * 4 + 1)
+    assert (rows[:, 0] == 0).all()
+    return rows[:, 1:].reshape(height, width, 4)
+
+
+def _read_tga(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    fields = struct.unpack('<BBBHHBHHHHBB', data[:18])
+    assert fields[2] == 2 and fields[10] == 32 and fields[11] == 0x28
+    bgra = np.frombuffer(data[18:], dtype=np.uint8).reshape(fields[9], fields[8], 4)
+    return bgra[..., [2, 1, 0, 3]]
+
+
+def _read_tiff(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert data[:4] == b'II*\x00'
+    ifd = struct.unpack('<I', data[4:8])[0]
+    count = struct.unpack('<H', data[ifd:ifd + 2])[0]
+    tags = {}
+    for i in range(count):
+        tag, kind, n, value = struct.unpack('<HHII', data[ifd + 2 + i * 12:ifd + 14 + i * 12])
+        tags[tag] = value & 0xffff if kind == 3 and n == 1 else value
+    # ExtraSamples 2 is unassociated (straight) alpha
+    assert tags[338] == 2 and tags[277] == 4
+    start = tags[273]
+    return np.frombuffer(data[start:start + tags[279]], dtype=np.uint8).reshape(tags[257], tags[256], 4)
+
+
+@pytest.mark.parametrize('ext, read', [('.png', _read_png), ('.tga', _read_tga), ('.tif', _read_tiff)])
+@pytest.mark.parametrize('band', [5, 256])
+def test_writers(tmp_path, ext, read, band):
+    path = str(tmp_path / ('snap' + ext))
+    assert core.render_snapshot(_triangle(), path, WIDTH, HEIGHT, color=COLOR, band=band) == path
+    assert np.array_equal(read(path), _expected())
+
+
+def test_straight_alpha(tmp_path):
+    path = str(tmp_path / 'snap.png')
+    core.render_snapshot(_triangle(), path, WIDTH, HEIGHT, color=COLOR)
+    pixels = _read_png(path)
+    covered = pixels[..., 3] > 0
+    # partly covered pixels keep the full color, the coverage only goes into alpha
+    assert (pixels[..., 3][covered] < 255).any()
+    assert (pixels[covered, :3] == COLOR).all()
+    assert (pixels[~covered] == 0).all()
+
+
+def test_no_aa(tmp_path):
+    path = str(tmp_path / 'snap.tga')
+    core.render_snapshot(_triangle(), path, WIDTH, HEIGHT, color=COLOR, aa=False)
+    alpha = _read_tga(path)[..., 3]
+    assert set(np.unique(alpha).tolist()) == {0, 255}
+
+
+def test_unsupported_format(tmp_path):
+    with pytest.raises(ValueError):
+        core.render_snapshot(_triangle(), str(tmp_path / 'snap.exr'), WIDTH, HEIGHT)
+
+
+def test_render_batch(tmp_path):
+    jobs = [([_triangle()], str(tmp_path / '{0}.png'.format(i)), {'width': WIDTH, 'height': HEIGHT}) for i in range(2)]
+    results = core.render_batch(jobs, processes=1)
+    assert [i[0] for i in results] == [i[1] for i in jobs]
+    for path in results:
+        assert _read_png(path[0]).shape == (HEIGHT, WIDTH, 4)